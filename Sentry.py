@@ -1,29 +1,28 @@
-import re
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-import PyPDF2
-from datetime import datetime
 import os
 import sys
-import logging
+import math
 import time
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+import asyncio
+import logging
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import json
-from openpyxl.worksheet.datavalidation import DataValidation
-from openpyxl.formatting.rule import FormulaRule
-
-# Para logo
-from PIL import Image, ImageDraw
-
-# Para gráficos
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib
-matplotlib.use('TkAgg')
+import multiprocessing
+import queue
+from datetime import datetime, timedelta
+
+from cnd_engine import (CNDScanner, MODE_POSITIVA, MODE_VENCIMENTO,
+                        default_config, load_config, save_config)
+from cnd_profile import ScanProfile, REPORT_FILE, STAGE_UI, format_report
+from cnd_watch import FolderWatcher, POLL_INTERVAL
+from cnd_history import FIELD_LABELS, FLAG_FIELD
+from cnd_results import (ResultStore, row_tag, FLAG_COMPLETO, FLAG_INCOMPLETO, FLAG_ERRO,
+                         FLAG_POSITIVA, FLAG_VENCIDA, FLAG_FALTANDO, FLAG_VALIDA)
+
+# matplotlib, openpyxl (cnd_report) e PyPDF2 são importados só no primeiro uso
+# (gráfico, exportação e leitura de PDFs) para a janela abrir mais rápido.
+# Tempo de importação medido por benchmarks/startup_importtime.py
 
 # Configuração do logging
 logging.basicConfig(
@@ -34,7 +33,250 @@ logging.basicConfig(
 )
 
 
+class VirtualTable:
+    """Tabela de resultados virtualizada sobre um ttk.Treeview.
+
+    O Treeview só contém os itens que cabem na área visível; ao rolar, filtrar
+    ou ordenar, esses mesmos itens são reescritos com as linhas da janela
+    atual de `rows`. O custo de cada atualização depende do número de linhas
+    visíveis, não do total de empresas.
+
+    `render_row(row)` devolve (valores, tag) de uma linha.
+    """
+
+    def __init__(self, parent, style_name, render_row, on_select=None):
+        self.render_row = render_row
+        self.on_select = on_select
+        self.rows = []
+        self.offset = 0
+        self.selected = None
+        self.pool = []
+        self.visible = 1
+
+        style = ttk.Style()
+        self.row_height = int(style.lookup(style_name, "rowheight") or 20)
+
+        self.tree = ttk.Treeview(parent, show="headings", height=15,
+                                 style=style_name, selectmode="browse")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.scrollbar = ctk.CTkScrollbar(parent, command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.yview("scroll", -3, "units"))
+        self.tree.bind("<Button-5>", lambda e: self.yview("scroll", 3, "units"))
+        for key, step in (("<Up>", -1), ("<Down>", 1), ("<Prior>", "-page"), ("<Next>", "page"),
+                          ("<Home>", "home"), ("<End>", "end")):
+            self.tree.bind(key, lambda e, s=step: self._move_selection(s))
+
+    # ---- dados ----
+
+    def set_rows(self, rows, keep_offset=False):
+        """Troca as linhas exibidas (filtro/ordenação) e volta ao topo, ou
+        mantém a rolagem com keep_offset"""
+        self.rows = list(rows)
+        if not keep_offset:
+            self.offset = 0
+        self.render()
+
+    def extend(self, rows):
+        """Acrescenta linhas; só escreve no Treeview as que caem na janela visível"""
+        start = len(self.rows) - self.offset
+        self.rows.extend(rows)
+        end = min(len(self.rows) - self.offset, self.visible)
+        if start < end:
+            self._resize_pool(end)
+            for position in range(start, end):
+                values, tag = self.render_row(self.rows[self.offset + position])
+                self.tree.item(self.pool[position], values=values, tags=(tag,) if tag else ())
+        self._update_scrollbar()
+
+    def insert_sorted(self, rows, key, reverse=False):
+        """Insere linhas em uma tabela já ordenada por key (crescente, ou
+        decrescente com reverse), cada uma na sua posição por bisseção"""
+        for row in rows:
+            row_key = key(row)
+            low, high = 0, len(self.rows)
+            while low < high:
+                middle = (low + high) // 2
+                middle_key = key(self.rows[middle])
+                if (middle_key > row_key) if reverse else (middle_key < row_key):
+                    low = middle + 1
+                else:
+                    high = middle
+            self.rows.insert(low, row)
+        self.render()
+
+    def patch(self, replacements, added=()):
+        """Troca linhas no lugar sem mudar a posição da rolagem:
+        replacements é {id(linha antiga): linha nova, ou None para retirar}.
+        added vai para o fim. A linha selecionada acompanha a troca."""
+        if replacements:
+            rows = []
+            for row in self.rows:
+                key = id(row)
+                if key in replacements:
+                    row = replacements[key]
+                    if row is None:
+                        continue
+                rows.append(row)
+            self.rows = rows
+            if self.selected is not None and id(self.selected) in replacements:
+                self.selected = replacements[id(self.selected)]
+                if self.on_select and self.selected is not None:
+                    self.on_select(self.selected)
+        self.rows.extend(added)
+        self.render()
+
+    def clear(self):
+        self.rows = []
+        self.offset = 0
+        self.selected = None
+        self.render()
+
+    def selected_row(self):
+        return self.selected
+
+    # ---- colunas ----
+
+    def set_columns(self, columns, widths, on_heading=None):
+        if tuple(self.tree["columns"]) != tuple(columns):
+            self.tree["columns"] = columns
+        for col in columns:
+            self.tree.heading(col, text=col,
+                              command=(lambda c=col: on_heading(c)) if on_heading else "")
+            self.tree.column(col, width=widths.get(col, 80), anchor="center")
+
+    def tag_configure(self, tag, **options):
+        self.tree.tag_configure(tag, **options)
+
+    # ---- desenho ----
+
+    def render(self):
+        """Reescreve os itens do pool com as linhas de rows[offset:offset+visible]"""
+        self.offset = max(0, min(self.offset, len(self.rows) - self.visible))
+        window = self.rows[self.offset:self.offset + self.visible]
+        self._resize_pool(len(window))
+
+        selected_iid = None
+        for iid, row in zip(self.pool, window):
+            values, tag = self.render_row(row)
+            self.tree.item(iid, values=values, tags=(tag,) if tag else ())
+            if row is self.selected:
+                selected_iid = iid
+
+        if selected_iid is not None:
+            if self.tree.selection() != (selected_iid,):
+                self.tree.selection_set(selected_iid)
+        elif self.tree.selection():
+            self.tree.selection_remove(self.tree.selection())
+        self._update_scrollbar()
+
+    def _resize_pool(self, size):
+        while len(self.pool) < size:
+            self.pool.append(self.tree.insert("", "end"))
+        while len(self.pool) > size:
+            self.tree.delete(self.pool.pop())
+
+    def _update_scrollbar(self):
+        total = len(self.rows)
+        if total <= self.visible:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.offset / total, (self.offset + self.visible) / total)
+
+    def _on_resize(self, event):
+        # A primeira "linha" da altura é o cabeçalho das colunas
+        visible = max(1, event.height // self.row_height - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self.render()
+
+    # ---- rolagem e seleção ----
+
+    def yview(self, action, value, unit=None):
+        """Comando da barra de rolagem ('moveto', fração) / ('scroll', n, 'units'|'pages')"""
+        if action == "moveto":
+            offset = int(float(value) * len(self.rows))
+        elif unit == "pages":
+            offset = self.offset + int(value) * self.visible
+        else:
+            offset = self.offset + int(value)
+        offset = max(0, min(offset, len(self.rows) - self.visible))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def _on_mousewheel(self, event):
+        self.yview("scroll", -3 if event.delta > 0 else 3, "units")
+        return "break"
+
+    def _on_tree_select(self, event):
+        selection = self.tree.selection()
+        if not selection or selection[0] not in self.pool:
+            return
+        row = self.rows[self.offset + self.pool.index(selection[0])]
+        # O evento também chega após selection_set feito pelo render
+        if row is self.selected:
+            return
+        self.selected = row
+        if self.on_select:
+            self.on_select(row)
+
+    def _move_selection(self, step):
+        if not self.rows:
+            return "break"
+        try:
+            index = self.rows.index(self.selected) if self.selected is not None else -1
+        except ValueError:
+            index = -1
+        if step == "home":
+            index = 0
+        elif step == "end":
+            index = len(self.rows) - 1
+        elif step == "page":
+            index += self.visible
+        elif step == "-page":
+            index -= self.visible
+        else:
+            index += step
+        index = max(0, min(index, len(self.rows) - 1))
+        if index < self.offset:
+            self.offset = index
+        elif index >= self.offset + self.visible:
+            self.offset = index - self.visible + 1
+        self.selected = self.rows[index]
+        self.render()
+        if self.on_select:
+            self.on_select(self.selected)
+        return "break"
+
+
 class CNDDashboard:
+    # Intervalo (ms) em que a thread da interface descarrega a fila de resultados
+    RESULT_FRAME_MS = 50
+    # Intervalo mínimo (ms) entre redesenhos do gráfico durante o processamento
+    CHART_INTERVAL_MS = 500
+    # Espera (ms) depois da última tecla antes de aplicar a busca
+    SEARCH_DEBOUNCE_MS = 120
+    # Coluna da tabela -> campo do resultado usado na ordenação
+    SORT_FIELDS = {"Empresa": "empresa", "Municipal": "municipal", "RFB": "rfb",
+                   "FGTS": "fgts", "PROC": "proc", "Estadual": "estadual",
+                   "Positiva": "positiva", "Outras CNDs": "outras_cnds", "Status": "status"}
+    # Fatias do gráfico: (chave em self.stats, rótulo, cor)
+    CHART_SLICES = (("completo", "Completas", "#22c55e"),
+                    ("positivas", "Positivas", "#dc2626"),
+                    ("incompleto", "Incompletas", "#ef4444"),
+                    ("erro", "Erros", "#eab308"))
+    # Janela de histórico: mudanças exibidas, períodos (dias; None = último
+    # processamento contra o anterior) e processamentos na tendência
+    HISTORY_VIEW_LIMIT = 1000
+    HISTORY_PERIODS = {"Processamento": None, "Últimos 7 dias": 7, "Últimos 30 dias": 30}
+    HISTORY_TREND_RUNS = 15
+
     def __init__(self):
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("blue")
@@ -57,12 +299,17 @@ class CNDDashboard:
 
         self.folder_path = tk.StringVar()
         self.processing = False
-        self.cancel_requested = False
-        self.executor = None
         self.is_closing = False
-        self.results_data = []
+        self.results = ResultStore()
         self.filtered_data = []
+        self.result_queue = queue.SimpleQueue()
+        self.scan_profile = None
+        self.scan_run = None
+        self.scan_report = None
+        self.scanned_folder = None
+        self.watcher = None
         self.search_var = tk.StringVar()
+        self.search_pending = None
         self.sort_column = None
         self.sort_reverse = False
 
@@ -80,15 +327,14 @@ class CNDDashboard:
         # Filtro ativo (None = sem filtro)
         self.active_filter = None
 
-        self.config = {
-            "expected_files": ["CND MUNICIPAL", "CND RFB", "CND FGTS", "CND PROC", "CND ESTADUAL"],
-            "target_line": "CERTIDÃO POSITIVA DE DÉBITOS - CPD",
-            "last_folder": "",
-            "mode": "Verificar Positiva",
-            "ignored_folders": ["001 - RFB"]
-        }
+        # Gráfico criado no primeiro uso e depois só atualizado
+        self.chart = None
+        self.chart_pending = False
+
+        self.config = default_config()
 
         self.load_config()
+        self.scanner = CNDScanner(self.config)
         self.create_dashboard()
         self.center_window()
 
@@ -103,12 +349,10 @@ class CNDDashboard:
     def on_closing(self):
         """Fecha a aplicação de forma segura"""
         self.is_closing = True
-        self.cancel_requested = True
 
-        # Parar executor se existir
-        if self.executor:
-            self.executor.shutdown(wait=False, cancel_futures=True)
-            self.executor = None
+        # Parar acompanhamento, processamento, processos e caches
+        self.stop_watch()
+        self.scanner.close()
 
         self.root.destroy()
 
@@ -122,20 +366,10 @@ class CNDDashboard:
             pass
 
     def load_config(self):
-        try:
-            if os.path.exists("cnd_config.json"):
-                with open("cnd_config.json", "r", encoding="utf-8") as f:
-                    loaded_config = json.load(f)
-                    self.config.update(loaded_config)
-        except Exception as e:
-            logging.error(f"Erro ao carregar configurações: {e}")
+        load_config(self.config)
 
     def save_config(self):
-        try:
-            with open("cnd_config.json", "w", encoding="utf-8") as f:
-                json.dump(self.config, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            logging.error(f"Erro ao salvar configurações: {e}")
+        save_config(self.config)
 
     def center_window(self):
         self.root.update_idletasks()
@@ -158,6 +392,7 @@ class CNDDashboard:
         # Logo no header com circulo branco
         logo_path = os.path.join(self.base_path, "assets", "Sentry_logo.png")
         if os.path.exists(logo_path):
+            from PIL import Image, ImageDraw
             original = Image.open(logo_path).convert("RGBA")
             size = 200  # resolucao interna para qualidade
             circle_bg = Image.new("RGBA", (size, size), (0, 0, 0, 0))
@@ -180,10 +415,20 @@ class CNDDashboard:
 
         self.mode_var = tk.StringVar(value=self.config["mode"])
         mode_combo = ctk.CTkComboBox(controls_frame, variable=self.mode_var,
-                                      values=["Verificar Positiva", "Verificar Vencimento"],
+                                      values=[MODE_POSITIVA, MODE_VENCIMENTO],
                                       width=180, state="readonly")
         mode_combo.pack(side="left", padx=5)
 
+        self.incremental_var = tk.BooleanVar(value=self.config.get("incremental", False))
+        incremental_check = ctk.CTkCheckBox(controls_frame, text="Só pastas alteradas",
+                                            variable=self.incremental_var)
+        incremental_check.pack(side="left", padx=(15, 5))
+
+        self.watch_var = tk.BooleanVar(value=self.config.get("watch", False))
+        watch_check = ctk.CTkCheckBox(controls_frame, text="Acompanhar pasta",
+                                      variable=self.watch_var, command=self.toggle_watch)
+        watch_check.pack(side="left", padx=(15, 5))
+
         # ============ CONTENT AREA ============
         content_frame = ctk.CTkFrame(main_container, fg_color="transparent")
         content_frame.pack(fill="both", expand=True, padx=5, pady=5)
@@ -249,6 +494,21 @@ class CNDDashboard:
                                         fg_color="#6b7280", hover_color="#4b5563")
         self.clear_btn.pack(side="right", fill="x", expand=True, padx=(5, 0))
 
+        # Diagnóstico (tempos por etapa do último processamento) e histórico lado a lado
+        btn_row3 = ctk.CTkFrame(action_frame, fg_color="transparent")
+        btn_row3.pack(fill="x", padx=10, pady=(0, 5))
+
+        self.diagnostics_btn = ctk.CTkButton(btn_row3, text="🩺 Diagnóstico",
+                                              command=self.show_diagnostics,
+                                              height=28, state="disabled",
+                                              fg_color="#374151", hover_color="#1f2937")
+        self.diagnostics_btn.pack(side="left", fill="x", expand=True, padx=(0, 5))
+
+        self.history_btn = ctk.CTkButton(btn_row3, text="🕘 Histórico",
+                                          command=self.show_history, height=28,
+                                          fg_color="#374151", hover_color="#1f2937")
+        self.history_btn.pack(side="right", fill="x", expand=True, padx=(5, 0))
+
         # Progress
         self.progress_label = ctk.CTkLabel(action_frame, text="Aguardando...",
                                             font=ctk.CTkFont(size=11))
@@ -344,27 +604,20 @@ class CNDDashboard:
         style.map("Dashboard.Treeview",
                   background=[("selected", "#3b82f6")])
 
-        # Criar Treeview
-        self.tree = ttk.Treeview(table_frame, show="headings", height=15,
-                                  style="Dashboard.Treeview")
-        self.tree.pack(side="left", fill="both", expand=True)
+        # Tabela virtualizada (só as linhas visíveis existem no Treeview) com scrollbar
+        self.table = VirtualTable(table_frame, "Dashboard.Treeview",
+                                  render_row=self.render_result_row,
+                                  on_select=self.on_item_select)
+        self.tree = self.table.tree
 
         # Tags para cores (prioridade: positiva > vencida > faltando > incompleto > completo)
-        self.tree.tag_configure("positiva", background="#7f1d1d", foreground="#fca5a5")  # Vermelho forte - certidão positiva/falência
-        self.tree.tag_configure("vencida", background="#6b1a1a", foreground="white")  # Vermelho escuro
-        self.tree.tag_configure("faltando", background="#6b4a1a", foreground="white")  # Laranja escuro
-        self.tree.tag_configure("incompleto", background="#4d4d1a", foreground="white")  # Amarelo escuro
-        self.tree.tag_configure("erro", background="#4d1a4d", foreground="white")  # Roxo escuro
-        self.tree.tag_configure("completo", background="#1a4d1a", foreground="white")  # Verde escuro
-        self.tree.tag_configure("valida", background="#1a4d1a", foreground="white")  # Verde escuro
-
-        # Scrollbar
-        scrollbar = ctk.CTkScrollbar(table_frame, command=self.tree.yview)
-        scrollbar.pack(side="right", fill="y")
-        self.tree.configure(yscrollcommand=scrollbar.set)
-
-        # Bind para seleção
-        self.tree.bind("<<TreeviewSelect>>", self.on_item_select)
+        self.table.tag_configure("positiva", background="#7f1d1d", foreground="#fca5a5")  # Vermelho forte - certidão positiva/falência
+        self.table.tag_configure("vencida", background="#6b1a1a", foreground="white")  # Vermelho escuro
+        self.table.tag_configure("faltando", background="#6b4a1a", foreground="white")  # Laranja escuro
+        self.table.tag_configure("incompleto", background="#4d4d1a", foreground="white")  # Amarelo escuro
+        self.table.tag_configure("erro", background="#4d1a4d", foreground="white")  # Roxo escuro
+        self.table.tag_configure("completo", background="#1a4d1a", foreground="white")  # Verde escuro
+        self.table.tag_configure("valida", background="#1a4d1a", foreground="white")  # Verde escuro
 
         # ============ PAINEL DE DETALHES (bottom) ============
         self.details_frame = ctk.CTkFrame(right_panel, height=120)
@@ -420,63 +673,63 @@ class CNDDashboard:
 
         return {"card": card, "value_lbl": value_lbl, "title_lbl": title_lbl}
 
+    def show_rows(self, keep_offset=False):
+        """Mostra na tabela o filtro ou a busca atual (filtered_data) na
+        ordem da coluna escolhida, usando a ordem guardada no ResultStore"""
+        filtering = self.active_filter is not None or self.search_var.get().strip()
+        rows = self.filtered_data if filtering else None
+        if self.sort_column:
+            rows = self.results.sorted_rows(self.SORT_FIELDS[self.sort_column],
+                                            self.sort_reverse, rows)
+        elif rows is None:
+            rows = self.results
+        self.table.set_rows(rows, keep_offset=keep_offset)
+
     def filter_by_stat(self, filter_key):
         """Filtra a tabela pelo tipo de estatística clicado"""
-        if not self.results_data:
+        if not self.results:
             return
 
         # Se clicar no mesmo filtro, remove o filtro
         if self.active_filter == filter_key:
             self.active_filter = None
-            self.filtered_data = self.results_data.copy()
+            self.filtered_data = list(self.results)
         else:
             self.active_filter = filter_key
             mode = self.config["mode"]
 
             if filter_key == "total":
-                self.filtered_data = self.results_data.copy()
+                self.filtered_data = list(self.results)
                 self.active_filter = None  # Total não é filtro real
             elif filter_key == "completo":
-                self.filtered_data = [r for r in self.results_data
-                                       if r.get("status", "").upper() == "COMPLETO"]
+                self.filtered_data = self.results.with_flag(FLAG_COMPLETO)
             elif filter_key == "incompleto":
-                self.filtered_data = [r for r in self.results_data
-                                       if r.get("status", "").upper() == "INCOMPLETO"]
+                self.filtered_data = self.results.with_flag(FLAG_INCOMPLETO)
             elif filter_key == "vencidas":
-                if mode == "Verificar Vencimento":
-                    self.filtered_data = [r for r in self.results_data
-                                           if any(r.get(c) == "VENCIDA"
-                                                  for c in ["municipal", "rfb", "fgts", "proc", "estadual"])]
+                if mode == MODE_VENCIMENTO:
+                    self.filtered_data = self.results.with_flag(FLAG_VENCIDA)
                 else:
                     # Modo positiva: filtra por erro
-                    self.filtered_data = [r for r in self.results_data
-                                           if r.get("status", "").upper() == "ERRO"]
+                    self.filtered_data = self.results.with_flag(FLAG_ERRO)
             elif filter_key == "positivas":
                 # Filtra empresas que têm certidão positiva (CPD ou FALÊNCIA)
-                self.filtered_data = [r for r in self.results_data
-                                       if r.get("positive_details")]
+                self.filtered_data = self.results.with_flag(FLAG_POSITIVA)
             elif filter_key == "faltantes":
                 # Filtra empresas que têm alguma CND faltando (NÃO)
-                self.filtered_data = [r for r in self.results_data
-                                       if any(r.get(c) == "NÃO"
-                                              for c in ["municipal", "rfb", "fgts", "proc", "estadual"])]
+                self.filtered_data = self.results.with_flag(FLAG_FALTANDO)
 
         # Atualizar visual dos cards
         self.update_card_highlights()
 
         # Atualizar tabela
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        for result in self.filtered_data:
-            self.add_result_to_tree(result)
+        self.show_rows()
 
         # Atualizar label de filtro
         if self.active_filter:
             filter_names = {"completo": "Completas", "incompleto": "Incompletas", "positivas": "Positivas", "vencidas": "Vencidas/Erros", "faltantes": "Faltantes"}
             self.progress_label.configure(text=f"Filtro: {filter_names.get(self.active_filter, '')} ({len(self.filtered_data)})")
         else:
-            self.progress_label.configure(text=f"Total: {len(self.results_data)} empresas")
+            self.progress_label.configure(text=f"Total: {len(self.results)} empresas")
 
     def update_card_highlights(self):
         """Atualiza o destaque visual dos cards baseado no filtro ativo"""
@@ -495,56 +748,25 @@ class CNDDashboard:
                 card_data["card"].configure(fg_color="#2d2d44")
 
     def update_stats(self):
-        """Atualiza os cards de estatísticas"""
+        """Atualiza os cards de estatísticas (contagens vindas do ResultStore)"""
+        mode = self.config["mode"]
         self.stats = {
-            "total": len(self.results_data),
-            "completo": 0,
-            "incompleto": 0,
-            "vencidas": 0,
-            "faltantes": 0,
-            "positivas": 0,
-            "validas": 0,
-            "erro": 0
+            "total": len(self.results),
+            "completo": self.results.count(FLAG_COMPLETO),
+            "incompleto": self.results.count(FLAG_INCOMPLETO),
+            "vencidas": self.results.count(FLAG_VENCIDA) if mode == MODE_VENCIMENTO else 0,
+            "faltantes": self.results.count(FLAG_FALTANDO),
+            "positivas": self.results.count(FLAG_POSITIVA) if mode == MODE_POSITIVA else 0,
+            "validas": self.results.count(FLAG_VALIDA) if mode == MODE_VENCIMENTO else 0,
+            "erro": self.results.count(FLAG_ERRO)
         }
 
-        mode = self.config["mode"]
-
-        for r in self.results_data:
-            status = r.get("status", "").upper()
-            if status == "COMPLETO":
-                self.stats["completo"] += 1
-            elif status == "INCOMPLETO":
-                self.stats["incompleto"] += 1
-            elif status == "ERRO":
-                self.stats["erro"] += 1
-
-            # Verificar campos de CND
-            campos = [r.get("municipal"), r.get("rfb"), r.get("fgts"),
-                      r.get("proc"), r.get("estadual")]
-
-            # Contar faltantes (NÃO em qualquer modo)
-            if any(c == "NÃO" for c in campos):
-                self.stats["faltantes"] += 1
-
-            # Contar positivas (modo positiva)
-            if mode == "Verificar Positiva":
-                positive_details = r.get("positive_details", [])
-                if positive_details:
-                    self.stats["positivas"] += 1
-
-            # Contar vencidas (só no modo vencimento)
-            if mode == "Verificar Vencimento":
-                if any(c == "VENCIDA" for c in campos):
-                    self.stats["vencidas"] += 1
-                elif all(c == "VÁLIDA" for c in campos if c and c != "NÃO"):
-                    self.stats["validas"] += 1
-
         # Atualizar cards
         self.card_total["value_lbl"].configure(text=str(self.stats["total"]))
         self.card_completo["value_lbl"].configure(text=str(self.stats["completo"]))
         self.card_faltantes["value_lbl"].configure(text=str(self.stats["faltantes"]))
 
-        if mode == "Verificar Vencimento":
+        if mode == MODE_VENCIMENTO:
             self.card_vencidas["value_lbl"].configure(text=str(self.stats["vencidas"]))
             self.card_vencidas["title_lbl"].configure(text="Vencidas")
             self.card_positivas["value_lbl"].configure(text="—")
@@ -558,91 +780,99 @@ class CNDDashboard:
         # Atualizar gráfico
         self.update_chart()
 
-    def update_chart(self):
-        """Atualiza o gráfico de pizza"""
-        # Limpar container
-        for widget in self.chart_container.winfo_children():
-            widget.destroy()
-
-        if not self.results_data:
-            placeholder = ctk.CTkLabel(self.chart_container,
-                                        text="Processe uma pasta\npara ver o gráfico",
-                                        font=ctk.CTkFont(size=12),
-                                        text_color="#666666")
-            placeholder.pack(expand=True)
-            return
-
-        # Criar figura matplotlib
-        fig, ax = plt.subplots(figsize=(3, 3), facecolor='#1a1a2e')
+    def update_chart(self, immediate=False):
+        """Agenda a atualização do gráfico de pizza; durante o processamento
+        os redesenhos ficam limitados a um a cada CHART_INTERVAL_MS"""
+        if immediate:
+            self.redraw_chart()
+        elif not self.chart_pending:
+            self.chart_pending = True
+            self.root.after(self.CHART_INTERVAL_MS, self.redraw_chart)
+
+    def create_chart(self):
+        """Cria a figura e o canvas uma única vez; as fatias são atualizadas
+        por redraw_chart"""
+        # Figure direto, sem pyplot, para não carregar o gerenciador de figuras
+        from matplotlib.figure import Figure
+        from matplotlib.patches import Wedge
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        fig = Figure(figsize=(3, 3), facecolor='#1a1a2e')
+        ax = fig.add_subplot()
         ax.set_facecolor('#1a1a2e')
+        # Margem para os rótulos fora do círculo
+        ax.set_xlim(-1.8, 1.8)
+        ax.set_ylim(-1.4, 1.4)
+        ax.set_aspect('equal')
+        ax.axis('off')
+
+        wedges, labels, autotexts = [], [], []
+        for _, _, color in self.CHART_SLICES:
+            wedge = Wedge((0, 0), 1, 90, 90, facecolor=color, visible=False)
+            ax.add_patch(wedge)
+            wedges.append(wedge)
+            labels.append(ax.text(0, 0, "", color='white', fontsize=8,
+                                  ha='center', va='center', visible=False))
+            autotexts.append(ax.text(0, 0, "", color='white', fontsize=9, fontweight='bold',
+                                     ha='center', va='center', visible=False))
+        empty_text = ax.text(0.5, 0.5, 'Sem dados', ha='center', va='center',
+                             color='#666666', fontsize=12, transform=ax.transAxes, visible=False)
+        fig.tight_layout()
 
-        # Dados para o gráfico
-        labels = []
-        sizes = []
-        colors = []
-
-        if self.stats["completo"] > 0:
-            labels.append(f'Completas\n({self.stats["completo"]})')
-            sizes.append(self.stats["completo"])
-            colors.append('#22c55e')
-
-        if self.stats.get("positivas", 0) > 0:
-            labels.append(f'Positivas\n({self.stats["positivas"]})')
-            sizes.append(self.stats["positivas"])
-            colors.append('#dc2626')
-
-        if self.stats["incompleto"] > 0:
-            labels.append(f'Incompletas\n({self.stats["incompleto"]})')
-            sizes.append(self.stats["incompleto"])
-            colors.append('#ef4444')
-
-        if self.stats["erro"] > 0:
-            labels.append(f'Erros\n({self.stats["erro"]})')
-            sizes.append(self.stats["erro"])
-            colors.append('#eab308')
-
-        if sizes:
-            wedges, texts, autotexts = ax.pie(sizes, labels=labels, colors=colors,
-                                               autopct='%1.0f%%', startangle=90,
-                                               textprops={'color': 'white', 'fontsize': 8})
-            for autotext in autotexts:
-                autotext.set_fontsize(9)
-                autotext.set_fontweight('bold')
-        else:
-            ax.text(0.5, 0.5, 'Sem dados', ha='center', va='center',
-                    color='#666666', fontsize=12)
-
-        ax.axis('equal')
-        plt.tight_layout()
-
-        # Adicionar ao tkinter
         canvas = FigureCanvasTkAgg(fig, master=self.chart_container)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill="both", expand=True)
-        plt.close(fig)
+        self.chart = {"fig": fig, "canvas": canvas, "wedges": wedges, "labels": labels,
+                      "autotexts": autotexts, "empty_text": empty_text}
 
-    def on_item_select(self, event):
-        """Mostra detalhes quando uma linha é selecionada"""
-        selection = self.tree.selection()
-        if not selection:
+    def redraw_chart(self):
+        """Atualiza ângulos e textos das fatias e redesenha o canvas existente"""
+        self.chart_pending = False
+        if self.is_closing:
             return
 
-        item = self.tree.item(selection[0])
-        values = item["values"]
-
-        if not values:
+        if not self.results:
+            if self.chart:
+                self.chart["canvas"].get_tk_widget().pack_forget()
+            self.chart_placeholder.pack(expand=True)
             return
 
-        # Encontrar o resultado correspondente
-        empresa = values[0]
-        result = None
-        for r in self.results_data:
-            if r.get("empresa") == empresa:
-                result = r
-                break
-
+        if self.chart is None:
+            self.create_chart()
+        widget = self.chart["canvas"].get_tk_widget()
+        if not widget.winfo_ismapped():
+            self.chart_placeholder.pack_forget()
+            widget.pack(fill="both", expand=True)
+
+        sizes = [self.stats.get(key, 0) for key, _, _ in self.CHART_SLICES]
+        total = sum(sizes)
+        # Mesmo desenho do ax.pie(startangle=90): sentido anti-horário a partir do topo
+        theta = 90.0
+        for (_, name, _), size, wedge, label, autotext in zip(
+                self.CHART_SLICES, sizes, self.chart["wedges"],
+                self.chart["labels"], self.chart["autotexts"]):
+            visible = size > 0
+            wedge.set_visible(visible)
+            label.set_visible(visible)
+            autotext.set_visible(visible)
+            if not visible:
+                continue
+            span = 360.0 * size / total
+            wedge.set_theta1(theta)
+            wedge.set_theta2(theta + span)
+            middle = math.radians(theta + span / 2)
+            x, y = math.cos(middle), math.sin(middle)
+            label.set_position((1.1 * x, 1.1 * y))
+            label.set_horizontalalignment('left' if x > 0 else 'right')
+            label.set_text(f'{name}\n({size})')
+            autotext.set_position((0.6 * x, 0.6 * y))
+            autotext.set_text(f'{100.0 * size / total:1.0f}%')
+            theta += span
+        self.chart["empty_text"].set_visible(total == 0)
+
+        self.chart["canvas"].draw_idle()
+
+    def on_item_select(self, result):
+        """Mostra detalhes quando uma linha é selecionada"""
         if result:
-            mode = self.config["mode"]
             details = f"Empresa: {result.get('empresa', 'N/A')}\n"
             details += f"Status: {result.get('status', 'N/A')}\n"
 
@@ -678,14 +908,14 @@ class CNDDashboard:
 
     def clear_data(self):
         """Limpa todos os dados processados com confirmação"""
-        if not self.results_data:
+        if not self.results:
             return
 
         # Confirmação
         confirm = messagebox.askyesno(
             "Confirmar Limpeza",
             f"Deseja limpar todos os dados?\n\n"
-            f"• {len(self.results_data)} empresas processadas serão removidas\n"
+            f"• {len(self.results)} empresas processadas serão removidas\n"
             f"• O gráfico será resetado\n"
             f"• Você poderá processar novamente",
             icon="warning"
@@ -695,13 +925,13 @@ class CNDDashboard:
             return
 
         # Limpar dados
-        self.results_data = []
+        self.stop_watch()
+        self.results.clear()
         self.filtered_data = []
         self.active_filter = None
 
         # Limpar tabela
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self.table.clear()
 
         # Resetar estatísticas
         self.stats = {
@@ -723,7 +953,7 @@ class CNDDashboard:
         self.update_card_highlights()
 
         # Resetar gráfico
-        self.update_chart()
+        self.update_chart(immediate=True)
 
         # Resetar progress
         self.progress_bar.set(0)
@@ -742,65 +972,37 @@ class CNDDashboard:
         logging.info("Dados limpos pelo usuário")
 
     def filter_results(self, *args):
-        search_text = self.search_var.get().strip().lower()
-        if not self.results_data:
+        """Chamado a cada tecla na busca: a busca só roda SEARCH_DEBOUNCE_MS
+        depois da última tecla"""
+        if self.search_pending is not None:
+            self.root.after_cancel(self.search_pending)
+        self.search_pending = self.root.after(self.SEARCH_DEBOUNCE_MS, self.apply_search)
+
+    def apply_search(self):
+        """Filtra pelo nome da empresa com o índice do ResultStore (sem
+        diferenciar maiúsculas e acentos)"""
+        self.search_pending = None
+        if self.is_closing or not self.results:
             return
-
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        if search_text:
-            self.filtered_data = [r for r in self.results_data
-                                   if search_text in r.get("empresa", "").lower()]
-        else:
-            self.filtered_data = self.results_data.copy()
-
-        for result in self.filtered_data:
-            self.add_result_to_tree(result)
+        self.filtered_data = self.results.search(self.search_var.get())
+        self.show_rows()
 
     def sort_by_column(self, col):
-        if not self.results_data:
-            return
-
-        col_map = {
-            "Empresa": "empresa", "Municipal": "municipal", "RFB": "rfb",
-            "FGTS": "fgts", "PROC": "proc", "Estadual": "estadual",
-            "Positiva": "positiva", "Outras CNDs": "outras_cnds", "Status": "status"
-        }
-
-        key = col_map.get(col, "empresa")
-
+        """Ordena pela coluna (segundo clique inverte). A ordem de cada coluna
+        fica guardada no ResultStore; inverter só lê a mesma ordem ao contrário"""
         if self.sort_column == col:
             self.sort_reverse = not self.sort_reverse
         else:
             self.sort_column = col
             self.sort_reverse = False
+        self.show_rows()
+        self.update_sort_headings()
 
-        try:
-            data_to_sort = self.filtered_data if self.filtered_data else self.results_data
-            if key == "outras_cnds":
-                sorted_data = sorted(data_to_sort, key=lambda x: len(x.get(key, [])),
-                                      reverse=self.sort_reverse)
-            else:
-                sorted_data = sorted(data_to_sort, key=lambda x: str(x.get(key, "")).lower(),
-                                      reverse=self.sort_reverse)
-
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-
-            for result in sorted_data:
-                self.add_result_to_tree(result)
-
-            direction = " ▼" if self.sort_reverse else " ▲"
-            for c in self.tree["columns"]:
-                text = c.replace(" ▲", "").replace(" ▼", "")
-                if c == col or text == col:
-                    self.tree.heading(c, text=text + direction)
-                else:
-                    self.tree.heading(c, text=text)
-
-        except Exception as e:
-            logging.error(f"Erro ao ordenar: {e}")
+    def update_sort_headings(self):
+        """Seta ▲/▼ no cabeçalho da coluna ordenada"""
+        direction = " ▼" if self.sort_reverse else " ▲"
+        for col in self.tree["columns"]:
+            self.tree.heading(col, text=col + direction if col == self.sort_column else col)
 
     def start_processing(self):
         if self.processing:
@@ -810,409 +1012,454 @@ class CNDDashboard:
             messagebox.showerror("Erro", "Por favor, selecione uma pasta válida!")
             return
 
+        self.stop_watch()
         self.config["mode"] = self.mode_var.get()
+        self.config["incremental"] = self.incremental_var.get()
         self.save_config()
+        self.scanned_folder = folder
 
         self.processing = True
-        self.cancel_requested = False
         self.process_btn.configure(text="⏳ Processando...", state="disabled")
         self.stop_btn.configure(state="normal")
         self.export_btn.configure(state="disabled")
 
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        thread = threading.Thread(target=self.process_folder, args=(folder,))
+        self.results.clear()
+        self.filtered_data = []
+        self.table.clear()
+        self.configure_columns()
+
+        # Os workers só enfileiram; a interface descarrega a fila em lotes
+        self.result_queue = queue.SimpleQueue()
+        self.scan_profile = ScanProfile()
+        # O run é criado aqui para que Parar cancele este processamento mesmo
+        # antes de a thread começar, e nunca o próximo
+        self.scan_run = self.scanner.scan_async(folder, profile=self.scan_profile)
+        thread = threading.Thread(target=self.process_folder,
+                                  args=(self.scan_run, self.result_queue))
         thread.daemon = True
         thread.start()
+        self.root.after(self.RESULT_FRAME_MS, self.drain_results)
 
     def stop_processing(self):
         """Para o processamento em andamento"""
         if not self.processing:
             return
-        self.cancel_requested = True
         self.stop_btn.configure(state="disabled", text="⏹ Parando...")
         logging.info("Cancelamento solicitado pelo usuário")
+        self.scan_run.cancel()
 
-        # Cancelar executor se existir
-        if self.executor:
-            self.executor.shutdown(wait=False, cancel_futures=True)
+    def process_folder(self, run, result_queue):
+        """Executa o processamento (thread de trabalho, com o próprio loop
+        asyncio); os resultados e o resumo final vão para result_queue, lida
+        por drain_results. stop_processing cancela o run por run.cancel()."""
+        async def consume():
+            completed = 0
+            try:
+                async for result in run:
+                    completed += 1
+                    result_queue.put(("result", result, completed, run.summary["total_folders"]))
+            except asyncio.CancelledError:
+                pass
+            return run.summary
 
-    def process_folder(self, main_folder):
         try:
-            start_time = time.time()
-            logging.info(f"Iniciando processamento: {main_folder}")
-            mode = self.config["mode"]
-            expected_files = self.config["expected_files"]
-            target_line = self.config["target_line"]
-
-            # Filtrar pastas ignoradas
-            ignored_folders = self.config.get("ignored_folders", [])
-            subfolders = [f for f in os.listdir(main_folder)
-                          if os.path.isdir(os.path.join(main_folder, f))
-                          and f not in ignored_folders]
-            total_folders = len(subfolders)
-
-            if total_folders == 0:
-                logging.warning("Nenhuma subpasta encontrada")
-                self.safe_after(lambda: self.update_progress("Nenhuma subpasta!", 0))
-                self.safe_after(self.processing_complete)
-                return
+            summary = asyncio.run(consume())
+            result_queue.put(("done", summary))
 
-            logging.info(f"Encontradas {total_folders} subpastas")
-            self.results_data = []
-            self.filtered_data = []
+        except Exception as e:
+            logging.error(f"Erro: {e}", exc_info=True)
+            result_queue.put(("error", str(e)))
 
-            # Usar ThreadPoolExecutor para processar em paralelo (otimização)
-            max_workers = min(8, total_folders)  # Máximo 8 threads
-            completed = 0
+    def drain_results(self):
+        """Descarrega a fila de resultados a cada RESULT_FRAME_MS: insere as
+        linhas em lote e atualiza o progresso uma vez por quadro"""
+        if self.is_closing:
+            return
+        batch = []
+        last = None
+        final = None
+        while True:
+            try:
+                message = self.result_queue.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "result":
+                batch.append(message[1])
+                last = message
+            else:
+                final = message
+                break
 
-            def process_single(subfolder):
-                # Verificar cancelamento ou fechamento antes de processar
-                if self.cancel_requested or self.is_closing:
-                    return None
-                subfolder_path = os.path.join(main_folder, subfolder)
-                if mode == "Verificar Positiva":
-                    return self.process_subfolder_positive(subfolder_path, subfolder,
-                                                           expected_files, target_line)
-                else:
-                    return self.process_subfolder_vencimento(subfolder_path, subfolder,
-                                                             expected_files)
+        if batch:
+            started = time.perf_counter()
+            self.results.extend(batch)
+            if self.sort_column:
+                # Tabela ordenada: cada linha nova entra na sua posição
+                field = self.SORT_FIELDS[self.sort_column]
+                self.table.insert_sorted(
+                    batch, key=lambda row: self.results.row_sort_key(field, row),
+                    reverse=self.sort_reverse)
+            else:
+                self.table.extend(batch)
+            _, result, completed, total_folders = last
+            self.update_progress(f"Processando: {result['empresa']} ({completed}/{total_folders})",
+                                 completed / total_folders)
+            # Cards ao vivo (contagens do ResultStore); o gráfico é limitado por CHART_INTERVAL_MS
+            self.update_stats()
+            self.scan_profile.add(STAGE_UI, time.perf_counter() - started)
+
+        if final is None:
+            self.root.after(self.RESULT_FRAME_MS, self.drain_results)
+        elif final[0] == "done":
+            summary = final[1]
+            if summary["total_folders"] == 0:
+                self.update_progress("Nenhuma subpasta!", 0)
+            elif summary["cancelled"]:
+                self.update_progress(f"⏹ Cancelado em {summary['elapsed']:.2f}s ({len(self.results)} processados)", 0)
+            else:
+                self.update_progress(f"✓ Concluído em {summary['elapsed']:.2f}s", 1.0)
+            self.processing_complete()
+            self.update_stats()
+            self.write_scan_report(summary)
+            if self.watch_var.get() and summary["total_folders"] and not summary["cancelled"]:
+                self.start_watch()
+        else:
+            messagebox.showerror("Erro", final[1])
+            self.processing_complete()
 
-            self.executor = ThreadPoolExecutor(max_workers=max_workers)
-            try:
-                # Submeter todas as tarefas
-                future_to_folder = {self.executor.submit(process_single, sf): sf for sf in subfolders}
-
-                # Processar resultados conforme ficam prontos
-                for future in as_completed(future_to_folder):
-                    # Verificar cancelamento ou fechamento
-                    if self.cancel_requested or self.is_closing:
-                        logging.info("Processamento cancelado pelo usuário")
-                        elapsed_time = time.time() - start_time
-                        self.safe_after(lambda t=elapsed_time: self.update_progress(f"⏹ Cancelado em {t:.2f}s ({len(self.results_data)} processados)", 0))
-                        break
+    # ---- acompanhamento da pasta ----
 
-                    completed += 1
-                    progress = completed / total_folders
-                    subfolder = future_to_folder[future]
-
-                    try:
-                        result = future.result()
-                        if result is None:  # Foi cancelado
-                            continue
-                        self.results_data.append(result)
-                        self.safe_after(lambda r=result: self.add_result_to_tree(r))
-                        self.safe_after(lambda p=progress, f=subfolder:
-                                        self.update_progress(f"Processando: {f} ({completed}/{total_folders})", p))
-                    except Exception as e:
-                        if not self.cancel_requested and not self.is_closing:
-                            logging.error(f"Erro ao processar {subfolder}: {e}")
-                            error_result = {"empresa": subfolder, "status": "ERRO", "outras_cnds": [], "missing_files": []}
-                            self.results_data.append(error_result)
-                            self.safe_after(lambda r=error_result: self.add_result_to_tree(r))
-            finally:
-                self.executor.shutdown(wait=False, cancel_futures=True)
-                self.executor = None
-
-            if not self.cancel_requested and not self.is_closing:
-                elapsed_time = time.time() - start_time
-                logging.info(f"Concluído: {len(self.results_data)} empresas em {elapsed_time:.2f}s (paralelo com {max_workers} threads)")
-                self.safe_after(lambda t=elapsed_time: self.update_progress(f"✓ Concluído em {t:.2f}s", 1.0))
-
-            self.safe_after(self.processing_complete)
-            self.safe_after(self.update_stats)
+    def toggle_watch(self):
+        """Liga/desliga o acompanhamento; só começa depois de um processamento completo"""
+        self.config["watch"] = self.watch_var.get()
+        self.save_config()
+        if self.watch_var.get():
+            if self.results and not self.processing:
+                self.start_watch()
+        else:
+            self.stop_watch()
 
-        except Exception as e:
-            logging.error(f"Erro: {e}", exc_info=True)
-            if not self.is_closing:
-                self.safe_after(lambda: messagebox.showerror("Erro", str(e)))
-            self.safe_after(self.processing_complete)
-
-    def process_subfolder_positive(self, subfolder_path, subfolder_name, expected_files, target_line):
-        found_files = {file_type: False for file_type in expected_files}
-        positive_details = []  # Lista de (tipo_cnd, tipo_positiva) ex: ("CND RFB", "FALÊNCIA")
-        outras_cnds = []
+    def start_watch(self):
+        """Observa a pasta do último processamento e atualiza só as empresas alteradas"""
+        if self.watcher is not None or not self.scanned_folder:
+            return
+        folder, mode = self.scanned_folder, self.config["mode"]
+        watcher = FolderWatcher(
+            folder, lambda names: self.rescan_companies(watcher, folder, mode, names),
+            ignored_folders=self.config.get("ignored_folders", []),
+            poll_interval=self.config.get("watch_poll_interval") or POLL_INTERVAL)
         try:
-            for file_name in os.listdir(subfolder_path):
-                if file_name.lower().endswith('.pdf'):
-                    matched = False
-                    for file_type in expected_files:
-                        if file_type in file_name.upper():
-                            matched = True
-                            found_files[file_type] = True
-                            pdf_path = os.path.join(subfolder_path, file_name)
-                            positive_result = self.check_positive_cert(pdf_path, target_line)
-                            if positive_result:
-                                positive_details.append((file_type, positive_result))
-                    if not matched:
-                        outras_cnds.append(file_name)
-            missing_files = [f for f, found in found_files.items() if not found]
-
-            # Montar texto da coluna positiva com detalhes
-            if positive_details:
-                positiva_text = "; ".join(f"{cnd} ({tipo})" for cnd, tipo in positive_details)
+            watcher.start()
+        except OSError as e:
+            logging.error(f"Erro ao acompanhar '{folder}': {e}")
+            self.update_progress(f"Erro ao acompanhar a pasta: {e}", 0)
+            return
+        self.watcher = watcher
+
+    def stop_watch(self):
+        watcher, self.watcher = self.watcher, None
+        if watcher is not None:
+            watcher.stop()
+
+    def rescan_companies(self, watcher, folder, mode, names):
+        """Processa de novo as empresas alteradas (thread do acompanhamento)
+        e entrega as linhas novas à interface"""
+        updates = [(name, self.scanner.scan_company(folder, name, mode)) for name in names]
+        self.safe_after(lambda: self.apply_watch_updates(watcher, updates))
+
+    def apply_watch_updates(self, watcher, updates):
+        """Troca na tabela e nos cards só as linhas das empresas alteradas;
+        empresa nova vai para o fim e empresa removida sai da tabela"""
+        if watcher is not self.watcher or self.processing:
+            return
+        replacements = {}
+        added = []
+        for name, result in updates:
+            if result is None:
+                old = self.results.remove(name)
+                if old is not None:
+                    replacements[id(old)] = None
             else:
-                positiva_text = "NENHUMA"
-
-            return {
-                "empresa": subfolder_name,
-                "municipal": "SIM" if found_files["CND MUNICIPAL"] else "NÃO",
-                "rfb": "SIM" if found_files["CND RFB"] else "NÃO",
-                "fgts": "SIM" if found_files["CND FGTS"] else "NÃO",
-                "proc": "SIM" if found_files["CND PROC"] else "NÃO",
-                "estadual": "SIM" if found_files["CND ESTADUAL"] else "NÃO",
-                "positiva": positiva_text,
-                "positive_details": positive_details,
-                "outras_cnds": outras_cnds,
-                "status": "COMPLETO" if not missing_files else "INCOMPLETO",
-                "missing_files": missing_files
-            }
-        except Exception as e:
-            logging.error(f"Erro pasta '{subfolder_name}': {e}", exc_info=True)
-            return {"empresa": subfolder_name, "status": "ERRO", "outras_cnds": [], "missing_files": []}
-
-    def check_positive_cert(self, file_path, target_line):
-        """Verifica se o PDF contém certidão positiva (CPD).
-        Ignora 'Positiva com Efeitos de Negativa' (CPEND).
-        Retorna 'CPD' se positiva pura, ou None se negativa/CPEND."""
-        try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        if target_line in page_text:
-                            # Verificar se NÃO é "com efeitos de negativa"
-                            text_upper = page_text.upper()
-                            if "COM EFEITOS DE NEGATIVA" not in text_upper and "COM EFEITO DE NEGATIVA" not in text_upper:
-                                return "CPD"
-            return None
-        except Exception as e:
-            logging.warning(f"Erro PDF '{file_path}': {e}")
-            return None
-
-    def check_due_date(self, file_name):
+                old = self.results.replace(result)
+                if old is None:
+                    added.append(result)
+                else:
+                    replacements[id(old)] = result
+
+        self.filtered_data = [replacements.get(id(row), row) for row in self.filtered_data]
+        self.filtered_data = [row for row in self.filtered_data if row is not None]
+        # Com filtro ou busca ativos, empresas novas aparecem ao limpar o filtro
+        filtering = self.active_filter is not None or self.search_var.get().strip()
+        if filtering:
+            added = []
+        elif self.filtered_data:
+            self.filtered_data.extend(added)
+        self.table.patch(replacements, added)
+        if self.sort_column:
+            # As linhas trocadas podem ter mudado de posição na ordem
+            self.show_rows(keep_offset=True)
+        self.update_stats()
+
+        names = ", ".join(name for name, _ in updates)
+        self.progress_label.configure(text=f"🔄 Atualizado às {time.strftime('%H:%M:%S')}: {names}")
+        logging.info(f"Acompanhamento: {len(updates)} empresa(s) atualizada(s): {names}")
+
+    def write_scan_report(self, summary):
+        """Grava o relatório de tempos por etapa ao lado do log"""
+        if summary["total_folders"] == 0:
+            return
         try:
-            match = re.search(r"\d{2}\.\d{2}\.\d{4}", file_name)
-            if not match:
-                return "DATA NÃO ENCONTRADA"
-            date_str = match.group()
-            due_date = datetime.strptime(date_str, "%d.%m.%Y").date()
-            today = datetime.today().date()
-            return "VENCIDA" if due_date < today else "VÁLIDA"
-        except Exception as e:
-            logging.warning(f"Erro data '{file_name}': {e}")
-            return "ERRO DATA"
+            self.scan_report = self.scan_profile.write(REPORT_FILE, summary)
+            logging.info(f"Relatório de tempos gravado em {REPORT_FILE}")
+        except OSError as e:
+            self.scan_report = self.scan_profile.report(summary)
+            logging.warning(f"Erro ao gravar {REPORT_FILE}: {e}")
+        self.diagnostics_btn.configure(state="normal")
+
+    def show_diagnostics(self):
+        """Janela com os tempos por etapa, histogramas e os itens mais lentos"""
+        if not self.scan_report:
+            return
+        window = ctk.CTkToplevel(self.root)
+        window.title("Diagnóstico do processamento")
+        window.geometry("760x620")
+        window.transient(self.root)
+        textbox = ctk.CTkTextbox(window, font=ctk.CTkFont(family="Consolas", size=12),
+                                 wrap="none")
+        textbox.pack(fill="both", expand=True, padx=10, pady=10)
+        textbox.insert("1.0", format_report(self.scan_report))
+        textbox.configure(state="disabled")
+
+    # ---- histórico ----
+
+    @staticmethod
+    def format_history_date(text):
+        """'2026-10-05 08:00:00' (cnd_history) -> '05/10/2026 08:00'"""
+        return datetime.fromisoformat(text).strftime("%d/%m/%Y %H:%M") if text else ""
+
+    def show_history(self):
+        """Janela com o histórico da pasta e do modo atuais: mudanças de um
+        processamento ou de um período, a tendência das vencidas (ou
+        positivas) e a linha do tempo da empresa selecionada. Cada consulta
+        vai ao cnd_history.db pelos índices; nada é carregado por inteiro."""
+        history = self.scanner.history
+        folder = self.scanned_folder or self.folder_path.get().strip()
+        mode = self.mode_var.get()
+        runs = history.runs(folder, mode)
+        if not runs:
+            messagebox.showinfo("Histórico", "Nenhum processamento completo desta pasta "
+                                             f"foi gravado no modo {mode}.")
+            return
 
-    def process_subfolder_vencimento(self, subfolder_path, subfolder_name, expected_files):
-        found_files = {file_type: "NÃO" for file_type in expected_files}
-        outras_cnds = []
-        try:
-            for file_name in os.listdir(subfolder_path):
-                if file_name.lower().endswith('.pdf'):
-                    matched = False
-                    for file_type in expected_files:
-                        if file_type in file_name.upper():
-                            matched = True
-                            found_files[file_type] = self.check_due_date(file_name)
-                    if not matched:
-                        status_venc = self.check_due_date(file_name)
-                        outras_cnds.append(f"{file_name} ({status_venc})")
-            missing_files = [f for f, status in found_files.items() if status == "NÃO"]
-            return {
-                "empresa": subfolder_name,
-                "municipal": found_files["CND MUNICIPAL"],
-                "rfb": found_files["CND RFB"],
-                "fgts": found_files["CND FGTS"],
-                "proc": found_files["CND PROC"],
-                "estadual": found_files["CND ESTADUAL"],
-                "outras_cnds": outras_cnds,
-                "status": "COMPLETO" if not missing_files else "INCOMPLETO",
-                "missing_files": missing_files
-            }
-        except Exception as e:
-            logging.error(f"Erro pasta '{subfolder_name}': {e}", exc_info=True)
-            return {"empresa": subfolder_name, "status": "ERRO", "outras_cnds": [], "missing_files": []}
+        window = ctk.CTkToplevel(self.root)
+        window.title(f"Histórico - {folder} ({mode})")
+        window.geometry("1000x700")
+        window.transient(self.root)
+
+        run_ids = {f"{self.format_history_date(run['inicio'])} - {run['empresas']} empresas, "
+                   f"{run['mudancas']} mudanças": run["id"] for run in runs}
+        period_var = tk.StringVar(value=next(iter(self.HISTORY_PERIODS)))
+        run_var = tk.StringVar(value=next(iter(run_ids)))
+        only_var = tk.BooleanVar(value=False)
+        if mode == MODE_POSITIVA:
+            only_text, only_filter = "Só certidões positivas", {"field": "positiva"}
+            trend_flag, trend_label = FLAG_POSITIVA, "Positivas"
+        else:
+            only_text, only_filter = "Só vencidas", {"value": "VENCIDA"}
+            trend_flag, trend_label = FLAG_VENCIDA, "Vencidas"
+
+        controls = ctk.CTkFrame(window, fg_color="transparent")
+        controls.pack(fill="x", padx=10, pady=(10, 5))
+        ctk.CTkSegmentedButton(controls, values=list(self.HISTORY_PERIODS), variable=period_var,
+                               command=lambda _: refresh()).pack(side="left")
+        run_menu = ctk.CTkOptionMenu(controls, values=list(run_ids), variable=run_var, width=340,
+                                     command=lambda _: refresh())
+        run_menu.pack(side="left", padx=10)
+        ctk.CTkCheckBox(controls, text=only_text, variable=only_var,
+                        command=lambda: refresh()).pack(side="left")
+
+        count_label = ctk.CTkLabel(window, text="", anchor="w", font=ctk.CTkFont(size=11))
+        count_label.pack(fill="x", padx=12)
+
+        table_frame = ctk.CTkFrame(window)
+        table_frame.pack(fill="both", expand=True, padx=10, pady=5)
+        columns = ("Empresa", "CND", "Antes", "Depois")
+        tree = ttk.Treeview(table_frame, columns=columns, show="headings",
+                            style="Dashboard.Treeview", selectmode="browse")
+        for column, width in zip(columns, (380, 120, 200, 200)):
+            tree.heading(column, text=column)
+            tree.column(column, width=width, anchor="w" if column == "Empresa" else "center")
+        tree.tag_configure("vencida", background="#6b1a1a", foreground="white")
+        tree.tag_configure("positiva", background="#7f1d1d", foreground="#fca5a5")
+        tree.tag_configure("valida", background="#1a4d1a", foreground="white")
+        tree.pack(side="left", fill="both", expand=True)
+        scrollbar = ctk.CTkScrollbar(table_frame, command=tree.yview)
+        scrollbar.pack(side="right", fill="y")
+        tree.configure(yscrollcommand=scrollbar.set)
+
+        bottom = ctk.CTkFrame(window, fg_color="transparent", height=190)
+        bottom.pack(fill="x", padx=10, pady=(0, 10))
+        bottom.pack_propagate(False)
+        timeline = ctk.CTkLabel(bottom, text="Selecione uma mudança para ver a linha do tempo da empresa",
+                                font=ctk.CTkFont(size=11), text_color="#888888",
+                                justify="left", anchor="nw")
+        timeline.pack(side="left", fill="both", expand=True, padx=(5, 10))
+        trend_box = ctk.CTkTextbox(bottom, width=420, wrap="none",
+                                   font=ctk.CTkFont(family="Consolas", size=11))
+        trend_box.pack(side="right", fill="y")
+
+        # Tendência: marcação principal do modo nos últimos processamentos
+        trend = history.trend(folder, mode, FLAG_FIELD, trend_flag, self.HISTORY_TREND_RUNS)
+        peak = max((total for _, total in trend), default=0) or 1
+        lines = [f"{trend_label} por processamento"]
+        lines += [f"{self.format_history_date(started)}  {total:>6}  "
+                  f"{'█' * max(1 if total else 0, round(24 * total / peak))}"
+                  for started, total in trend]
+        trend_box.insert("1.0", "\n".join(lines))
+        trend_box.configure(state="disabled")
+
+        def refresh():
+            days = self.HISTORY_PERIODS[period_var.get()]
+            run_menu.configure(state="normal" if days is None else "disabled")
+            filters = only_filter if only_var.get() else {}
+            limit = self.HISTORY_VIEW_LIMIT
+            if days is None:
+                changes = history.changes(run_ids[run_var.get()], limit=limit + 1, **filters)
+            else:
+                changes = history.changes_since(folder, mode, datetime.now() - timedelta(days=days),
+                                                limit=limit + 1, **filters)
+            tree.delete(*tree.get_children())
+            for change in changes[:limit]:
+                after = change["depois"]
+                tag = ("vencida" if after == "VENCIDA" else
+                       "positiva" if change["campo"] == "positiva" and after not in (None, "NENHUMA")
+                       else "valida" if after == "VÁLIDA" else "")
+                tree.insert("", "end", values=(change["empresa"], FIELD_LABELS[change["campo"]],
+                                               change["antes"] or "—", after or "—"), tags=(tag,))
+            shown = f"as primeiras {limit} de mais de {limit}" if len(changes) > limit else len(changes)
+            count_label.configure(text=f"Mudanças: {shown} (— = empresa fora da pasta ou sem a CND)")
+
+        def on_select(event):
+            selection = tree.selection()
+            if not selection:
+                return
+            empresa = tree.item(selection[0], "values")[0]
+            periods = {}
+            for item in history.company_history(folder, mode, empresa):
+                until = (f" até {self.format_history_date(item['ate'])}" if item["ate"]
+                         else " (atual)")
+                periods.setdefault(item["campo"], []).append(
+                    f"{item['valor']} desde {self.format_history_date(item['desde'])}{until}")
+            text = "\n".join(f"{FIELD_LABELS[field]}: " + "; ".join(items[-3:])
+                             for field, items in periods.items())
+            timeline.configure(text=f"{empresa}\n{text}", text_color="white")
+
+        tree.bind("<<TreeviewSelect>>", on_select)
+        refresh()
 
     def update_progress(self, text, value):
         self.progress_label.configure(text=text)
         self.progress_bar.set(value)
 
-    def add_result_to_tree(self, result):
-        mode = self.config["mode"]
-        outras = ", ".join(result.get("outras_cnds", [])[:2]) if result.get("outras_cnds") else "-"
-        if len(result.get("outras_cnds", [])) > 2:
-            outras += f" (+{len(result.get('outras_cnds', [])) - 2})"
-
-        if mode == "Verificar Positiva":
+    def configure_columns(self):
+        """Define as colunas da tabela de acordo com o modo"""
+        if self.config["mode"] == MODE_POSITIVA:
             columns = ("Empresa", "Municipal", "RFB", "FGTS", "PROC", "Estadual", "Positiva", "Status")
-            self.tree["columns"] = columns
-            for col in columns:
-                self.tree.heading(col, text=col, command=lambda c=col: self.sort_by_column(c))
-                if col == "Empresa":
-                    width = 150
-                elif col == "Positiva":
-                    width = 180
-                else:
-                    width = 80
-                self.tree.column(col, width=width, anchor="center")
+            widths = {"Empresa": 150, "Positiva": 180}
+            default_width = 80
+        else:
+            columns = ("Empresa", "Municipal", "RFB", "FGTS", "PROC", "Estadual", "Status")
+            widths = {"Empresa": 150}
+            default_width = 90
+        widths = {col: widths.get(col, default_width) for col in columns}
+        self.table.set_columns(columns, widths, on_heading=self.sort_by_column)
+        if self.sort_column not in columns:
+            self.sort_column = None
+            self.sort_reverse = False
+        self.update_sort_headings()
+
+    def render_result_row(self, result):
+        """Valores e tag de cor de uma linha da tabela"""
+        if self.config["mode"] == MODE_POSITIVA:
             values = (result.get("empresa", ""), result.get("municipal", ""),
                       result.get("rfb", ""), result.get("fgts", ""),
                       result.get("proc", ""), result.get("estadual", ""),
                       result.get("positiva", ""), result.get("status", ""))
         else:
-            columns = ("Empresa", "Municipal", "RFB", "FGTS", "PROC", "Estadual", "Status")
-            self.tree["columns"] = columns
-            for col in columns:
-                self.tree.heading(col, text=col, command=lambda c=col: self.sort_by_column(c))
-                width = 150 if col == "Empresa" else 90
-                self.tree.column(col, width=width, anchor="center")
             values = (result.get("empresa", ""), result.get("municipal", ""),
                       result.get("rfb", ""), result.get("fgts", ""),
                       result.get("proc", ""), result.get("estadual", ""),
                       result.get("status", ""))
 
-        # Determinar tag de cor com PRIORIDADE: positiva > vencida > faltando > incompleto > completo
-        campos = [result.get("municipal"), result.get("rfb"), result.get("fgts"),
-                  result.get("proc"), result.get("estadual")]
-        status = result.get("status", "").upper()
-
-        # Verificar condições em ordem de prioridade
-        has_positiva = bool(result.get("positive_details"))
-        has_vencida = any(c == "VENCIDA" for c in campos)
-        has_faltando = any(c == "NÃO" for c in campos)
-        has_erro = status == "ERRO"
-
-        # Determinar tag pela prioridade
-        if has_positiva:
-            tag = "positiva"  # Vermelho forte - certidão positiva/falência (mais crítico)
-        elif has_vencida:
-            tag = "vencida"  # Vermelho - vencida
-        elif has_faltando:
-            tag = "faltando"  # Laranja - CND não existe
-        elif has_erro:
-            tag = "erro"  # Roxo - erro no processamento
-        elif status == "INCOMPLETO":
-            tag = "incompleto"  # Amarelo
-        elif status == "COMPLETO":
-            tag = "completo"  # Verde
-        else:
-            tag = ""
+        # Tag de cor pela prioridade (marcações calculadas na inserção no ResultStore)
+        index = self.results.index_of(result.get("empresa"))
+        tag = row_tag(self.results.flags_of(index)) if index is not None else ""
 
-        self.tree.insert("", "end", values=values, tags=(tag,) if tag else ())
+        return values, tag
 
     def processing_complete(self):
         self.processing = False
-        self.cancel_requested = False
         self.process_btn.configure(text="▶ Processar", state="normal")
         self.stop_btn.configure(text="⏹ Parar", state="disabled")
-        if self.results_data:
+        if self.results:
             self.export_btn.configure(state="normal")
             self.clear_btn.configure(state="normal")
 
     def export_report(self):
-        if not self.results_data:
+        if not self.results:
             messagebox.showwarning("Aviso", "Nenhum dado para exportar!")
             return
-        try:
-            filename = filedialog.asksaveasfilename(
-                title="Salvar Relatório",
-                defaultextension=".xlsx",
-                filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")]
-            )
-            if not filename:
-                return
-            self.create_excel_report(self.results_data, filename)
-            messagebox.showinfo("Sucesso", f"Relatório exportado!\n{filename}")
-        except Exception as e:
-            messagebox.showerror("Erro", str(e))
+        # Formato colunar: Parquet se o pyarrow estiver instalado, senão JSON Lines
+        from cnd_report import columnar_extension
+        columnar = columnar_extension()
+        columnar_name = "Parquet" if columnar == ".parquet" else "JSON Lines"
+        filename = filedialog.asksaveasfilename(
+            title="Salvar Relatório",
+            defaultextension=".xlsx",
+            filetypes=[("Excel files", "*.xlsx"), ("CSV", "*.csv"),
+                       (columnar_name, f"*{columnar}"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
 
-    def create_excel_report(self, data, filename):
-        wb = Workbook()
-        ws = wb.active
-        mode = self.config["mode"]
-        ws.title = "Relatório CND"
+        # Gera o arquivo fora da thread da interface; a lista é copiada para
+        # não ser afetada por um novo processamento ou limpeza durante a exportação
+        self.export_btn.configure(state="disabled", text="⏳ Exportando...")
+        thread = threading.Thread(target=self.write_report,
+                                  args=(list(self.results), filename, self.config["mode"]))
+        thread.daemon = True
+        thread.start()
 
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        center_alignment = Alignment(horizontal="center", vertical="center")
-        border = Border(left=Side(style="thin"), right=Side(style="thin"),
-                        top=Side(style="thin"), bottom=Side(style="thin"))
+    def write_report(self, data, filename, mode):
+        """Executa a exportação (thread de trabalho) e devolve o resultado à interface"""
+        def on_progress(written, total):
+            self.safe_after(lambda: self.update_progress(
+                f"Exportando: {written}/{total} empresas", written / total if total else 1.0))
 
-        if mode == "Verificar Positiva":
-            headers = ["Empresa", "CND MUNICIPAL", "CND RFB", "CND FGTS", "CND PROC",
-                       "CND ESTADUAL", "Certidão Positiva", "Outras CNDs", "Arquivos Faltantes", "Status"]
-        else:
-            headers = ["Empresa", "CND MUNICIPAL", "CND RFB", "CND FGTS", "CND PROC",
-                       "CND ESTADUAL", "Outras CNDs", "Arquivos Faltantes", "Status"]
-
-        # Título
-        ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(headers))
-        title_cell = ws.cell(row=1, column=1,
-                             value=f"RELATÓRIO DE CND ({mode}) - {datetime.now().strftime('%d/%m/%Y %H:%M')}")
-        title_cell.font = Font(size=14, bold=True)
-        title_cell.alignment = center_alignment
-
-        # Cabeçalhos
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=2, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = center_alignment
-            cell.border = border
-
-        # Dados
-        for row_idx, result in enumerate(data, 3):
-            outras = ", ".join(result.get("outras_cnds", [])) if result.get("outras_cnds") else "NENHUMA"
-            if mode == "Verificar Positiva":
-                row_data = [result["empresa"], result["municipal"], result["rfb"], result["fgts"],
-                            result["proc"], result["estadual"], result.get("positiva", "NENHUMA"),
-                            outras,
-                            ", ".join(result["missing_files"]) if result["missing_files"] else "NENHUM",
-                            result["status"]]
-            else:
-                row_data = [result["empresa"], result["municipal"], result["rfb"], result["fgts"],
-                            result["proc"], result["estadual"], outras,
-                            ", ".join(result["missing_files"]) if result["missing_files"] else "NENHUM",
-                            result["status"]]
-
-            for col_idx, value in enumerate(row_data, 1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.border = border
-                cell.alignment = center_alignment
-
-        # Formatação condicional
-        opcoes = ["VENCIDA", "VÁLIDA", "IMPEDIDA", "TAREFA", "NÃO"]
-        if mode == "Verificar Positiva":
-            colunas_status = [2, 3, 4, 5, 6, 10]
+        try:
+            from cnd_report import export_results
+            export_results(data, filename, mode, on_progress=on_progress)
+            logging.info(f"Relatório exportado: {filename} ({len(data)} empresas)")
+            self.safe_after(lambda: self.export_finished(f"Relatório exportado!\n{filename}"))
+        except Exception as e:
+            logging.error(f"Erro ao exportar relatório: {e}", exc_info=True)
+            self.safe_after(lambda msg=str(e): self.export_finished(msg, error=True))
+
+    def export_finished(self, message, error=False):
+        self.export_btn.configure(state="normal" if self.results and not self.processing else "disabled",
+                                  text="📥 Exportar")
+        if error:
+            self.update_progress("Erro na exportação", 0)
+            messagebox.showerror("Erro", message)
         else:
-            colunas_status = [2, 3, 4, 5, 6, 9]
-
-        cores = {
-            "VENCIDA": "FF0000", "VÁLIDA": "00FF00", "IMPEDIDA": "FFA500",
-            "TAREFA": "0000FF", "NÃO": "808080", "COMPLETO": "00FF00",
-            "INCOMPLETO": "FF0000"
-        }
-
-        for col in colunas_status:
-            col_letter = chr(64 + col)
-            dv = DataValidation(type="list", formula1=f'"{",".join(opcoes)}"', allow_blank=True)
-            ws.add_data_validation(dv)
-            dv.add(f"{col_letter}3:{col_letter}500")
-
-            for status, cor in cores.items():
-                formula = f'EXACT("{status}",${col_letter}3)'
-                rule = FormulaRule(formula=[formula],
-                                   fill=PatternFill(start_color=cor, end_color=cor, fill_type="solid"))
-                ws.conditional_formatting.add(f"{col_letter}3:{col_letter}500", rule)
-
-        wb.save(filename)
+            self.update_progress("✓ Relatório exportado", 1.0)
+            messagebox.showinfo("Sucesso", message)
 
     def run(self):
         self.root.mainloop()
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Necessário para o pool de processos no .exe
     app = CNDDashboard()
     app.run()
@@ -0,0 +1,52 @@
+"""Compara os formatos de exportação em um conjunto sintético de resultados.
+
+Gera N empresas (padrão 50 mil) com resultgen.py e grava o mesmo conjunto em
+.xlsx (write-only), .csv, .jsonl e, se o pyarrow estiver instalado,
+.parquet, medindo tempo e tamanho de cada arquivo:
+
+    python benchmarks/bench_export.py
+    python benchmarks/bench_export.py --empresas 10000 --modo positiva
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cnd_engine import MODE_POSITIVA, MODE_VENCIMENTO  # noqa: E402
+from cnd_report import export_results  # noqa: E402
+from resultgen import make_results  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--empresas", type=int, default=50000)
+    parser.add_argument("--modo", choices=("positiva", "vencimento"), default="vencimento")
+    args = parser.parse_args()
+    mode = MODE_POSITIVA if args.modo == "positiva" else MODE_VENCIMENTO
+
+    rows = make_results(args.empresas, mode)
+    extensions = [".xlsx", ".csv", ".jsonl"]
+    if importlib.util.find_spec("pyarrow"):
+        extensions.append(".parquet")
+    else:
+        print("pyarrow não instalado: Parquet fora da comparação")
+
+    print(f"{len(rows)} empresas ({mode})")
+    with tempfile.TemporaryDirectory() as folder:
+        for extension in extensions:
+            filename = os.path.join(folder, f"relatorio{extension}")
+            start = time.perf_counter()
+            export_results(rows, filename, mode)
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(filename)
+            print(f"    {extension:<9} {elapsed:>7.2f}s  {len(rows) / elapsed:>10.0f} linhas/s  "
+                  f"{size / 1024:>9.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
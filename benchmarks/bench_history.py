@@ -0,0 +1,115 @@
+"""Benchmark do histórico de processamentos (cnd_history).
+
+Grava R processamentos sintéticos de N empresas (modo vencimento, um por
+dia, com uma fração das CNDs mudando de situação a cada dia e algumas
+empresas entrando e saindo da pasta) e mede:
+
+    gravação de cada processamento e tamanho do banco
+    consultas da janela de histórico: mudanças do último processamento,
+    empresas que venceram nos últimos 7 dias, tendência de vencidas e
+    linha do tempo de uma empresa
+
+Confere as mudanças do último processamento contra a comparação direta das
+duas execuções:
+
+    python benchmarks/bench_history.py
+    python benchmarks/bench_history.py --empresas 100000 --execucoes 60
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cnd_engine import MODE_VENCIMENTO  # noqa: E402
+from cnd_history import ScanHistory, HISTORY_FIELDS, FLAG_FIELD  # noqa: E402
+from cnd_results import CompanyResult, CND_FIELDS  # noqa: E402
+from resultgen import make_results  # noqa: E402
+
+FOLDER = "Z:/000 - CONTROLE DE CND"
+
+
+def next_day(rows, rng, fraction, serial):
+    """Muda a situação de uma fração das CNDs e troca algumas empresas"""
+    for row in rng.sample(rows, int(len(rows) * fraction)):
+        if row["status"] != "ERRO":
+            field = rng.choice(CND_FIELDS)
+            row[field] = "VENCIDA" if row[field] == "VÁLIDA" else "VÁLIDA"
+    for _ in range(max(1, len(rows) // 5000)):
+        rows.pop(rng.randrange(len(rows)))
+        row = dict(rng.choice(rows))
+        row["empresa"] = f"{next(serial):06d} - EMPRESA NOVA"
+        rows.append(row)
+
+
+def state(results):
+    return {(result.get("empresa"), field): result.get(field)
+            for result in results for field in HISTORY_FIELDS}
+
+
+def timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--empresas", type=int, default=50000)
+    parser.add_argument("--execucoes", type=int, default=30)
+    parser.add_argument("--mudancas", type=float, default=0.01,
+                        help="fração das empresas com uma CND alterada por dia")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    serial = iter(range(args.empresas, 10 ** 6))
+    rows = make_results(args.empresas, MODE_VENCIMENTO, compact=False)
+    first_day = datetime(2026, 1, 1, 8, 0)
+
+    with tempfile.TemporaryDirectory() as folder:
+        db_path = os.path.join(folder, "history.db")
+        history = ScanHistory(db_path)
+        record_ms = []
+        previous = current = None
+        for day in range(args.execucoes):
+            if day:
+                next_day(rows, rng, args.mudancas, serial)
+            results = [CompanyResult.from_dict(row) for row in rows]
+            _, ms = timed(history.record_run, FOLDER, MODE_VENCIMENTO,
+                          first_day + timedelta(days=day), results, 1.0)
+            record_ms.append(ms)
+            previous, current = current, results
+        size = os.path.getsize(db_path)
+
+        print(f"{args.empresas} empresas, {args.execucoes} processamentos "
+              f"({args.mudancas:.0%} das empresas mudam por dia)")
+        print(f"  gravação: primeiro {record_ms[0]:.0f} ms, seguintes "
+              f"{sum(record_ms[1:]) / max(1, len(record_ms) - 1):.0f} ms em média; "
+              f"banco com {size / 2 ** 20:.1f} MB")
+
+        runs, ms = timed(history.runs, FOLDER, MODE_VENCIMENTO)
+        print(f"  {'processamentos':<28} {ms:7.2f} ms")
+        changes, ms = timed(history.changes, runs[0]["id"], limit=None)
+        print(f"  {'mudanças do último':<28} {ms:7.2f} ms  ({len(changes)} mudanças)")
+        week = first_day + timedelta(days=args.execucoes - 7)
+        expired, ms = timed(history.changes_since, FOLDER, MODE_VENCIMENTO, week, "VENCIDA")
+        print(f"  {'venceram em 7 dias':<28} {ms:7.2f} ms  ({len(expired)} CNDs)")
+        _, ms = timed(history.trend, FOLDER, MODE_VENCIMENTO, FLAG_FIELD, "vencida")
+        print(f"  {'tendência de vencidas':<28} {ms:7.2f} ms")
+        _, ms = timed(history.company_history, FOLDER, MODE_VENCIMENTO, rows[0]["empresa"])
+        print(f"  {'linha do tempo da empresa':<28} {ms:7.2f} ms")
+        history.close()
+
+    before, after = state(previous), state(current)
+    expected = {key for key in before.keys() | after.keys() if before.get(key) != after.get(key)}
+    if {(change["empresa"], change["campo"]) for change in changes} != expected:
+        raise SystemExit("Mudanças do último processamento diferentes da comparação direta")
+
+
+if __name__ == "__main__":
+    main()
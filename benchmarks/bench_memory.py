@@ -0,0 +1,74 @@
+"""Benchmark da memória ocupada pelos resultados de um processamento.
+
+Gera N empresas sintéticas (resultgen.py, padrão 100 mil) e mede com
+tracemalloc a memória que fica ocupada depois de montar:
+
+    dict: um dict por empresa, como o CNDScanner produzia antes
+    CompanyResult: o registro compacto com __slots__ e códigos
+
+primeiro só as linhas e depois o ResultStore completo (linhas, marcações e
+índices de nome e busca), nos dois modos:
+
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --empresas 200000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cnd_engine import MODE_POSITIVA, MODE_VENCIMENTO  # noqa: E402
+from cnd_results import CompanyResult, ResultStore  # noqa: E402
+from resultgen import make_result  # noqa: E402
+
+
+def build(count, mode, compact, store):
+    """Monta as linhas (e o ResultStore); devolve (objeto montado, bytes, segundos)"""
+    rng = random.Random(0)
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = []
+    for index in range(count):
+        result = make_result(index, mode, rng)
+        rows.append(CompanyResult.from_dict(result) if compact else result)
+    if store:
+        rows, built = ResultStore(), rows
+        rows.extend(built)
+        del built
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return rows, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--empresas", type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"{args.empresas} empresas")
+    for mode in (MODE_POSITIVA, MODE_VENCIMENTO):
+        print(f"  {mode}")
+        for store in (False, True):
+            sizes = {}
+            for compact in (False, True):
+                built, size, elapsed = build(args.empresas, mode, compact, store)
+                del built
+                sizes[compact] = size
+                name = "CompanyResult" if compact else "dict"
+                print(f"    {'ResultStore' if store else 'linhas':<11} {name:<13} "
+                      f"{size / 2**20:8.1f} MB  {size / args.empresas:6.0f} bytes/empresa  "
+                      f"({elapsed:.2f}s)")
+            print(f"    {'':<11} redução de {1 - sizes[True] / sizes[False]:.0%}")
+
+
+if __name__ == "__main__":
+    main()
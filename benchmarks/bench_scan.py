@@ -0,0 +1,180 @@
+"""Benchmark de ponta a ponta do CNDScanner nos dois modos.
+
+Gera um corpus sintético (corpusgen.py) ou usa uma pasta existente e roda o
+processamento completo de cada modo em um processo separado, com cache de
+PDFs vazio, medindo:
+
+    arquivos/s, páginas/s, empresas/s, processamento por empresa e espera
+    por vaga/fila (p50/p99, separados),
+    instante em que 50%/95%/100% das empresas ficaram prontas (a cauda é o
+    tempo gasto nos últimos 5%) e pico de memória (RSS) do processo e dos
+    processos de PDF
+
+    python benchmarks/bench_scan.py
+    python benchmarks/bench_scan.py --empresas 2000 --workers 16
+    python benchmarks/bench_scan.py --empresas 500 --pesadas 0.02 --modos positiva
+    python benchmarks/bench_scan.py --pasta "Z:/000 - CONTROLE DE CND" --modos positiva
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cnd_engine import CNDScanner, MODE_POSITIVA, MODE_VENCIMENTO, default_config  # noqa: E402
+
+MODES = {"positiva": MODE_POSITIVA, "vencimento": MODE_VENCIMENTO}
+
+
+def percentile(values, fraction):
+    """Percentil pelo método do posto mais próximo"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, round(fraction * len(ordered) + 0.5))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def peak_rss_mb():
+    """Pico de RSS (MB) deste processo e dos filhos já encerrados"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None, None
+        return psutil.Process().memory_info().peak_wset / 2 ** 20, None
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    scale = 2 ** 20 if sys.platform == "darwin" else 2 ** 10
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 2 ** 20
+    return own, children
+
+
+def run_mode(folder, mode, workers, engine, cache_folder):
+    """Executa um processamento (chamado no processo filho) e devolve as métricas"""
+    config = default_config()
+    config.update(mode=mode, incremental=False, history=False)
+    if engine:
+        config["pdf_engine"] = engine
+    scanner = CNDScanner(config, cache_path=os.path.join(cache_folder, "bench_cache.db"),
+                         history_path=os.path.join(cache_folder, "bench_history.db"))
+    finished = []
+    started = time.perf_counter()
+
+    def on_result(result, completed, total):
+        finished.append(time.perf_counter() - started)
+
+    try:
+        summary = scanner.scan(folder, mode=mode, workers=workers, on_result=on_result)
+        # Espera os processos de PDF terminarem para entrarem no RUSAGE_CHILDREN
+        if scanner.pdf_pool:
+            scanner.pdf_pool.shutdown(wait=True)
+            scanner.pdf_pool = None
+    finally:
+        scanner.close()
+    own, children = peak_rss_mb()
+    elapsed = summary["elapsed"] or 1e-9
+    latencies = list(summary["company_times"].values())
+    waits = list(summary["company_waits"].values())
+    return {
+        "modo": mode,
+        "empresas": len(summary["results"]),
+        "pdfs": summary["pdfs"],
+        "paginas": summary["pages"],
+        "segundos": elapsed,
+        "threads": summary["workers"],
+        "processos": summary["processes"],
+        "empresas_s": len(summary["results"]) / elapsed,
+        "arquivos_s": summary["pdfs"] / elapsed,
+        "paginas_s": summary["pages"] / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "espera_p50_ms": percentile(waits, 0.50) * 1000,
+        "espera_p99_ms": percentile(waits, 0.99) * 1000,
+        "t50_s": percentile(finished, 0.50),
+        "t95_s": percentile(finished, 0.95),
+        "t100_s": max(finished, default=0.0),
+        "rss_mb": own,
+        "rss_filhos_mb": children,
+        "concorrencia": summary["concurrency"],
+    }
+
+
+def run_in_subprocess(folder, mode_name, args):
+    command = [sys.executable, os.path.abspath(__file__), "--pasta", folder,
+               "--executar", mode_name]
+    if args.workers:
+        command += ["--workers", str(args.workers)]
+    if args.engine:
+        command += ["--engine", args.engine]
+    proc = subprocess.run(command, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(f"Falha no modo {mode_name}:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def print_metrics(m):
+    rss = f"{m['rss_mb']:.0f} MB" if m["rss_mb"] is not None else "n/d"
+    if m["rss_filhos_mb"]:
+        rss += f" (processos de PDF: {m['rss_filhos_mb']:.0f} MB)"
+    print(f"{m['modo']}: {m['empresas']} empresas, {m['pdfs']} PDFs, {m['paginas']} páginas "
+          f"em {m['segundos']:.2f}s ({m['threads']} threads, {m['processos']} processos)")
+    print(f"    {m['arquivos_s']:>10.1f} arquivos/s  {m['paginas_s']:>10.1f} páginas/s  "
+          f"{m['empresas_s']:>10.1f} empresas/s")
+    print(f"    processamento por empresa: p50 {m['p50_ms']:.1f} ms, p99 {m['p99_ms']:.1f} ms | "
+          f"espera por vaga/fila: p50 {m['espera_p50_ms']:.1f} ms, p99 {m['espera_p99_ms']:.1f} ms")
+    print(f"    empresas prontas: 50% em {m['t50_s']:.2f}s, 95% em {m['t95_s']:.2f}s, "
+          f"todas em {m['t100_s']:.2f}s (cauda {m['t100_s'] - m['t95_s']:.2f}s)")
+    print(f"    pico de RSS: {rss}")
+    print("    concorrência: " + ", ".join(
+        f"{stage} {sizes['inicial']} -> {sizes['final']} (máx. {sizes['maximo']})"
+        for stage, sizes in m["concorrencia"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pasta", help="Pasta principal existente (padrão: corpus sintético)")
+    parser.add_argument("--empresas", type=int, default=300)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--pesadas", type=float, default=0.0,
+                        help="Fração de empresas pesadas no corpus sintético")
+    parser.add_argument("--modos", nargs="+", choices=sorted(MODES), default=sorted(MODES))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--engine", choices=("auto", "process", "thread"), default=None,
+                        help="pdf_engine usado no modo positiva")
+    parser.add_argument("--json", action="store_true", help="Imprime as métricas em JSON")
+    parser.add_argument("--executar", choices=sorted(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.executar:
+        with tempfile.TemporaryDirectory() as cache_folder:
+            metrics = run_mode(args.pasta, MODES[args.executar], args.workers, args.engine,
+                               cache_folder)
+        print(json.dumps(metrics))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = args.pasta
+        if not folder:
+            from corpusgen import build_corpus
+            folder = os.path.join(tmp, "corpus")
+            stats = build_corpus(folder, args.empresas, args.semente, heavy=args.pesadas)
+            print("Corpus: " + ", ".join(f"{key}: {value}" for key, value in stats.items()))
+        results = [run_in_subprocess(folder, mode_name, args) for mode_name in args.modos]
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return
+    for metrics in results:
+        print_metrics(metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Benchmark da busca de empresas da tabela.
+
+Gera N resultados com nomes de empresa variados (com acentos) e simula a
+digitação de algumas buscas, uma letra por vez, medindo o tempo de cada
+tecla:
+
+    antiga: percorre todas as linhas com `texto in empresa.lower()`
+    índice: ResultStore.search (trigramas + refinamento da busca anterior)
+
+Também confere que o índice encontra as mesmas empresas que a busca antiga
+(ignorando acentos) e mede o custo de montar o índice na inserção. Falha se
+alguma tecla passar de um quadro (16,7 ms):
+
+    python benchmarks/bench_search.py
+    python benchmarks/bench_search.py --empresas 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cnd_engine import MODE_POSITIVA  # noqa: E402
+from cnd_results import CompanyResult, ResultStore, normalize_name  # noqa: E402
+from resultgen import make_results  # noqa: E402
+
+FRAME_MS = 1000 / 60
+
+WORDS = ("COMÉRCIO", "INDÚSTRIA", "SERVIÇOS", "CONSTRUÇÕES", "TRANSPORTES", "ALIMENTOS",
+         "AGROPECUÁRIA", "DISTRIBUIDORA", "LOGÍSTICA", "FARMÁCIA", "PADARIA", "AUTO PEÇAS",
+         "CONFECÇÕES", "MATERIAIS", "ELÉTRICOS", "INFORMÁTICA", "CONTABILIDADE", "ENGENHARIA",
+         "AÇÚCAR", "CAFÉ", "MÓVEIS", "CALÇADOS", "TÊXTIL", "METALÚRGICA", "CERÂMICA")
+PLACES = ("SÃO JOÃO", "SÃO PAULO", "PARANÁ", "GOIÁS", "MARINGÁ", "LONDRINA", "CASCAVEL",
+          "BRASÍLIA", "JOINVILLE", "ITAJAÍ", "CHAPECÓ", "UBERLÂNDIA", "VITÓRIA", "BELÉM")
+SURNAMES = ("SILVA", "SANTOS", "OLIVEIRA", "SOUZA", "PEREIRA", "LIMA", "CARVALHO", "GONÇALVES",
+            "ARAÚJO", "RIBEIRO", "FERNANDES", "ALMEIDA", "LOPES", "BRANDÃO", "MAGALHÃES")
+SUFFIXES = ("LTDA", "ME", "EIRELI", "S/A", "EPP")
+
+QUERIES = ("sao joao", "comercio de cafe", "goncalves", "ltda", "0417", "auto pecas maringa",
+           "açúcar", "xyz")
+
+
+def company_name(index, rng):
+    parts = [rng.choice(SURNAMES), rng.choice(WORDS)]
+    if rng.random() < 0.5:
+        parts.append(rng.choice(WORDS))
+    if rng.random() < 0.6:
+        parts.append(rng.choice(PLACES))
+    return f"{index:05d} - {' '.join(parts)} {rng.choice(SUFFIXES)}"
+
+
+def make_rows(count, seed=0):
+    rng = random.Random(seed)
+    rows = make_results(count, MODE_POSITIVA, seed, compact=False)
+    for index, row in enumerate(rows):
+        row["empresa"] = company_name(index, rng)
+    return [CompanyResult.from_dict(row) for row in rows]
+
+
+def type_queries(search):
+    """Digita cada consulta letra por letra; devolve os tempos (ms) por tecla"""
+    times = []
+    for query in QUERIES:
+        for end in range(1, len(query) + 1):
+            started = time.perf_counter()
+            search(query[:end])
+            times.append((time.perf_counter() - started) * 1000)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--empresas", type=int, default=50000)
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+
+    rows = make_rows(args.empresas, args.semente)
+    store = ResultStore()
+    started = time.perf_counter()
+    store.extend(rows)
+    build_s = time.perf_counter() - started
+
+    def old_search(text):
+        text = text.strip().lower()
+        return [r for r in rows if text in r.get("empresa", "").lower()]
+
+    # Mesmas empresas da busca antiga, comparando sem acentos dos dois lados
+    for query in QUERIES:
+        expected = [r for r in rows if normalize_name(query) in normalize_name(r["empresa"])]
+        found = store.search(query)
+        if found != expected:
+            raise SystemExit(f"Resultado diferente para {query!r}: "
+                             f"{len(found)} em vez de {len(expected)}")
+
+    print(f"{args.empresas} empresas; índice montado na inserção em {build_s * 1000:.0f} ms "
+          f"({build_s / args.empresas * 1e6:.1f} µs por empresa, "
+          f"{len(store.names.grams)} trigramas)")
+    worst = 0.0
+    for name, search in (("antiga", old_search), ("índice", store.search)):
+        store.last_search = None
+        times = sorted(type_queries(search))
+        mean = sum(times) / len(times)
+        p95 = times[int(len(times) * 0.95)]
+        print(f"  {name:<7} média {mean:6.2f} ms   p95 {p95:6.2f} ms   máx {times[-1]:6.2f} ms "
+              f"({len(times)} teclas)")
+        if name == "índice":
+            worst = times[-1]
+    if worst > FRAME_MS:
+        raise SystemExit(f"Busca acima de um quadro: {worst:.2f} ms > {FRAME_MS:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark da ordenação da tabela por coluna.
+
+Com N resultados sintéticos (resultgen.py), compara:
+
+    antiga: sorted() com str(valor).lower() a cada clique no cabeçalho
+    guardada: ResultStore.sorted_rows (primeiro clique monta a ordem da
+              coluna; os seguintes e a inversão só leem a ordem guardada)
+
+e mede a chegada de resultados durante o processamento com a tabela
+ordenada: inserção por bisseção na lista exibida contra reordenar tudo a
+cada lote. Confere que as ordens são as mesmas de um sort estável:
+
+    python benchmarks/bench_sort.py
+    python benchmarks/bench_sort.py --empresas 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cnd_engine import MODE_POSITIVA  # noqa: E402
+from cnd_results import CompanyResult, ResultStore, sort_key  # noqa: E402
+from resultgen import make_results  # noqa: E402
+
+FIELDS = ("empresa", "rfb", "status", "outras_cnds")
+BATCH = 50      # resultados por quadro da interface
+
+
+def timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def insert_sorted(rows, new_rows, key):
+    """Mesma bisseção de VirtualTable.insert_sorted (ordem crescente)"""
+    for row in new_rows:
+        row_key = key(row)
+        low, high = 0, len(rows)
+        while low < high:
+            middle = (low + high) // 2
+            if key(rows[middle]) < row_key:
+                low = middle + 1
+            else:
+                high = middle
+        rows.insert(low, row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--empresas", type=int, default=50000)
+    args = parser.parse_args()
+
+    rows = make_results(args.empresas, MODE_POSITIVA)
+    store = ResultStore()
+    store.extend(rows)
+    print(f"{args.empresas} empresas")
+
+    for field in FIELDS:
+        if field == "outras_cnds":
+            old_key = lambda r: len(r.get(field, []))  # noqa: E731
+        else:
+            old_key = lambda r: str(r.get(field, "")).lower()  # noqa: E731
+        _, old_ms = timed(sorted, rows, key=old_key)
+        first, first_ms = timed(store.sorted_rows, field)
+        _, again_ms = timed(store.sorted_rows, field)
+        _, reverse_ms = timed(store.sorted_rows, field, True)
+        expected = sorted(rows, key=lambda r: sort_key(r, field))
+        if first != expected:
+            raise SystemExit(f"Ordem diferente de um sort estável na coluna {field}")
+        print(f"  {field:<12} antiga {old_ms:7.2f} ms | guardada: 1º clique {first_ms:7.2f} ms, "
+              f"de novo {again_ms:6.2f} ms, invertida {reverse_ms:6.2f} ms")
+
+    # Chegada de resultados com a tabela ordenada por empresa (ordem inversa de chegada)
+    arriving = make_results(2000, MODE_POSITIVA, seed=1, compact=False)
+    for i, row in enumerate(arriving):
+        row["empresa"] = f"{99999 - i:05d} - NOVA {row['empresa'][8:]}"
+    arriving = [CompanyResult.from_dict(row) for row in arriving]
+    table = store.sorted_rows("empresa")
+    bisect_ms = resort_ms = 0.0
+    for start in range(0, len(arriving), BATCH):
+        batch = arriving[start:start + BATCH]
+        _, ms = timed(store.extend, batch)
+        _, insert_ms = timed(insert_sorted, table, batch,
+                             lambda row: store.row_sort_key("empresa", row))
+        bisect_ms += ms + insert_ms
+        _, ms = timed(sorted, store.rows, key=lambda r: str(r.get("empresa", "")).lower())
+        resort_ms += ms
+    if table != store.sorted_rows("empresa"):
+        raise SystemExit("Inserção por bisseção fora de ordem")
+    batches = -(-len(arriving) // BATCH)
+    print(f"  chegada de {len(arriving)} resultados em lotes de {BATCH}: bisseção "
+          f"{bisect_ms / batches:.2f} ms por lote, reordenar tudo {resort_ms / batches:.2f} ms por lote")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Conta as chamadas de sistema de listagem/stat na descoberta das pastas.
+
+Compara a forma antiga (os.listdir + os.path.isdir por entrada + novo
+os.listdir por empresa + os.stat por PDF para a chave do cache) com a
+listagem usada pelo processamento, baseada em os.scandir
+(iter_company_folders + list_company_files + DirEntry.stat). Em um
+compartilhamento SMB cada uma dessas chamadas é uma ida e volta na rede.
+
+    python benchmarks/bench_walker.py                 # árvore sintética
+    python benchmarks/bench_walker.py --empresas 2000
+    python benchmarks/bench_walker.py "Z:/000 - CONTROLE DE CND"
+
+O stat de um DirEntry é contado à parte: no Windows ele já vem na própria
+listagem e não gera chamada extra; no Linux gera um lstat na primeira vez.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cnd_engine import iter_company_folders, list_company_files  # noqa: E402
+
+CND_TYPES = ["CND MUNICIPAL", "CND RFB", "CND FGTS", "CND PROC", "CND ESTADUAL"]
+
+
+class CountingEntry:
+    """Envolve um os.DirEntry contando o primeiro stat() (o único que vai ao disco)"""
+
+    def __init__(self, entry, counter):
+        self._entry = entry
+        self._counter = counter
+        self._statted = False
+        self.name = entry.name
+        self.path = entry.path
+
+    def is_dir(self, **kwargs):
+        return self._entry.is_dir(**kwargs)
+
+    def is_file(self, **kwargs):
+        return self._entry.is_file(**kwargs)
+
+    def stat(self, **kwargs):
+        if not self._statted:
+            self._statted = True
+            self._counter["DirEntry.stat"] += 1
+        return self._entry.stat(**kwargs)
+
+
+class CountingScandir:
+    def __init__(self, iterator, counter):
+        self._iterator = iterator
+        self._counter = counter
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._iterator.close()
+
+    def __iter__(self):
+        for entry in self._iterator:
+            yield CountingEntry(entry, self._counter)
+
+
+class SyscallCounter:
+    """Substitui temporariamente as funções de os/os.path por versões que contam chamadas"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self._originals = {}
+        self._depth = 0
+
+    def _wrap(self, module, name, label):
+        original = getattr(module, name)
+        self._originals[(module, name)] = original
+
+        def wrapper(*args, **kwargs):
+            # os.path.isdir chama os.stat por dentro: conta só a chamada externa
+            if self._depth == 0:
+                self.counts[label] += 1
+            self._depth += 1
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self._depth -= 1
+        setattr(module, name, wrapper)
+
+    def __enter__(self):
+        self._wrap(os, "stat", "os.stat")
+        self._wrap(os, "lstat", "os.lstat")
+        self._wrap(os, "listdir", "os.listdir")
+        self._wrap(os.path, "isdir", "os.path.isdir")
+        self._wrap(os.path, "isfile", "os.path.isfile")
+        original_scandir = os.scandir
+        self._originals[(os, "scandir")] = original_scandir
+
+        def scandir(path="."):
+            self.counts["os.scandir"] += 1
+            return CountingScandir(original_scandir(path), self.counts)
+        os.scandir = scandir
+        return self
+
+    def __exit__(self, *exc):
+        for (module, name), original in self._originals.items():
+            setattr(module, name, original)
+
+
+def legacy_walk(main_folder, ignored_folders):
+    """Descoberta como era feita antes do os.scandir"""
+    subfolders = [f for f in os.listdir(main_folder)
+                  if os.path.isdir(os.path.join(main_folder, f))
+                  and f not in ignored_folders]
+    pdfs = 0
+    for subfolder in subfolders:
+        subfolder_path = os.path.join(main_folder, subfolder)
+        for file_name in os.listdir(subfolder_path):
+            if file_name.lower().endswith('.pdf'):
+                os.stat(os.path.join(subfolder_path, file_name))
+                pdfs += 1
+    return len(subfolders), pdfs
+
+
+def scandir_walk(main_folder, ignored_folders):
+    """Mesmas chamadas do processamento: uma listagem da pasta principal, uma
+    por empresa e o stat do DirEntry de cada PDF (lookup_verdict)"""
+    companies = pdfs = 0
+    for folder_entry in iter_company_folders(main_folder, ignored_folders):
+        companies += 1
+        for entry in list_company_files(folder_entry.path):
+            if entry.name.lower().endswith('.pdf'):
+                entry.stat()
+                pdfs += 1
+    return companies, pdfs
+
+
+def build_tree(folder, companies):
+    for i in range(companies):
+        company = os.path.join(folder, f"EMPRESA {i:05d}")
+        os.mkdir(company)
+        for cnd in CND_TYPES[:(i % 5) + 1]:
+            open(os.path.join(company, f"{cnd} 01.01.2030.pdf"), "wb").close()
+        open(os.path.join(company, "Thumbs.db"), "wb").close()
+    os.mkdir(os.path.join(folder, "001 - RFB"))
+
+
+def run(label, func, main_folder, ignored_folders):
+    with SyscallCounter() as counter:
+        start = time.perf_counter()
+        companies, pdfs = func(main_folder, ignored_folders)
+        elapsed = time.perf_counter() - start
+    counts = counter.counts
+    direct = sum(v for k, v in counts.items() if k != "DirEntry.stat")
+    print(f"{label}: {companies} empresas, {pdfs} PDFs em {elapsed * 1000:.1f} ms")
+    for name in sorted(counts):
+        print(f"    {name:<26} {counts[name]:>8}")
+    print(f"    {'total (sem DirEntry.stat)':<26} {direct:>8}")
+    print(f"    {'total (com DirEntry.stat)':<26} {direct + counts['DirEntry.stat']:>8}")
+    return direct, counts["DirEntry.stat"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pasta", nargs="?", help="Pasta principal real (padrão: árvore sintética)")
+    parser.add_argument("--empresas", type=int, default=500)
+    args = parser.parse_args()
+    ignored = ["001 - RFB"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        main_folder = args.pasta
+        if not main_folder:
+            build_tree(tmp, args.empresas)
+            main_folder = tmp
+        before, _ = run("Antes (listdir + isdir + os.stat)", legacy_walk, main_folder, ignored)
+        after, entry_stats = run("Depois (scandir + DirEntry.stat)", scandir_walk, main_folder, ignored)
+    print(f"Chamadas diretas: {before} -> {after} "
+          f"(+{entry_stats} DirEntry.stat, gratuitos no Windows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Compara o veredito de read_positive_cert com e sem o pré-filtro de bytes.
+
+Gera um conjunto de certidões de exemplo (positivas, negativas, CPEND, casos
+ambíguos, texto em strings literais/hex/octais/arrays TJ, com e sem
+compressão) e confere que o pré-filtro nunca muda o resultado. Também aceita
+uma pasta com PDFs reais para a mesma comparação:
+
+    python benchmarks/compare_prefilter.py
+    python benchmarks/compare_prefilter.py "Z:/000 - CONTROLE DE CND"
+
+Sai com código 1 se algum veredito divergir. A mesma comparação sobre o
+conjunto gerado roda nos testes (tests/test_prefilter.py).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pdfgen import TEXT_STYLES, write_pdf  # noqa: E402
+from cnd_engine import read_positive_cert  # noqa: E402
+
+TARGET_LINE = "CERTIDÃO POSITIVA DE DÉBITOS - CPD"
+
+SAMPLES = {
+    "negativa": [["MINISTÉRIO DA FAZENDA",
+                  "CERTIDÃO NEGATIVA DE DÉBITOS RELATIVOS AOS TRIBUTOS FEDERAIS",
+                  "Nome: EMPRESA EXEMPLO LTDA (MATRIZ)"]],
+    "cpd": [["MINISTÉRIO DA FAZENDA", TARGET_LINE, "Nome: EMPRESA EXEMPLO LTDA"]],
+    "cpend": [["CERTIDÃO POSITIVA COM EFEITOS DE NEGATIVA DE DÉBITOS",
+               "Nome: EMPRESA EXEMPLO LTDA"]],
+    "cpd_pagina_3": [["Relatório de situação fiscal"], ["Pendências: ver anexo"],
+                     [TARGET_LINE]],
+    "cpend_depois_cpd": [["Relatório de situação fiscal"],
+                         [TARGET_LINE, "COM EFEITOS DE NEGATIVA"]],
+    "positiva_outra": [["CERTIDÃO POSITIVA DE DÉBITOS TRABALHISTAS", "Processo 123"]],
+    "palavra_minuscula": [["Não constam pendências positivas para o contribuinte"]],
+    "crf_fgts": [["CERTIFICADO DE REGULARIDADE DO FGTS - CRF", "Validade: 01/01/2030"]],
+    "caracteres_especiais": [["EMPRESA (FILIAL) \\ TESTE ÇÃÕ", "Relatório"],
+                             ["CERTIDÃO POSITIVA DE DÉBITOS - CPD"]],
+}
+
+
+def build_corpus(folder):
+    """Grava cada exemplo em cada estilo de texto, com e sem compressão"""
+    paths = []
+    for name, pages in SAMPLES.items():
+        for style in TEXT_STYLES:
+            for compress in (True, False):
+                path = os.path.join(folder, f"{name}_{style}_{'flate' if compress else 'raw'}.pdf")
+                write_pdf(path, pages, style, compress)
+                paths.append(path)
+    return paths
+
+
+def find_pdfs(folder):
+    for root, _, files in os.walk(folder):
+        for file_name in files:
+            if file_name.lower().endswith(".pdf"):
+                yield os.path.join(root, file_name)
+
+
+def verdict(path, page_budget, prefilter):
+    """(veredito, páginas lidas); um erro de leitura também é um veredito"""
+    try:
+        verdict, pages_read, _ = read_positive_cert(path, TARGET_LINE, page_budget, prefilter)
+        return verdict, pages_read
+    except Exception as e:
+        return f"ERRO: {type(e).__name__}", 0
+
+
+def compare(paths):
+    mismatches = 0
+    skipped = 0
+    timings = {False: 0.0, True: 0.0}
+    for page_budget in (0, 1):
+        for path in paths:
+            results = {}
+            for prefilter in (False, True):
+                start = time.perf_counter()
+                results[prefilter] = verdict(path, page_budget, prefilter)
+                timings[prefilter] += time.perf_counter() - start
+            if results[True][0] != results[False][0]:
+                mismatches += 1
+                print(f"DIVERGÊNCIA (page_budget={page_budget}): {path}: "
+                      f"sem filtro={results[False][0]} com filtro={results[True][0]}")
+            elif results[True][1] == 0 and results[False][1] > 0:
+                skipped += 1
+    total = len(paths) * 2
+    print(f"{total} comparações, {mismatches} divergências, "
+          f"{skipped} PDFs descartados pelo pré-filtro")
+    print(f"Tempo sem pré-filtro: {timings[False]:.3f}s | com pré-filtro: {timings[True]:.3f}s")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pasta", nargs="?", help="Pasta com PDFs reais (padrão: exemplos gerados)")
+    args = parser.parse_args()
+
+    if args.pasta:
+        if not os.path.isdir(args.pasta):
+            parser.error(f"pasta não encontrada: {args.pasta}")
+        return 1 if compare(list(find_pdfs(args.pasta))) else 0
+    with tempfile.TemporaryDirectory() as folder:
+        return 1 if compare(build_corpus(folder)) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""Gera uma pasta principal sintética no mesmo formato do compartilhamento de CNDs.
+
+Cria N pastas de empresa com as CNDs de expected_files (nomes com data
+dd.mm.aaaa, parte delas vencidas), uma fração de CNDs faltantes, outras CNDs
+fora da lista, arquivos que não são PDF e as pastas de ignored_folders. Os
+PDFs (pdfgen.py) têm texto de certidão negativa, positiva (CPD) ou positiva
+com efeitos de negativa (CPEND), com uma ou mais páginas. Uma fração das
+empresas pode ser "pesada": PDFs longos e vários anexos das mesmas CNDs, para
+simular as pastas que atrasam o fim do processamento:
+
+    python benchmarks/corpusgen.py /tmp/cnd --empresas 500
+    python benchmarks/corpusgen.py /tmp/cnd --empresas 2000 --positivas 0.05 --paginas 4
+    python benchmarks/corpusgen.py /tmp/cnd --empresas 500 --pesadas 0.02
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cnd_engine import DEFAULT_CONFIG  # noqa: E402
+from pdfgen import TEXT_STYLES, write_pdf  # noqa: E402
+
+NEGATIVE_TITLES = {
+    "CND MUNICIPAL": "CERTIDÃO NEGATIVA DE DÉBITOS MUNICIPAIS",
+    "CND RFB": "CERTIDÃO NEGATIVA DE DÉBITOS RELATIVOS AOS TRIBUTOS FEDERAIS",
+    "CND FGTS": "CERTIFICADO DE REGULARIDADE DO FGTS - CRF",
+    "CND PROC": "CERTIDÃO NEGATIVA DE DÉBITOS TRABALHISTAS",
+    "CND ESTADUAL": "CERTIDÃO NEGATIVA DE DÉBITOS ESTADUAIS",
+}
+CPEND_TITLE = "CERTIDÃO POSITIVA COM EFEITOS DE NEGATIVA DE DÉBITOS"
+OTHER_CNDS = ("CND TRABALHISTA", "CERTIDAO FALENCIA", "CND SEFAZ DIVIDA ATIVA")
+SUFFIXES = ("LTDA", "ME", "EIRELI", "S/A", "EPP")
+
+
+def certificate_pages(kind, file_type, empresa, target_line, pages, rng, filler_lines=0):
+    """Páginas de uma certidão: kind é 'negativa', 'cpd' ou 'cpend'.
+    filler_lines acrescenta linhas de inscrições às páginas seguintes"""
+    if kind == "cpd":
+        title = target_line
+    elif kind == "cpend":
+        title = CPEND_TITLE
+    else:
+        title = NEGATIVE_TITLES.get(file_type, "CERTIDÃO NEGATIVA DE DÉBITOS")
+    first = ["MINISTÉRIO DA FAZENDA" if file_type == "CND RFB" else "PREFEITURA / SECRETARIA",
+             title,
+             f"Nome: {empresa}",
+             f"CNPJ: {rng.randint(10, 99)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}/0001-"
+             f"{rng.randint(10, 99)}",
+             "Emitida com base na Portaria Conjunta vigente."]
+    filler = [f"Inscrição {i + 1:04d} - situação regular, sem pendências" for i in range(filler_lines)]
+    extra = [[f"Página {n + 2}", "Relação de inscrições e observações", f"Empresa: {empresa}"] + filler
+             for n in range(pages - 1)]
+    return [first] + extra
+
+
+def build_corpus(folder, companies, seed=0, missing=0.1, positive=0.03, cpend=0.05,
+                 others=0.2, max_pages=3, expected_files=None, ignored_folders=None,
+                 target_line=None, today=None, heavy=0.0, heavy_pages=60, heavy_extra=10):
+    """Cria o corpus em folder e devolve contagens do que foi gerado.
+    heavy: fração de empresas com PDFs de heavy_pages páginas e heavy_extra
+    anexos extras das CNDs esperadas"""
+    rng = random.Random(seed)
+    expected_files = expected_files or DEFAULT_CONFIG["expected_files"]
+    ignored_folders = DEFAULT_CONFIG["ignored_folders"] if ignored_folders is None else ignored_folders
+    target_line = target_line or DEFAULT_CONFIG["target_line"]
+    today = today or date.today()
+    stats = {"empresas": companies, "pdfs": 0, "paginas": 0, "faltantes": 0,
+             "cpd": 0, "cpend": 0, "vencidas": 0, "outras": 0, "pesadas": 0}
+
+    os.makedirs(folder, exist_ok=True)
+    for name in ignored_folders:
+        ignored = os.path.join(folder, name)
+        os.makedirs(ignored, exist_ok=True)
+        write_pdf(os.path.join(ignored, f"CND RFB {today:%d.%m.%Y}.pdf"),
+                  [["Pasta ignorada", DEFAULT_CONFIG["target_line"]]])
+
+    for index in range(companies):
+        empresa = f"{index:05d} - EMPRESA EXEMPLO {rng.choice(SUFFIXES)}"
+        company = os.path.join(folder, empresa.replace("/", "-"))
+        os.makedirs(company, exist_ok=True)
+
+        files = [(file_type, file_type) for file_type in expected_files]
+        if rng.random() < others:
+            other = rng.choice(OTHER_CNDS)
+            files.append((other, other))
+            stats["outras"] += 1
+        # Sorteado só quando pedido, para não mudar os corpus já gerados com a mesma semente
+        is_heavy = heavy > 0 and rng.random() < heavy
+        if is_heavy:
+            stats["pesadas"] += 1
+            files += [(file_type, f"{file_type} ANEXO {n + 1}")
+                      for n, file_type in enumerate(rng.choices(expected_files, k=heavy_extra))]
+
+        for file_type, label in files:
+            if label == file_type and file_type in expected_files and rng.random() < missing:
+                stats["faltantes"] += 1
+                continue
+            due = today + timedelta(days=rng.randint(-90, 180))
+            if due < today:
+                stats["vencidas"] += 1
+            roll = rng.random()
+            kind = "cpd" if roll < positive else "cpend" if roll < positive + cpend else "negativa"
+            if kind != "negativa":
+                stats[kind] += 1
+            pages = heavy_pages if is_heavy else rng.randint(1, max_pages)
+            write_pdf(os.path.join(company, f"{label} {due:%d.%m.%Y}.pdf"),
+                      certificate_pages(kind, file_type, empresa, target_line, pages, rng,
+                                        40 if is_heavy else 0),
+                      rng.choice(TEXT_STYLES), rng.random() < 0.8)
+            stats["pdfs"] += 1
+            stats["paginas"] += pages
+
+        # Arquivos que o processamento deve ignorar
+        if rng.random() < 0.3:
+            open(os.path.join(company, "Thumbs.db"), "wb").close()
+        if rng.random() < 0.1:
+            with open(os.path.join(company, "observacoes.txt"), "w", encoding="utf-8") as f:
+                f.write("Solicitar renovação da CND municipal\n")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pasta")
+    parser.add_argument("--empresas", type=int, default=500)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--faltantes", type=float, default=0.1,
+                        help="Fração das CNDs esperadas que não existem")
+    parser.add_argument("--positivas", type=float, default=0.03, help="Fração de PDFs CPD")
+    parser.add_argument("--cpend", type=float, default=0.05, help="Fração de PDFs CPEND")
+    parser.add_argument("--paginas", type=int, default=3, help="Máximo de páginas por PDF")
+    parser.add_argument("--pesadas", type=float, default=0.0,
+                        help="Fração de empresas com PDFs longos e anexos extras")
+    parser.add_argument("--paginas-pesadas", type=int, default=60,
+                        help="Páginas de cada PDF das empresas pesadas")
+    args = parser.parse_args()
+    stats = build_corpus(args.pasta, args.empresas, args.semente, args.faltantes,
+                         args.positivas, args.cpend, max_pages=args.paginas,
+                         heavy=args.pesadas, heavy_pages=args.paginas_pesadas)
+    print(", ".join(f"{key}: {value}" for key, value in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Gerador mínimo de PDFs de teste (sem dependências externas).
+
+Produz certidões de uma ou mais páginas com fonte Helvetica/WinAnsiEncoding,
+com o texto escrito de formas diferentes no content stream (strings literais,
+arrays TJ com kerning, strings hexadecimais e escapes octais) para exercitar
+tanto o PyPDF2 quanto o pré-filtro de bytes."""
+import zlib
+
+TEXT_STYLES = ("tj", "tj_array", "hex", "octal")
+
+
+def _literal(data):
+    out = bytearray(b"(")
+    for b in data:
+        if b in b"()\\":
+            out += b"\\" + bytes([b])
+        elif b < 32 or b > 126:
+            out += b"\\%03o" % b
+        else:
+            out.append(b)
+    return bytes(out + b")")
+
+
+def _octal(data):
+    return b"(" + b"".join(b"\\%03o" % b for b in data) + b")"
+
+
+def _show_text(line, style):
+    data = line.encode("cp1252", errors="replace")
+    if style == "hex":
+        return b"<" + data.hex().upper().encode() + b"> Tj"
+    if style == "octal":
+        return _octal(data) + b" Tj"
+    if style == "tj_array":
+        # Quebra cada palavra em pedaços de 3 bytes com kerning entre eles
+        parts = [data[i:i + 3] for i in range(0, len(data), 3)]
+        return b"[" + b" -12 ".join(_literal(p) for p in parts) + b"] TJ"
+    return _literal(data) + b" Tj"
+
+
+def page_content(lines, style="tj"):
+    ops = [b"BT", b"/F1 11 Tf", b"14 TL", b"50 790 Td"]
+    for line in lines:
+        ops.append(_show_text(line, style))
+        ops.append(b"T*")
+    ops.append(b"ET")
+    return b"\n".join(ops)
+
+
+def make_pdf(pages, style="tj", compress=True):
+    """Monta um PDF. `pages` é uma lista de páginas, cada uma uma lista de linhas"""
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(None)
+    pages_obj = add(None)
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica"
+               b" /Encoding /WinAnsiEncoding >>")
+    kids = []
+    for lines in pages:
+        content = page_content(lines, style)
+        if compress:
+            content = zlib.compress(content)
+            header = b"<< /Length %d /Filter /FlateDecode >>" % len(content)
+        else:
+            header = b"<< /Length %d >>" % len(content)
+        stream = add(header + b"\nstream\n" + content + b"\nendstream")
+        kids.append(add(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842]"
+                        b" /Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+                        % (pages_obj, font, stream)))
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_obj
+    objects[pages_obj - 1] = (b"<< /Type /Pages /Kids [%s] /Count %d >>"
+                              % (b" ".join(b"%d 0 R" % k for k in kids), len(kids)))
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += (b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objects) + 1, catalog, xref))
+    return bytes(out)
+
+
+def write_pdf(path, pages, style="tj", compress=True):
+    with open(path, "wb") as f:
+        f.write(make_pdf(pages, style, compress))
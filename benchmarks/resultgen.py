@@ -0,0 +1,52 @@
+"""Gerador de resultados sintéticos (os mesmos valores produzidos pelo CNDScanner).
+
+Usado pelos benchmarks de exportação e memória sem precisar de PDFs:
+
+    from resultgen import make_results
+    rows = make_results(50000, MODE_VENCIMENTO)
+
+make_result devolve o dict de uma empresa; make_results devolve
+CompanyResult, como o CNDScanner (ou os dicts, com compact=False).
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cnd_engine import MODE_POSITIVA  # noqa: E402
+from cnd_results import CompanyResult  # noqa: E402
+
+CND_FIELDS = ("municipal", "rfb", "fgts", "proc", "estadual")
+CND_NAMES = ("CND MUNICIPAL", "CND RFB", "CND FGTS", "CND PROC", "CND ESTADUAL")
+
+
+def make_result(index, mode, rng):
+    empresa = f"{index:05d} - EMPRESA EXEMPLO {rng.choice(['LTDA', 'ME', 'EIRELI', 'S/A'])}"
+    if rng.random() < 0.01:
+        return {"empresa": empresa, "status": "ERRO", "outras_cnds": [], "missing_files": []}
+
+    if mode == MODE_POSITIVA:
+        values = [rng.choice(("SIM", "SIM", "SIM", "NÃO")) for _ in CND_FIELDS]
+    else:
+        values = [rng.choice(("VÁLIDA", "VÁLIDA", "VÁLIDA", "VENCIDA", "NÃO")) for _ in CND_FIELDS]
+    missing = [name for name, value in zip(CND_NAMES, values) if value == "NÃO"]
+    outras = [f"CND TRABALHISTA {rng.randint(1, 28):02d}.01.2026.pdf"] if rng.random() < 0.2 else []
+    result = dict(zip(CND_FIELDS, values))
+    result.update({
+        "empresa": empresa,
+        "outras_cnds": outras,
+        "status": "COMPLETO" if not missing else "INCOMPLETO",
+        "missing_files": missing,
+    })
+    if mode == MODE_POSITIVA:
+        details = [("CND RFB", "CPD")] if rng.random() < 0.05 else []
+        result["positive_details"] = details
+        result["positiva"] = "; ".join(f"{cnd} ({tipo})" for cnd, tipo in details) or "NENHUMA"
+    return result
+
+
+def make_results(count, mode, seed=0, compact=True):
+    rng = random.Random(seed)
+    results = [make_result(i, mode, rng) for i in range(count)]
+    return [CompanyResult.from_dict(result) for result in results] if compact else results
@@ -0,0 +1,97 @@
+"""Mede o tempo de importação do dashboard com `python -X importtime`.
+
+Importa o módulo (padrão: Sentry) em um processo novo várias vezes, soma o
+tempo cumulativo das importações de primeiro nível e lista os pacotes mais
+pesados (tempo próprio de todos os submódulos de cada pacote raiz). Também
+confere que os módulos adiados para o primeiro uso (matplotlib, openpyxl,
+PyPDF2) não voltaram a ser importados na abertura:
+
+    python benchmarks/startup_importtime.py
+    python benchmarks/startup_importtime.py --execucoes 10 --limite-ms 600
+    python benchmarks/startup_importtime.py --modulo sentry_cli
+
+Sai com código 1 se algum módulo adiado for importado na abertura ou se a
+mediana passar de --limite-ms.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFERRED = ("matplotlib", "openpyxl", "PyPDF2", "cnd_report")
+
+LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure(module):
+    """Retorna o tempo total (µs), {pacote raiz: µs próprios de todos os seus
+    submódulos} e o conjunto de módulos importados"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"Falha ao importar {module}:\n{proc.stderr[-2000:]}")
+    total = 0
+    packages = defaultdict(int)
+    imported = set()
+    for line in proc.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if not match:
+            continue
+        own, cumulative = int(match.group(1)), int(match.group(2))
+        indent, name = match.group(3), match.group(4)
+        imported.add(name)
+        packages[name.split(".")[0]] += own
+        # Nível zero: um espaço depois do "|"; os filhos já estão no cumulativo
+        if len(indent) == 1:
+            total += cumulative
+    return total, packages, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modulo", default="Sentry")
+    parser.add_argument("--execucoes", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--limite-ms", type=float, default=None,
+                        help="Falha se a mediana do tempo total passar deste valor")
+    args = parser.parse_args()
+
+    totals = []
+    per_package = defaultdict(list)
+    imported = set()
+    for _ in range(args.execucoes):
+        total, packages, imported = measure(args.modulo)
+        totals.append(total / 1000)
+        for name, micros in packages.items():
+            per_package[name].append(micros / 1000)
+
+    median = statistics.median(totals)
+    print(f"import {args.modulo}: mediana {median:.1f} ms "
+          f"(mín {min(totals):.1f}, máx {max(totals):.1f}, {args.execucoes} execuções)")
+    ranking = sorted(per_package.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for name, values in ranking[:args.top]:
+        print(f"    {name:<24} {statistics.median(values):>8.1f} ms")
+
+    failed = False
+    loaded = [m for m in DEFERRED
+              if any(name == m or name.startswith(m + ".") for name in imported)]
+    if loaded:
+        print(f"ERRO: importados na abertura: {', '.join(loaded)}")
+        failed = True
+    else:
+        print(f"OK: {', '.join(DEFERRED)} não são importados na abertura")
+    if args.limite_ms is not None and median > args.limite_ms:
+        print(f"ERRO: mediana {median:.1f} ms acima do limite de {args.limite_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
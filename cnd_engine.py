@@ -0,0 +1,1400 @@
+"""Motor de verificação de CNDs, sem dependência de interface gráfica.
+
+Contém tudo o que o processamento precisa (listagem das pastas, classificação
+dos nomes de arquivo, leitura dos PDFs, caches) e a classe CNDScanner, usada
+tanto pelo dashboard (Sentry.py) quanto pela linha de comando (sentry_cli.py).
+Este módulo não importa customtkinter nem matplotlib.
+"""
+import re
+import mmap
+import zlib
+from datetime import datetime, date
+import os
+import logging
+import time
+import threading
+import itertools
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import json
+import sqlite3
+import hashlib
+
+from cnd_results import CompanyResult, CND_FIELDS
+from cnd_history import ScanHistory, HISTORY_FILE
+from cnd_profile import (ScanProfile, STAGE_LISTING, STAGE_PREFILTER, STAGE_PDF_OPEN,
+                         STAGE_EXTRACT, STAGE_DUE_DATE)
+from cnd_scheduler import (AdaptiveLimiter, AdaptiveScheduler, is_network_path,
+                           LISTING_WORKERS_LOCAL, LISTING_WORKERS_NETWORK, LISTING_WORKERS_MIN)
+
+CONFIG_FILE = "cnd_config.json"
+MODE_POSITIVA = "Verificar Positiva"
+MODE_VENCIMENTO = "Verificar Vencimento"
+MODES = (MODE_POSITIVA, MODE_VENCIMENTO)
+
+# Campo do resultado -> tipo de CND em expected_files
+CND_NAMES = {"municipal": "CND MUNICIPAL", "rfb": "CND RFB", "fgts": "CND FGTS",
+             "proc": "CND PROC", "estadual": "CND ESTADUAL"}
+# Coluna do modo positiva a partir de found_files (None: CND fora de expected_files)
+CND_PRESENCE = {True: "SIM", False: "NÃO"}
+
+DEFAULT_CONFIG = {
+    "expected_files": ["CND MUNICIPAL", "CND RFB", "CND FGTS", "CND PROC", "CND ESTADUAL"],
+    "target_line": "CERTIDÃO POSITIVA DE DÉBITOS - CPD",
+    "last_folder": "",
+    "mode": MODE_POSITIVA,
+    "ignored_folders": ["001 - RFB"],
+    "pdf_engine": "auto",
+    "pdf_workers": 0,
+    "pdf_workers_max": 0,
+    "listing_workers": 0,
+    "listing_workers_max": 32,
+    "adaptive_workers": True,
+    "page_budget": 1,
+    "prefilter": True,
+    "incremental": False,
+    "watch": False,
+    "watch_poll_interval": 10,
+    "history": True
+}
+
+
+def default_config():
+    """Cópia nova da configuração padrão"""
+    return json.loads(json.dumps(DEFAULT_CONFIG))
+
+
+def load_config(config, path=CONFIG_FILE):
+    """Atualiza config (no lugar) com o conteúdo de cnd_config.json, se existir"""
+    try:
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                loaded_config = json.load(f)
+                config.update(loaded_config)
+    except Exception as e:
+        logging.error(f"Erro ao carregar configurações: {e}")
+    return config
+
+
+def save_config(config, path=CONFIG_FILE):
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2, ensure_ascii=False)
+    except Exception as e:
+        logging.error(f"Erro ao salvar configurações: {e}")
+
+
+def error_result(subfolder_name):
+    """Linha de resultado para uma pasta que não pôde ser processada"""
+    return CompanyResult(subfolder_name, "ERRO")
+
+
+CACHE_FILE = "cnd_cache.db"
+
+
+class PDFVerdictCache:
+    """Cache persistente (SQLite) do veredito de certidão positiva de cada PDF.
+
+    A chave é (caminho, target_line, page_budget), já que com a parada
+    antecipada o veredito depende de quantas páginas são lidas; o veredito só
+    é reaproveitado se o tamanho e o mtime do arquivo forem os mesmos de
+    quando foi gravado.
+    Entradas de arquivos que não aparecem mais na pasta processada são
+    removidas ao final de cada execução completa.
+
+    O mesmo cnd_cache.db pode estar aberto em outro processo (um segundo
+    dashboard, a linha de comando no Agendador de Tarefas): os vereditos
+    novos ficam em memória até flush(), que os grava numa transação curta,
+    e um erro do SQLite (banco travado, por exemplo) só vira um aviso no
+    log. A consulta que falha conta como PDF não encontrado no cache e a
+    gravação que falha é descartada; o resultado da empresa não muda."""
+
+    BUSY_TIMEOUT = 30       # segundos esperando o banco travado por outro processo
+
+    def __init__(self, db_path=CACHE_FILE):
+        self.lock = threading.Lock()
+        self.conn = None
+        self.pending = {}       # (caminho, target_line, page_budget) -> linha ainda não gravada
+        self.seen = set()
+        self.kept_folders = set()
+        self.hits = 0
+        self.misses = 0
+        try:
+            self.conn = sqlite3.connect(db_path, timeout=self.BUSY_TIMEOUT,
+                                        check_same_thread=False)
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(pdf_verdicts)")]
+            if columns and "page_budget" not in columns:
+                # Cache de uma versão sem page_budget na chave: os vereditos
+                # são lidos de novo uma vez
+                self.conn.execute("DROP TABLE pdf_verdicts")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS pdf_verdicts ("
+                " path TEXT NOT NULL,"
+                " target_line TEXT NOT NULL,"
+                " page_budget INTEGER NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " verdict TEXT,"
+                " last_seen REAL NOT NULL,"
+                " PRIMARY KEY (path, target_line, page_budget))"
+            )
+            self.conn.commit()
+        except Exception as e:
+            logging.error(f"Erro ao abrir cache de PDFs '{db_path}': {e}")
+            self.conn = None
+
+    def _rollback(self):
+        try:
+            self.conn.rollback()
+        except sqlite3.Error:
+            pass
+
+    def begin_run(self):
+        """Zera os contadores e o conjunto de arquivos vistos na execução"""
+        with self.lock:
+            self.seen = set()
+            self.kept_folders = set()
+            self.hits = 0
+            self.misses = 0
+
+    def get(self, path, size, mtime_ns, target_line, page_budget):
+        """Retorna (encontrado, veredito) para o arquivo no estado informado"""
+        with self.lock:
+            if self.conn is None:
+                return False, None
+            self.seen.add(path)
+            row = self.pending.get((path, target_line, page_budget))
+            if row is not None and row[3:5] == (size, mtime_ns):
+                self.hits += 1
+                return True, row[5]
+            try:
+                row = self.conn.execute(
+                    "SELECT verdict FROM pdf_verdicts WHERE path = ? AND target_line = ?"
+                    " AND page_budget = ? AND size = ? AND mtime_ns = ?",
+                    (path, target_line, page_budget, size, mtime_ns)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logging.warning(f"Cache de PDFs indisponível para '{path}': {e}")
+                row = None
+            if row is None:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            return True, row[0]
+
+    def put(self, path, size, mtime_ns, target_line, page_budget, verdict):
+        """Guarda o veredito em memória; vai para o banco no próximo flush()"""
+        with self.lock:
+            if self.conn is None:
+                return
+            self.seen.add(path)
+            self.pending[(path, target_line, page_budget)] = (
+                path, target_line, page_budget, size, mtime_ns, verdict, time.time())
+
+    def _write_pending(self):
+        """Grava os vereditos pendentes numa única transação curta (com o
+        lock); se o banco estiver travado, eles são descartados"""
+        if not self.pending:
+            return
+        rows = list(self.pending.values())
+        self.pending = {}
+        try:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pdf_verdicts"
+                " (path, target_line, page_budget, size, mtime_ns, verdict, last_seen)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Cache de PDFs: {len(rows)} veredito(s) não gravado(s): {e}")
+            self._rollback()
+
+    def keep_folder(self, folder):
+        """Preserva as entradas de uma pasta cujos PDFs não foram consultados
+        nesta execução (pasta reaproveitada pelo modo incremental)"""
+        with self.lock:
+            self.kept_folders.add(os.path.join(folder, ""))
+
+    def evict_missing(self, main_folder, run_started):
+        """Marca os arquivos vistos na execução e remove, dentro de main_folder,
+        as entradas de arquivos que não existem mais"""
+        prefix = os.path.join(main_folder, "")
+        with self.lock:
+            if self.conn is None:
+                return 0
+            self._write_pending()
+            now = time.time()
+            try:
+                self.conn.executemany(
+                    "UPDATE pdf_verdicts SET last_seen = ? WHERE path = ?",
+                    ((now, path) for path in self.seen)
+                )
+                self.conn.executemany(
+                    "UPDATE pdf_verdicts SET last_seen = ? WHERE substr(path, 1, ?) = ?",
+                    ((now, len(folder), folder) for folder in self.kept_folders)
+                )
+                cursor = self.conn.execute(
+                    "DELETE FROM pdf_verdicts"
+                    " WHERE substr(path, 1, ?) = ? AND last_seen < ?",
+                    (len(prefix), prefix, run_started)
+                )
+                self.conn.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"Cache de PDFs: limpeza de entradas antigas adiada: {e}")
+                self._rollback()
+                return 0
+            return cursor.rowcount
+
+    def flush(self):
+        with self.lock:
+            if self.conn is None:
+                return
+            self._write_pending()
+
+    def close(self):
+        with self.lock:
+            if self.conn is None:
+                return
+            self._write_pending()
+            self.conn.close()
+            self.conn = None
+
+
+def iter_company_folders(main_folder, ignored_folders=()):
+    """Lista as subpastas (empresas) da pasta principal com um único os.scandir.
+    O tipo de cada entrada vem da própria listagem, sem um stat por pasta."""
+    ignored = set(ignored_folders)
+    with os.scandir(main_folder) as entries:
+        for entry in entries:
+            if entry.name not in ignored and entry.is_dir():
+                yield entry
+
+
+def list_company_files(folder_path):
+    """Lista (uma única vez) os arquivos da pasta de uma empresa"""
+    with os.scandir(folder_path) as entries:
+        return [entry for entry in entries if entry.is_file()]
+
+
+def folder_fingerprint(folder_entry, files):
+    """Impressão digital de uma pasta de empresa: mtime da pasta mais nome,
+    tamanho e mtime de cada arquivo. Muda sempre que uma CND é adicionada,
+    removida, renomeada ou substituída. Usa o stat já guardado nos DirEntry
+    (gratuito no Windows, onde vem junto com a listagem)."""
+    digest = hashlib.sha1(str(folder_entry.stat().st_mtime_ns).encode())
+    for name, size, mtime_ns in sorted((f.name, f.stat().st_size, f.stat().st_mtime_ns)
+                                       for f in files):
+        digest.update(f"\0{name}\0{size}\0{mtime_ns}".encode("utf-8", "surrogateescape"))
+    return digest.hexdigest()
+
+
+class CNDClassifier:
+    """Classifica nomes de arquivo: quais tipos de CND (de expected_files) o
+    nome contém e qual a data 'dd.mm.aaaa' nele, numa única passada de uma
+    regex compilada uma vez por execução.
+
+    A alternância usa lookahead para achar tipos que se sobrepõem, e os tipos
+    contidos em outros (ex.: 'CND PROC' em 'CND PROCURADORIA') são incluídos
+    junto, reproduzindo o antigo teste `file_type in file_name.upper()`."""
+
+    DATE_PATTERN = r"\d{2}\.\d{2}\.\d{4}"
+
+    def __init__(self, expected_files, today=None):
+        self.key = tuple(expected_files)
+        self.today = today or datetime.today().date()
+        self.order = {file_type: i for i, file_type in enumerate(expected_files)}
+        types = sorted(self.order, key=len, reverse=True)
+        self.implied = {t: [o for o in types if o != t and o in t] for t in types}
+        if types:
+            alternation = "|".join(re.escape(t) for t in types)
+            self.pattern = re.compile(f"(?=({alternation}))|({self.DATE_PATTERN})")
+        else:
+            self.pattern = re.compile(f"(?!)()|({self.DATE_PATTERN})")
+
+    def classify(self, file_name):
+        """Retorna (tipos de CND na ordem de expected_files, data 'dd.mm.aaaa' ou None)"""
+        found = set()
+        date_str = None
+        for match in self.pattern.finditer(file_name.upper()):
+            file_type = match.group(1)
+            if file_type:
+                found.add(file_type)
+                found.update(self.implied[file_type])
+            elif date_str is None:
+                date_str = match.group(2)
+        if len(found) > 1:
+            return sorted(found, key=self.order.__getitem__), date_str
+        return list(found), date_str
+
+    def due_status(self, file_name, date_str):
+        """'VÁLIDA'/'VENCIDA' para a data extraída por classify"""
+        if not date_str:
+            return "DATA NÃO ENCONTRADA"
+        try:
+            due_date = date(int(date_str[6:10]), int(date_str[3:5]), int(date_str[0:2]))
+        except ValueError as e:
+            logging.warning(f"Erro data '{file_name}': {e}")
+            return "ERRO DATA"
+        return "VENCIDA" if due_date < self.today else "VÁLIDA"
+
+
+class FolderSnapshotStore:
+    """Guarda (no mesmo cnd_cache.db) o último resultado de cada pasta de
+    empresa junto com a impressão digital da pasta, para o modo incremental.
+
+    Os snapshots de uma execução ficam em memória e só são gravados em
+    save(), ao final, numa única transação."""
+
+    def __init__(self, db_path=CACHE_FILE):
+        self.conn = None
+        self.pending = {}
+        try:
+            self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS folder_snapshots ("
+                " main_folder TEXT NOT NULL,"
+                " mode TEXT NOT NULL,"
+                " subfolder TEXT NOT NULL,"
+                " fingerprint TEXT NOT NULL,"
+                " config_key TEXT NOT NULL,"
+                " scanned_on TEXT NOT NULL,"
+                " result TEXT NOT NULL,"
+                " PRIMARY KEY (main_folder, mode, subfolder))"
+            )
+            self.conn.commit()
+        except Exception as e:
+            logging.error(f"Erro ao abrir snapshots de pastas '{db_path}': {e}")
+            self.conn = None
+
+    @staticmethod
+    def config_key(config):
+        """Resume a configuração que influencia o resultado de uma pasta"""
+        relevant = [config["expected_files"], config["target_line"],
+                    config.get("page_budget", 1)]
+        return hashlib.sha1(json.dumps(relevant, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def load(self, main_folder, mode):
+        """Retorna {subpasta: (fingerprint, config_key, scanned_on, CompanyResult)}"""
+        self.pending = {}
+        if self.conn is None:
+            return {}
+        try:
+            rows = self.conn.execute(
+                "SELECT subfolder, fingerprint, config_key, scanned_on, result"
+                " FROM folder_snapshots WHERE main_folder = ? AND mode = ?",
+                (main_folder, mode)
+            ).fetchall()
+        except Exception as e:
+            logging.error(f"Erro ao ler snapshots de pastas: {e}")
+            return {}
+        snapshots = {}
+        for subfolder, fingerprint, config_key, scanned_on, result_json in rows:
+            result = CompanyResult.from_dict(json.loads(result_json))
+            snapshots[subfolder] = (fingerprint, config_key, scanned_on, result)
+        return snapshots
+
+    def record(self, subfolder, fingerprint, result):
+        self.pending[subfolder] = (fingerprint, json.dumps(result.as_dict(), ensure_ascii=False))
+
+    def save(self, main_folder, mode, config_key, current_subfolders):
+        """Grava os snapshots da execução e remove os de pastas que sumiram"""
+        if self.conn is None:
+            return
+        today = datetime.today().date().isoformat()
+        try:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO folder_snapshots"
+                " (main_folder, mode, subfolder, fingerprint, config_key, scanned_on, result)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((main_folder, mode, subfolder, fingerprint, config_key, today, result_json)
+                 for subfolder, (fingerprint, result_json) in self.pending.items())
+            )
+            stored = self.conn.execute(
+                "SELECT subfolder FROM folder_snapshots WHERE main_folder = ? AND mode = ?",
+                (main_folder, mode)
+            ).fetchall()
+            current = set(current_subfolders)
+            self.conn.executemany(
+                "DELETE FROM folder_snapshots WHERE main_folder = ? AND mode = ? AND subfolder = ?",
+                ((main_folder, mode, subfolder) for (subfolder,) in stored if subfolder not in current)
+            )
+            self.conn.commit()
+        except Exception as e:
+            logging.error(f"Erro ao salvar snapshots de pastas: {e}")
+        self.pending = {}
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+# Cabeçalhos que, sozinhos, já definem a certidão como não-CPD
+NEGATIVE_MARKERS = (
+    "CERTIDÃO NEGATIVA", "CERTIDAO NEGATIVA",
+    "COM EFEITOS DE NEGATIVA", "COM EFEITO DE NEGATIVA",
+    "CERTIFICADO DE REGULARIDADE",
+)
+
+
+def classify_page(page_text, target_line):
+    """Classifica o texto de uma página: 'CPD', 'NEGATIVA' ou None (ambígua)"""
+    if not page_text:
+        return None
+    text_upper = page_text.upper()
+    if target_line in page_text:
+        # Verificar se NÃO é "com efeitos de negativa"
+        if "COM EFEITOS DE NEGATIVA" not in text_upper and "COM EFEITO DE NEGATIVA" not in text_upper:
+            return "CPD"
+        return "NEGATIVA"
+    if any(marker in text_upper for marker in NEGATIVE_MARKERS):
+        return "NEGATIVA"
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Pré-filtro: procura, nos bytes do PDF, um trecho ASCII do target_line antes
+# de pagar pela extração de texto completa do PyPDF2. Só descarta o arquivo
+# quando é possível garantir que o texto extraído não conteria o target_line:
+# qualquer recurso que o filtro não saiba decodificar (criptografia, fontes
+# CID/ToUnicode/Differences, filtros diferentes de Flate, imagens inline)
+# faz o PDF seguir para a análise completa.
+# ---------------------------------------------------------------------------
+_STREAM_RE = re.compile(rb"(?<![A-Za-z])stream(?:\r\n|\n|\r)")
+_LENGTH_RE = re.compile(rb"/Length\s+(\d+)(?!\s+\d+\s+R)")
+_FILTER_RE = re.compile(rb"/Filter\s*(\[[^\]]*\]|/[A-Za-z0-9]+)")
+_FILTER_NAME_RE = re.compile(rb"/([A-Za-z0-9]+)")
+_SKIP_STREAM_RE = re.compile(rb"/Subtype\s*/Image|/Type\s*/XRef|/Type\s*/Metadata|/Length[123]")
+_OBJSTM_RE = re.compile(rb"/Type\s*/ObjStm")
+_UNSUPPORTED_RE = re.compile(rb"/Encrypt|/ToUnicode|/Type0|/Identity-[HV]|/Differences|/Type3")
+_INLINE_IMAGE_RE = re.compile(rb"(?<![A-Za-z0-9])BI(?![A-Za-z0-9])")
+_CONTENT_SPECIAL_RE = re.compile(rb"[(<%]")
+_LITERAL_RE = re.compile(rb"\\(?:[0-7]{1,3}|\r\n|.)|[()]", re.S)
+_HEX_STRING_RE = re.compile(rb"<([0-9A-Fa-f\s]*)>")
+_WHITESPACE_RE = re.compile(rb"\s+")
+_EOL_RE = re.compile(rb"[\r\n]")
+_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f",
+            b"\n": b"", b"\r": b"", b"\r\n": b""}
+
+
+class _PrefilterBailout(Exception):
+    """O PDF usa algo que o pré-filtro não sabe interpretar com segurança"""
+
+
+def prefilter_token(target_line):
+    """Maior trecho ASCII alfanumérico do target_line (ex.: 'POSITIVA')"""
+    words = re.findall(r"[A-Za-z0-9]+", target_line)
+    if not words:
+        return None
+    return max(words, key=len).encode("ascii")
+
+
+def _read_literal(data, pos, out):
+    """Decodifica uma string literal '(...)' a partir de pos (após o '(')"""
+    depth = 1
+    while True:
+        m = _LITERAL_RE.search(data, pos)
+        if not m:
+            out += data[pos:]
+            return len(data)
+        out += data[pos:m.start()]
+        tok = m.group()
+        if tok == b"(":
+            depth += 1
+            out += tok
+        elif tok == b")":
+            depth -= 1
+            if depth == 0:
+                return m.end()
+            out += tok
+        else:
+            esc = tok[1:]
+            if esc[:1].isdigit():
+                out.append(int(esc, 8) & 0xFF)
+            else:
+                out += _ESCAPES.get(esc, esc)
+        pos = m.end()
+
+
+def _content_strings(data, out):
+    """Acrescenta a out os bytes de todas as strings de um content stream"""
+    if _INLINE_IMAGE_RE.search(data):
+        raise _PrefilterBailout()
+    pos = 0
+    while True:
+        m = _CONTENT_SPECIAL_RE.search(data, pos)
+        if not m:
+            return
+        char = data[m.start()]
+        if char == 0x25:  # % comentário até o fim da linha
+            eol = _EOL_RE.search(data, m.end())
+            pos = eol.end() if eol else len(data)
+        elif char == 0x28:  # ( string literal
+            pos = _read_literal(data, m.end(), out)
+        elif data[m.end():m.end() + 1] == b"<":  # << dicionário
+            pos = m.end() + 1
+        else:  # <...> string hexadecimal
+            hm = _HEX_STRING_RE.match(data, m.start())
+            if not hm:
+                raise _PrefilterBailout()
+            digits = _WHITESPACE_RE.sub(b"", hm.group(1))
+            if len(digits) % 2:
+                digits += b"0"
+            out += bytes.fromhex(digits.decode("ascii"))
+            pos = hm.end()
+
+
+def _iter_streams(data):
+    """Percorre os streams do arquivo, retornando (dicionário, bytes brutos)"""
+    pos = 0
+    while True:
+        m = _STREAM_RE.search(data, pos)
+        if not m:
+            return
+        head_start = data.rfind(b"obj", 0, m.start())
+        if head_start == -1:
+            raise _PrefilterBailout()
+        head = data[head_start:m.start()]
+        start = m.end()
+        length = _LENGTH_RE.search(head)
+        end = start + int(length.group(1)) if length else -1
+        if end < 0 or data.find(b"endstream", end, end + 16) == -1:
+            end = data.find(b"endstream", start)
+            if end == -1:
+                raise _PrefilterBailout()
+        yield head, data[start:end]
+        pos = end
+
+
+def might_be_positive(file_path, target_line):
+    """Retorna False apenas se o PDF com certeza não contém o target_line.
+    Em caso de dúvida (ou erro), retorna True e o PDF segue para a análise completa."""
+    token = prefilter_token(target_line)
+    if token is None:
+        return True
+    try:
+        with open(file_path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return True
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if _UNSUPPORTED_RE.search(data):
+                    return True
+                text = bytearray()
+                for head, raw in _iter_streams(data):
+                    if _SKIP_STREAM_RE.search(head):
+                        continue
+                    filters = _FILTER_RE.search(head)
+                    names = _FILTER_NAME_RE.findall(filters.group(1)) if filters else []
+                    if not names:
+                        decoded = raw
+                    elif names in ([b"FlateDecode"], [b"Fl"]) and b"/DecodeParms" not in head:
+                        inflater = zlib.decompressobj()
+                        decoded = inflater.decompress(raw)
+                        if not inflater.eof:
+                            return True
+                    else:
+                        return True
+                    if _OBJSTM_RE.search(head):
+                        # Dicionários de fonte podem estar dentro de object streams
+                        if _UNSUPPORTED_RE.search(decoded):
+                            return True
+                        continue
+                    _content_strings(decoded, text)
+        return token in _WHITESPACE_RE.sub(b"", bytes(text))
+    except Exception:
+        return True
+
+
+def read_positive_cert(file_path, target_line, page_budget=1, prefilter=True):
+    """Analisa o PDF e retorna (veredito, páginas lidas, tempos), onde o
+    veredito é 'CPD' se for certidão positiva pura, ou None, e tempos é
+    {etapa: segundos} do pré-filtro, da abertura e da extração de texto.
+    Ignora 'Positiva com Efeitos de Negativa' (CPEND). Propaga erros de leitura.
+
+    O cabeçalho da certidão fica na primeira página: se alguma das primeiras
+    `page_budget` páginas já for conclusiva, as demais não são lidas. Só se
+    todas forem ambíguas o restante do documento é varrido em busca do CPD.
+    page_budget = 0 desliga a parada antecipada.
+
+    Com prefilter=True, PDFs descartados por might_be_positive nem chegam ao
+    PyPDF2 (páginas lidas = 0).
+
+    Fica no nível do módulo para poder ser executada no pool de processos
+    (por isso os tempos voltam no retorno em vez de irem para um ScanProfile)."""
+    timings = {}
+    if prefilter:
+        started = time.perf_counter()
+        candidate = might_be_positive(file_path, target_line)
+        timings[STAGE_PREFILTER] = time.perf_counter() - started
+        if not candidate:
+            return None, 0, timings
+    import PyPDF2  # só no primeiro PDF lido: não pesa na abertura do dashboard
+    with open(file_path, 'rb') as file:
+        started = time.perf_counter()
+        pdf_reader = PyPDF2.PdfReader(file)
+        timings[STAGE_PDF_OPEN] = time.perf_counter() - started
+        timings[STAGE_EXTRACT] = 0.0
+        pages_read = 0
+        for page in pdf_reader.pages:
+            started = time.perf_counter()
+            text = page.extract_text()
+            timings[STAGE_EXTRACT] += time.perf_counter() - started
+            verdict = classify_page(text, target_line)
+            pages_read += 1
+            if verdict == "CPD":
+                return "CPD", pages_read, timings
+            if verdict == "NEGATIVA" and pages_read <= page_budget:
+                return None, pages_read, timings
+    return None, pages_read, timings
+
+
+# Lote de PDFs pequenos lidos em uma única ida ao executor de PDFs
+PDF_BATCH_FILES = 16
+PDF_BATCH_BYTES = 256 * 1024
+
+
+def read_positive_certs(file_paths, target_line, page_budget=1, prefilter=True):
+    """read_positive_cert para um lote de PDFs: uma ida ao pool de processos
+    (ou à thread de PDF) para vários arquivos pequenos. Devolve, para cada
+    arquivo, (veredito, páginas lidas, tempos, erro); em caso de erro de
+    leitura os três primeiros são None, 0 e {} e erro é a mensagem."""
+    outcomes = []
+    for file_path in file_paths:
+        try:
+            outcomes.append(read_positive_cert(file_path, target_line, page_budget, prefilter)
+                            + (None,))
+        except Exception as e:
+            outcomes.append((None, 0, {}, str(e)))
+    return outcomes
+
+
+class CompanyJob:
+    """Uma empresa no modo positiva entre a listagem e o resultado: as CNDs
+    encontradas, os tipos de cada PDF verificado (checks), os vereditos já
+    conhecidos e os PDFs que ainda precisam ser lidos (pending). failed
+    indica que a leitura de algum PDF falhou e a empresa sai como ERRO.
+    busy soma o tempo gasto com a própria empresa (listagem e a parte dela
+    nos lotes de PDF lidos), sem as esperas por vaga e na fila"""
+    __slots__ = ("name", "found_files", "outras_cnds", "checks", "verdicts", "pending",
+                 "remaining", "started", "busy", "fingerprint", "failed")
+
+    def __init__(self, name, expected_files):
+        self.name = name
+        self.found_files = {file_type: False for file_type in expected_files}
+        self.outras_cnds = []
+        self.checks = []        # tipos de CND de cada PDF verificado, na ordem da listagem
+        self.verdicts = {}      # índice em checks -> veredito
+        self.pending = []       # (índice em checks, caminho, stat) sem veredito no cache
+        self.remaining = 0
+        self.started = 0.0
+        self.busy = 0.0
+        self.fingerprint = None
+        self.failed = False
+
+
+class ScanRun:
+    """Um processamento em andamento, consumido com async for:
+
+        run = scanner.scan_async(pasta, modo)
+        async for result in run:
+            ...
+        run.summary    # o mesmo resumo de CNDScanner.scan
+
+    summary["total_folders"] já está preenchido quando chega o primeiro
+    resultado. O processamento é interrompido cancelando a task que consome
+    o run (ou chamando run.cancel() de outra thread): as listagens e leituras
+    de PDF pendentes são canceladas e summary["cancelled"] fica True. O run
+    identifica o processamento: cancel() antes do async for faz o
+    processamento começar cancelado, e depois do fim não tem efeito."""
+
+    def __init__(self, scanner, main_folder, mode, workers, profile):
+        self.scanner = scanner
+        self.main_folder = main_folder
+        self.mode = mode
+        self.workers = workers
+        self.cancel_requested = False
+        self.finished = False       # resumo final montado; cancel() não faz mais nada
+        self.loop = None
+        self.task = None
+        self.summary = {"results": [], "total_folders": 0, "elapsed": 0.0, "workers": 0,
+                        "processes": 0, "pdfs": 0, "pages": 0, "cancelled": False,
+                        "company_times": {}, "company_waits": {}, "mode": mode, "profile": profile,
+                        "concurrency": {}, "history_run": None}
+
+    def __aiter__(self):
+        return self.scanner._iter_scan(self)
+
+    def cancel(self):
+        """Cancela a task que consome o run; pode ser chamado de qualquer thread"""
+        if self.finished:
+            return
+        self.cancel_requested = True
+        loop, task = self.loop, self.task
+        if loop is not None and task is not None:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass    # o loop terminou junto com o processamento
+
+
+class CNDScanner:
+    """Processa a pasta principal e produz um resultado (CompanyResult) por empresa.
+
+    O núcleo é assíncrono (scan_async): listagens e stat vão para um
+    executor de I/O limitado pelo scheduler, e a leitura dos PDFs para o pool
+    de processos (ou de threads, com um núcleo só). scan() é a versão
+    síncrona, com o próprio loop de eventos.
+
+    A configuração é o mesmo dict de cnd_config.json; alterações feitas nele
+    (modo, pasta, opções) valem para a próxima chamada de scan().
+
+    Cada processamento completo é gravado no histórico (cnd_history,
+    config["history"]); summary["history_run"] é o id gravado."""
+
+    def __init__(self, config, cache_path=CACHE_FILE, history_path=HISTORY_FILE):
+        self.config = config
+        self.verdict_cache = PDFVerdictCache(cache_path)
+        self.snapshot_store = FolderSnapshotStore(cache_path)
+        self.history = ScanHistory(history_path)
+        self.current_run = None
+        self.pdf_pool = None
+        self.pdf_pool_size = 0
+        self.pdf_threads = None
+        self.scheduler = None
+        self.classifier = None
+        self.counters_lock = threading.Lock()
+        self.pages_read = 0
+        self.pdfs_seen = 0
+        self.profile = ScanProfile()
+
+    def cancel(self):
+        """Pede a interrupção do último processamento criado por scan_async,
+        se ainda não terminou (de qualquer thread). Sem processamento, não faz
+        nada: para cancelar um processamento que outra thread ainda vai
+        iniciar, use o ScanRun dele (run.cancel())."""
+        run = self.current_run
+        if run is not None:
+            run.cancel()
+
+    def close(self):
+        """Cancela o que estiver rodando e libera processos e caches"""
+        self.cancel()
+        if self.pdf_pool:
+            self.pdf_pool.shutdown(wait=False, cancel_futures=True)
+            self.pdf_pool = None
+            self.pdf_pool_size = 0
+        self.verdict_cache.close()
+        self.snapshot_store.close()
+        self.history.close()
+
+    def scan(self, main_folder, mode=None, workers=None, on_result=None, profile=None):
+        """Processa todas as subpastas (empresas) de main_folder.
+
+        mode: MODE_POSITIVA ou MODE_VENCIMENTO (padrão: config["mode"]).
+        workers: número fixo de pastas listadas em paralelo (padrão:
+        adaptativo, ver build_scheduler).
+        on_result(result, completed, total): chamado na thread do
+        processamento a cada empresa concluída, na ordem de conclusão.
+        profile: ScanProfile que recebe os tempos por etapa (padrão: um novo).
+
+        Retorna um resumo: {"results", "total_folders", "elapsed", "workers",
+        "processes", "pdfs", "pages", "cancelled", "company_times",
+        "company_waits", "mode", "profile", "concurrency", "history_run"},
+        onde company_times é {empresa: segundos de processamento da própria
+        empresa (listagem e leitura dos PDFs dela)}, company_waits é
+        {empresa: segundos esperando vaga de listagem e na fila de PDFs},
+        concurrency é o tamanho inicial,
+        final e máximo de cada etapa (AdaptiveScheduler.sizes) e history_run
+        é o id do processamento no histórico (None se não foi gravado)."""
+        run = self.scan_async(main_folder, mode, workers, profile)
+
+        async def consume():
+            completed = 0
+            try:
+                async for result in run:
+                    completed += 1
+                    if on_result:
+                        on_result(result, completed, run.summary["total_folders"])
+            except asyncio.CancelledError:
+                pass
+
+        asyncio.run(consume())
+        return run.summary
+
+    def scan_async(self, main_folder, mode=None, workers=None, profile=None):
+        """Processamento assíncrono: devolve um ScanRun para async for
+        (parâmetros e resumo como em scan)"""
+        run = self.current_run = ScanRun(self, main_folder, mode or self.config["mode"], workers,
+                                         profile or ScanProfile())
+        return run
+
+    async def _iter_scan(self, run):
+        loop = asyncio.get_running_loop()
+        run.loop, run.task = loop, asyncio.current_task()
+        if run.cancel_requested:
+            run.summary["cancelled"] = True
+            self._end_run(run)
+            raise asyncio.CancelledError()
+
+        start_time = time.time()
+        main_folder, mode, summary = run.main_folder, run.mode, run.summary
+        logging.info(f"Iniciando processamento: {main_folder}")
+        expected_files = self.config["expected_files"]
+        target_line = self.config["target_line"]
+        results = summary["results"]
+        company_times = summary["company_times"]
+        company_waits = summary["company_waits"]
+        profile = self.profile = summary["profile"]
+
+        # Pipeline em três etapas, para que uma empresa com muitos PDFs grandes
+        # não atrase o fim do processamento:
+        #   1. listagem: lista e classifica cada empresa e resolve pelo cache
+        #      os PDFs que não mudaram (listdir/stat no executor de I/O, com
+        #      uma vaga da etapa "listagem");
+        #   2. PDFs (modo positiva): os demais PDFs entram em uma fila única.
+        #      Empresas com mais bytes a ler vêm primeiro e, dentro de cada
+        #      uma, os PDFs maiores; a leitura vai para o pool de processos
+        #      (ou de threads) com uma vaga da etapa "pdf";
+        #   3. quem conclui o último PDF de uma empresa monta o resultado, que
+        #      é entregue pelo async for.
+        # Tudo é coordenado no loop de eventos; quantas listagens e leituras
+        # rodam ao mesmo tempo é decidido pelo scheduler.
+        pdf_processes = self.ensure_pdf_pool() if mode == MODE_POSITIVA else 0
+        scheduler = self.scheduler = self.build_scheduler(main_folder, mode, run.workers)
+        listing = scheduler["listagem"]
+        pdf_slots = scheduler["pdf"] if mode == MODE_POSITIVA else None
+        io_threads = listing.maximum
+        io_executor = ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix="cnd-io")
+        pdf_threads = 0
+        if mode == MODE_POSITIVA and self.pdf_pool is None:
+            pdf_threads = scheduler["pdf"].maximum
+            self.pdf_threads = ThreadPoolExecutor(max_workers=pdf_threads,
+                                                  thread_name_prefix="cnd-pdf")
+
+        # Modo incremental: pastas com a mesma impressão digital da última
+        # execução reaproveitam o resultado salvo, sem reler os PDFs.
+        # No modo vencimento o resultado depende da data de hoje, então só
+        # é reaproveitado se foi calculado hoje.
+        incremental = self.config.get("incremental", False)
+        config_key = FolderSnapshotStore.config_key(self.config)
+        today = datetime.today().date().isoformat()
+        reused = []
+
+        pdf_queue = asyncio.PriorityQueue()   # (-bytes da empresa, ordem, -tamanho, CompanyJob, tarefa)
+        pdf_ready = asyncio.Event()           # pdf_queue tem PDFs esperando
+        done_queue = asyncio.Queue()          # resultados prontos, na ordem de conclusão
+        order = itertools.count()
+        tasks = []
+        finished = False
+
+        def in_io(function, *args):
+            return loop.run_in_executor(io_executor, function, *args)
+
+        def finish(subfolder, started, result, fingerprint=None, busy=None):
+            """Etapa 3: registra os tempos da empresa e entrega o resultado.
+            started: criação da task da empresa; busy: tempo de processamento
+            da própria empresa (None = tudo desde started). O restante foi
+            espera por vaga de listagem ou na fila de PDFs."""
+            total = time.perf_counter() - started
+            busy = total if busy is None else min(busy, total)
+            company_times[subfolder] = busy
+            company_waits[subfolder] = total - busy
+            profile.add_company(subfolder, busy, total - busy)
+            if fingerprint and result and result.get("status") != "ERRO":
+                self.snapshot_store.record(subfolder, fingerprint, result)
+            done_queue.put_nowait(result)
+
+        def enumerate_company(folder_entry):
+            """Etapa 1 de uma empresa, no executor de I/O: uma única listagem
+            da pasta, reaproveitada pela impressão digital e pelo
+            processamento (se falhar, o processamento lista de novo e registra
+            o erro). Devolve (resultado pronto ou CompanyJob, impressão digital)."""
+            subfolder = folder_entry.name
+            subfolder_path = folder_entry.path
+            try:
+                with profile.measure(STAGE_LISTING):
+                    files = list_company_files(subfolder_path)
+            except OSError:
+                files = None
+
+            fingerprint = None
+            if incremental and files is not None:
+                try:
+                    fingerprint = folder_fingerprint(folder_entry, files)
+                except OSError as e:
+                    logging.warning(f"Erro ao verificar alterações em '{subfolder}': {e}")
+                snapshot = snapshots.get(subfolder)
+                if (fingerprint and snapshot and snapshot[0] == fingerprint
+                        and snapshot[1] == config_key
+                        and (mode == MODE_POSITIVA or snapshot[2] == today)):
+                    reused.append(subfolder)
+                    self.verdict_cache.keep_folder(subfolder_path)
+                    return snapshot[3], fingerprint
+
+            if mode != MODE_POSITIVA:
+                return self.process_subfolder_vencimento(subfolder_path, subfolder,
+                                                         expected_files, files), fingerprint
+            try:
+                return self.enumerate_positive(subfolder_path, subfolder, expected_files,
+                                               target_line, files), fingerprint
+            except Exception as e:
+                logging.error(f"Erro pasta '{subfolder}': {e}", exc_info=True)
+                return error_result(subfolder), None
+
+        def assemble(job):
+            """Resultado de uma empresa com todos os PDFs lidos; qualquer erro
+            vira a linha ERRO da empresa, para que ela sempre seja entregue"""
+            if job.failed:
+                return error_result(job.name)
+            try:
+                return self.assemble_positive(job)
+            except Exception as e:
+                logging.error(f"Erro pasta '{job.name}': {e}", exc_info=True)
+                return error_result(job.name)
+
+        async def process_company(folder_entry):
+            """Etapas 1 e 3 (ou a entrada na fila da etapa 2) de uma empresa.
+            Um erro aqui entrega a linha ERRO: o resultado de cada empresa é
+            esperado pelo async for"""
+            subfolder = folder_entry.name
+            started = time.perf_counter()
+            busy = None
+            try:
+                async with listing.slot():
+                    listed = time.perf_counter()
+                    job, fingerprint = await in_io(enumerate_company, folder_entry)
+                    busy = time.perf_counter() - listed
+
+                if not isinstance(job, CompanyJob):
+                    finish(subfolder, started, job, fingerprint, busy)
+                elif not job.pending:
+                    finish(subfolder, started, assemble(job), fingerprint, busy)
+                else:
+                    # Etapa 2: os PDFs sem veredito no cache vão para a fila
+                    job.started = started
+                    job.busy = busy
+                    job.fingerprint = fingerprint
+                    job.remaining = len(job.pending)
+                    job_bytes = sum(st.st_size for _, _, st in job.pending)
+                    job_order = next(order)
+                    for task in job.pending:
+                        pdf_queue.put_nowait((-job_bytes, job_order, -task[2].st_size, job, task))
+                    pdf_ready.set()
+            except Exception as e:
+                logging.error(f"Erro ao processar {subfolder}: {e}", exc_info=True)
+                finish(subfolder, started, error_result(subfolder), busy=busy)
+
+        async def pdf_worker():
+            """Etapa 2: lê PDFs da fila até ser cancelado no fim do processamento.
+            PDFs pequenos seguidos na fila vão em lote (até PDF_BATCH_FILES
+            arquivos ou PDF_BATCH_BYTES bytes), para que cada um não pague
+            sozinho a ida ao executor. Se o lote falhar (leitura ou gravação
+            no cache), as empresas dele saem como ERRO e o worker continua.
+
+            A vaga da etapa "pdf" é ocupada antes de o lote sair da fila: quem
+            espera vaga não segura PDFs, então o lote lido é sempre o maior
+            da fila no momento em que a vaga sai (e não o de quando o worker
+            começou a esperar). Sem PDFs na fila, o worker espera pdf_ready
+            sem ocupar vaga."""
+            while True:
+                await pdf_ready.wait()
+                verdicts = None
+                async with pdf_slots.slot():
+                    if pdf_queue.empty():
+                        # Outro worker levou os PDFs enquanto este esperava a vaga
+                        pdf_ready.clear()
+                        continue
+                    batch = [pdf_queue.get_nowait()]
+                    batch_bytes = batch[0][-1][2].st_size
+                    while (len(batch) < PDF_BATCH_FILES and batch_bytes < PDF_BATCH_BYTES
+                           and not pdf_queue.empty()):
+                        batch.append(pdf_queue.get_nowait())
+                        batch_bytes += batch[-1][-1][2].st_size
+                    if pdf_queue.empty():
+                        pdf_ready.clear()
+                    read_started = time.perf_counter()
+                    try:
+                        verdicts = await self.analyze_pdfs_async(
+                            [(file_path, st) for *_, (_, file_path, st) in batch], target_line)
+                    except Exception as e:
+                        logging.error(f"Erro ao ler lote de {len(batch)} PDFs: {e}", exc_info=True)
+                    read_seconds = time.perf_counter() - read_started
+                if verdicts is not None:
+                    # Os vereditos do lote vão para o cache numa transação
+                    # curta, sem segurar o banco entre um lote e outro
+                    try:
+                        await in_io(self.verdict_cache.flush)
+                    except Exception as e:
+                        logging.warning(f"Cache de PDFs: lote não gravado: {e}")
+                for position, (*_, job, (index, _, st)) in enumerate(batch):
+                    # Cada PDF fica com a parte da leitura do lote proporcional ao tamanho
+                    job.busy += (read_seconds * st.st_size / batch_bytes if batch_bytes
+                                 else read_seconds / len(batch))
+                    if verdicts is None:
+                        job.failed = True
+                    else:
+                        job.verdicts[index] = verdicts[position]
+                    job.remaining -= 1
+                    if job.remaining == 0:
+                        try:
+                            finish(job.name, job.started, assemble(job), job.fingerprint, job.busy)
+                        except Exception as e:
+                            logging.error(f"Erro pasta '{job.name}': {e}", exc_info=True)
+                            finish(job.name, job.started, error_result(job.name), busy=job.busy)
+
+        scheduler.start()
+        try:
+            # Filtrar pastas ignoradas
+            ignored_folders = self.config.get("ignored_folders", [])
+
+            def list_main_folder():
+                with profile.measure(STAGE_LISTING):
+                    return list(iter_company_folders(main_folder, ignored_folders))
+
+            folder_entries = await in_io(list_main_folder)
+            subfolders = [entry.name for entry in folder_entries]
+            total_folders = len(subfolders)
+            summary["total_folders"] = total_folders
+
+            if total_folders == 0:
+                logging.warning("Nenhuma subpasta encontrada")
+                finished = True
+                self._end_run(run)
+                return
+
+            logging.info(f"Encontradas {total_folders} subpastas")
+            self.classifier = CNDClassifier(expected_files)
+            self.verdict_cache.begin_run()
+            self.pages_read = 0
+            self.pdfs_seen = 0
+            snapshots = (await in_io(self.snapshot_store.load, main_folder, mode)
+                         if incremental else {})
+
+            if mode == MODE_POSITIVA:
+                tasks += [loop.create_task(pdf_worker()) for _ in range(scheduler["pdf"].maximum)]
+            tasks += [loop.create_task(process_company(entry)) for entry in folder_entries]
+
+            # Entregar os resultados conforme ficam prontos
+            for _ in range(total_folders):
+                result = await done_queue.get()
+                results.append(result)
+                yield result
+            # Todos os resultados entregues: um cancel() daqui em diante (o
+            # botão Parar ainda está ativo) não interrompe a limpeza nem a
+            # gravação do cache e do histórico
+            finished = run.finished = True
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            io_executor.shutdown(wait=False, cancel_futures=True)
+            if self.pdf_threads:
+                self.pdf_threads.shutdown(wait=False, cancel_futures=True)
+                self.pdf_threads = None
+            scheduler.stop()
+            self.verdict_cache.flush()
+
+            summary.update(elapsed=time.time() - start_time, workers=io_threads + pdf_threads,
+                           processes=pdf_processes, pdfs=self.pdfs_seen, pages=self.pages_read,
+                           concurrency=scheduler.sizes(), cancelled=not finished)
+            if not finished:
+                logging.info("Processamento cancelado pelo usuário")
+                self._end_run(run)
+
+        elapsed_time = summary["elapsed"]
+        pool_info = f", {pdf_processes} processos" if pdf_processes else ""
+        logging.info(f"Concluído: {len(results)} empresas em {elapsed_time:.2f}s "
+                     f"(paralelo com {summary['workers']} threads{pool_info})")
+        logging.info(f"Concorrência final: {scheduler.describe()}")
+        if incremental:
+            self.snapshot_store.save(main_folder, mode, config_key, subfolders)
+            logging.info(f"Modo incremental: {len(reused)} pastas reaproveitadas, "
+                         f"{len(results) - len(reused)} reprocessadas")
+        if mode == MODE_POSITIVA:
+            removed = self.verdict_cache.evict_missing(main_folder, start_time)
+            logging.info(f"Cache de PDFs: {self.verdict_cache.hits} reaproveitados, "
+                         f"{self.verdict_cache.misses} analisados ({self.pages_read} páginas lidas), "
+                         f"{removed} removidos")
+        if self.config.get("history", True):
+            summary["history_run"] = self.history.record_run(main_folder, mode, start_time,
+                                                             results, elapsed_time)
+        self._end_run(run)
+
+    def _end_run(self, run):
+        """Marca o run como terminado; cancel() não tem mais efeito sobre ele"""
+        run.finished = True
+        if self.current_run is run:
+            self.current_run = None
+
+    def scan_company(self, main_folder, subfolder, mode=None):
+        """Processa de novo uma única empresa na thread atual (acompanhamento
+        da pasta, cnd_watch). Devolve o resultado, ou None se a pasta não
+        existe mais ou está em ignored_folders."""
+        mode = mode or self.config["mode"]
+        subfolder_path = os.path.join(main_folder, subfolder)
+        if subfolder in self.config.get("ignored_folders", []) or not os.path.isdir(subfolder_path):
+            return None
+        expected_files = self.config["expected_files"]
+        try:
+            with self.profile.measure(STAGE_LISTING):
+                files = list_company_files(subfolder_path)
+        except OSError:
+            files = None    # o processamento lista de novo e registra o erro
+        if mode == MODE_POSITIVA:
+            result = self.process_subfolder_positive(subfolder_path, subfolder, expected_files,
+                                                     self.config["target_line"], files)
+        else:
+            result = self.process_subfolder_vencimento(subfolder_path, subfolder,
+                                                       expected_files, files)
+        self.verdict_cache.flush()
+        return result
+
+    def process_subfolder_positive(self, subfolder_path, subfolder_name, expected_files, target_line,
+                                   entries=None):
+        """Processa uma empresa inteira na thread atual (listagem, PDFs e
+        resultado). entries: DirEntries da pasta já listados por
+        list_company_files (opcional)"""
+        try:
+            job = self.enumerate_positive(subfolder_path, subfolder_name, expected_files,
+                                          target_line, entries)
+            for index, file_path, st in job.pending:
+                job.verdicts[index] = self.analyze_pdf(file_path, target_line, st)
+            return self.assemble_positive(job)
+        except Exception as e:
+            logging.error(f"Erro pasta '{subfolder_name}': {e}", exc_info=True)
+            return error_result(subfolder_name)
+
+    def enumerate_positive(self, subfolder_path, subfolder_name, expected_files, target_line,
+                           entries=None):
+        """Lista e classifica os PDFs de uma empresa e resolve pelo cache os
+        que não mudaram. Os demais ficam em job.pending para analyze_pdf."""
+        job = CompanyJob(subfolder_name, expected_files)
+        classifier = self.get_classifier(expected_files)
+        if entries is None:
+            entries = list_company_files(subfolder_path)
+        pdf_count = 0
+        for entry in entries:
+            file_name = entry.name
+            if file_name.lower().endswith('.pdf'):
+                file_types, _ = classifier.classify(file_name)
+                pdf_count += 1
+                if not file_types:
+                    job.outras_cnds.append(file_name)
+                    continue
+                for file_type in file_types:
+                    job.found_files[file_type] = True
+                index = len(job.checks)
+                job.checks.append(file_types)
+                found, verdict, st = self.lookup_verdict(entry.path, target_line, entry)
+                if found:
+                    job.verdicts[index] = verdict
+                else:
+                    job.pending.append((index, entry.path, st))
+        with self.counters_lock:
+            self.pdfs_seen += pdf_count
+        return job
+
+    def assemble_positive(self, job):
+        """Monta o resultado da empresa (mesmo formato da tabela) depois que
+        todos os PDFs de job têm veredito"""
+        positive_details = []  # Lista de (tipo_cnd, tipo_positiva) ex: ("CND RFB", "FALÊNCIA")
+        for index, file_types in enumerate(job.checks):
+            verdict = job.verdicts.get(index)
+            if verdict:
+                positive_details.extend((file_type, verdict) for file_type in file_types)
+        missing_files = [f for f, found in job.found_files.items() if not found]
+        found_files = job.found_files
+
+        # O texto da coluna positiva ("CND RFB (CPD); ..." ou "NENHUMA") sai de positive_details.
+        # Colunas de CNDs fora de expected_files ficam vazias (None)
+        return CompanyResult(
+            job.name, "COMPLETO" if not missing_files else "INCOMPLETO",
+            [CND_PRESENCE.get(found_files.get(CND_NAMES[field])) for field in CND_FIELDS],
+            positive_details, job.outras_cnds, missing_files)
+
+    def lookup_verdict(self, file_path, target_line, entry=None):
+        """Retorna (encontrado, veredito, stat). Um arquivo que não pode ser
+        lido conta como encontrado, com veredito None."""
+        try:
+            st = entry.stat() if entry is not None else os.stat(file_path)
+        except OSError as e:
+            logging.warning(f"Erro PDF '{file_path}': {e}")
+            return True, None, None
+        found, verdict = self.verdict_cache.get(file_path, st.st_size, st.st_mtime_ns, target_line,
+                                                self.config.get("page_budget", 1))
+        return found, verdict, st
+
+    def analyze_pdf(self, file_path, target_line, st):
+        """Lê o PDF na thread atual e grava o veredito no cache"""
+        try:
+            verdict, pages_read, timings = read_positive_cert(file_path, target_line,
+                                                              *self.pdf_options())
+        except Exception as e:
+            logging.warning(f"Erro PDF '{file_path}': {e}")
+            return None
+        self.record_verdict(file_path, target_line, st, verdict, pages_read, timings)
+        return verdict
+
+    def analyze_pdfs(self, batch, target_line):
+        """analyze_pdf para um lote [(caminho, stat)] na thread atual"""
+        return [self.analyze_pdf(file_path, target_line, st) for file_path, st in batch]
+
+    async def analyze_pdfs_async(self, batch, target_line):
+        """Lê um lote [(caminho, stat)] e devolve os vereditos na mesma ordem;
+        quem chama já ocupa uma vaga da etapa "pdf". Com o pool de processos,
+        só a leitura vai para o processo; sem ele, a análise inteira (leitura,
+        log e cache) roda em uma thread de PDF, sem passar pelo loop. Se a
+        task for cancelada, o lote ainda não iniciado é descartado."""
+        loop = asyncio.get_running_loop()
+        pool = self.pdf_pool
+        if pool is not None:
+            args = ([file_path for file_path, _ in batch], target_line) + self.pdf_options()
+            try:
+                outcomes = await loop.run_in_executor(pool, read_positive_certs, *args)
+            except BrokenProcessPool:
+                logging.error("Pool de processos interrompido; voltando para threads")
+                if self.pdf_pool is pool:
+                    self.pdf_pool = None
+                    self.pdf_pool_size = 0
+            else:
+                verdicts = []
+                for (file_path, st), (verdict, pages_read, timings, error) in zip(batch, outcomes):
+                    if error is not None:
+                        logging.warning(f"Erro PDF '{file_path}': {error}")
+                    else:
+                        self.record_verdict(file_path, target_line, st, verdict,
+                                            pages_read, timings)
+                    verdicts.append(verdict)
+                return verdicts
+        if self.pdf_threads is None:
+            self.pdf_threads = ThreadPoolExecutor(max_workers=self.scheduler["pdf"].maximum,
+                                                  thread_name_prefix="cnd-pdf")
+        return await loop.run_in_executor(self.pdf_threads, self.analyze_pdfs,
+                                          batch, target_line)
+
+    def record_verdict(self, file_path, target_line, st, verdict, pages_read, timings):
+        """Registra a leitura de um PDF (log, contadores, tempos) e grava o
+        veredito no cache. Erros de leitura não chegam aqui, para que o
+        arquivo seja analisado de novo na próxima execução."""
+        if pages_read:
+            logging.info(f"PDF analisado: '{file_path}' ({pages_read} página(s) lidas) - {verdict or 'NEGATIVA'}")
+        else:
+            logging.info(f"PDF analisado: '{file_path}' (descartado pelo pré-filtro) - NEGATIVA")
+        with self.counters_lock:
+            self.pages_read += pages_read
+        self.profile.add_file(file_path, timings)
+        self.verdict_cache.put(file_path, st.st_size, st.st_mtime_ns, target_line,
+                               self.config.get("page_budget", 1), verdict)
+
+    def pdf_options(self):
+        """(page_budget, prefilter) da configuração, para read_positive_cert"""
+        return self.config.get("page_budget", 1), self.config.get("prefilter", True)
+
+    def pdf_worker_limits(self):
+        """(inicial, máximo) de PDFs lidos ao mesmo tempo: pdf_workers
+        (0 = um por núcleo) e pdf_workers_max (0 = dois por núcleo)"""
+        cores = os.cpu_count() or 1
+        initial = self.config.get("pdf_workers") or cores
+        if not self.config.get("adaptive_workers", True):
+            return initial, initial
+        maximum = self.config.get("pdf_workers_max") or 2 * cores
+        return initial, max(initial, maximum)
+
+    def build_scheduler(self, main_folder, mode, workers=None):
+        """Limites de concorrência da execução.
+
+        A listagem é I/O: começa em listing_workers (0 = LISTING_WORKERS_NETWORK
+        em compartilhamento de rede, LISTING_WORKERS_LOCAL em disco local) e
+        pode ir até listing_workers_max. A leitura de PDFs é CPU: começa em um
+        por núcleo (pdf_worker_limits). Com adaptive_workers desligado, ou com
+        workers informado para a listagem, o tamanho fica fixo."""
+        adaptive = self.config.get("adaptive_workers", True)
+        network = is_network_path(main_folder)
+        if workers:
+            listing = AdaptiveLimiter("listagem", workers, workers, workers, adaptive=False)
+        else:
+            initial = self.config.get("listing_workers") or (
+                LISTING_WORKERS_NETWORK if network else LISTING_WORKERS_LOCAL)
+            maximum = max(initial, self.config.get("listing_workers_max") or initial)
+            listing = AdaptiveLimiter("listagem", initial, LISTING_WORKERS_MIN, maximum, adaptive)
+        limiters = [listing]
+        if mode == MODE_POSITIVA:
+            initial, maximum = self.pdf_worker_limits()
+            if self.pdf_pool is not None:
+                maximum = min(maximum, self.pdf_pool_size)
+            limiters.append(AdaptiveLimiter("pdf", initial, 1, maximum, adaptive))
+        scheduler = AdaptiveScheduler(limiters)
+        logging.info("Concorrência inicial ({}{}): {}".format(
+            "compartilhamento de rede" if network else "disco local",
+            ", PDFs em processos" if self.pdf_pool is not None else "",
+            ", ".join(f"{limiter.name} {limiter.limit} ({limiter.minimum}-{limiter.maximum}"
+                      f"{'' if limiter.adaptive else ', fixo'})" for limiter in limiters)))
+        return scheduler
+
+    def resolve_pdf_engine(self):
+        """Define o modo de leitura dos PDFs a partir de config['pdf_engine']:
+        'thread', 'process' ou 'auto' (processos quando há mais de um núcleo)"""
+        engine = self.config.get("pdf_engine", "auto")
+        if engine == "auto":
+            engine = "process" if (os.cpu_count() or 1) > 1 else "thread"
+        return engine
+
+    def ensure_pdf_pool(self):
+        """Cria (uma única vez) o pool de processos usado na leitura dos PDFs.
+        Os processos são mantidos entre execuções e encerrados no fechamento."""
+        if self.resolve_pdf_engine() != "process":
+            return 0
+        if self.pdf_pool is None:
+            # Dimensionado para o limite máximo do scheduler; no Windows
+            # (spawn) os processos só são criados quando há PDFs para eles
+            workers = self.pdf_worker_limits()[1]
+            self.pdf_pool = ProcessPoolExecutor(max_workers=workers)
+            self.pdf_pool_size = workers
+            logging.info(f"Pool de processos para PDFs criado com até {workers} processos")
+        return self.pdf_pool_size
+
+    def get_classifier(self, expected_files):
+        """Classificador da execução atual (recriado se a lista de CNDs ou o dia mudar)"""
+        classifier = self.classifier
+        if (classifier is None or classifier.key != tuple(expected_files)
+                or classifier.today != datetime.today().date()):
+            classifier = self.classifier = CNDClassifier(expected_files)
+        return classifier
+
+    def check_due_date(self, file_name):
+        classifier = self.get_classifier(self.config["expected_files"])
+        _, date_str = classifier.classify(file_name)
+        return classifier.due_status(file_name, date_str)
+
+    def process_subfolder_vencimento(self, subfolder_path, subfolder_name, expected_files, entries=None):
+        """entries: DirEntries da pasta já listados por list_company_files (opcional)"""
+        found_files = {file_type: "NÃO" for file_type in expected_files}
+        outras_cnds = []
+        pdf_count = 0
+        try:
+            classifier = self.get_classifier(expected_files)
+            if entries is None:
+                entries = list_company_files(subfolder_path)
+            for entry in entries:
+                file_name = entry.name
+                if file_name.lower().endswith('.pdf'):
+                    started = time.perf_counter()
+                    file_types, date_str = classifier.classify(file_name)
+                    status_venc = classifier.due_status(file_name, date_str)
+                    self.profile.add(STAGE_DUE_DATE, time.perf_counter() - started)
+                    for file_type in file_types:
+                        found_files[file_type] = status_venc
+                    if not file_types:
+                        outras_cnds.append(f"{file_name} ({status_venc})")
+                    pdf_count += 1
+            missing_files = [f for f, status in found_files.items() if status == "NÃO"]
+            with self.counters_lock:
+                self.pdfs_seen += pdf_count
+            return CompanyResult(
+                subfolder_name, "COMPLETO" if not missing_files else "INCOMPLETO",
+                [found_files.get(CND_NAMES[field]) for field in CND_FIELDS],
+                outras_cnds=outras_cnds, missing_files=missing_files)
+        except Exception as e:
+            logging.error(f"Erro pasta '{subfolder_name}': {e}", exc_info=True)
+            return error_result(subfolder_name)
@@ -0,0 +1,341 @@
+"""Histórico dos processamentos (sem interface gráfica).
+
+Cada processamento completo é gravado em cnd_history.db (SQLite), por pasta
+principal e modo, sem guardar de novo o que não mudou: para cada empresa e
+campo (status, cada CND, positiva) há um intervalo de validade, do
+processamento em que o valor apareceu (from_run) até aquele em que mudou ou
+sumiu (to_run, vazio enquanto é o valor atual). Um processamento grava só os
+intervalos que abrem e fecham, mais as contagens de cada valor e marcação,
+que respondem às tendências sem ler as empresas. Os valores atuais de cada
+empresa também ficam juntos em companies.state, para que a gravação compare
+uma empresa sem mudanças com uma única comparação de texto.
+
+As consultas usam os índices por empresa/campo e por processamento:
+
+- changes: o que mudou entre dois processamentos (antes/depois);
+- changes_since: o que mudou desde uma data, opcionalmente só o que passou
+  a ter um valor ("quais venceram esta semana");
+- trend: quantidade de um valor ou marcação em cada processamento;
+- company_history: a linha do tempo de uma empresa.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from cnd_results import CND_FIELDS, FLAGS, result_flags
+
+HISTORY_FILE = "cnd_history.db"
+
+# Campos guardados de cada empresa; o código de cada campo no banco é o índice
+HISTORY_FIELDS = ("status",) + CND_FIELDS + ("positiva",)
+FIELD_CODES = {field: code for code, field in enumerate(HISTORY_FIELDS)}
+FIELD_LABELS = {"status": "Status", "municipal": "Municipal", "rfb": "RFB", "fgts": "FGTS",
+                "proc": "PROC", "estadual": "Estadual", "positiva": "Positiva"}
+
+# Campo das contagens de marcações (cnd_results.FLAGS) em run_counts
+FLAG_FIELD = "marcacao"
+
+# Separador dos valores em companies.state (valor vazio = campo ausente)
+STATE_SEPARATOR = "\x1f"
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS scopes ("
+    " id INTEGER PRIMARY KEY,"
+    " main_folder TEXT NOT NULL,"
+    " mode TEXT NOT NULL,"
+    " UNIQUE (main_folder, mode))",
+    "CREATE TABLE IF NOT EXISTS runs ("
+    " id INTEGER PRIMARY KEY,"
+    " scope_id INTEGER NOT NULL,"
+    " started TEXT NOT NULL,"
+    " elapsed REAL,"
+    " companies INTEGER NOT NULL,"
+    " changes INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS runs_scope ON runs (scope_id, started)",
+    "CREATE TABLE IF NOT EXISTS companies ("
+    " id INTEGER PRIMARY KEY,"
+    " scope_id INTEGER NOT NULL,"
+    " name TEXT NOT NULL,"
+    " state TEXT,"
+    " UNIQUE (scope_id, name))",
+    "CREATE TABLE IF NOT EXISTS states ("
+    " company_id INTEGER NOT NULL,"
+    " field INTEGER NOT NULL,"
+    " value TEXT NOT NULL,"
+    " from_run INTEGER NOT NULL,"
+    " to_run INTEGER,"
+    " PRIMARY KEY (company_id, field, from_run)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS states_from ON states (from_run)",
+    "CREATE INDEX IF NOT EXISTS states_to ON states (to_run) WHERE to_run IS NOT NULL",
+    "CREATE TABLE IF NOT EXISTS run_counts ("
+    " run_id INTEGER NOT NULL,"
+    " field TEXT NOT NULL,"
+    " value TEXT NOT NULL,"
+    " total INTEGER NOT NULL,"
+    " PRIMARY KEY (run_id, field, value)) WITHOUT ROWID",
+)
+
+# Empresa/campo com algum intervalo aberto ou fechado entre :since (exclusive)
+# e :run (inclusive), com o valor em cada um dos dois processamentos. O CROSS
+# JOIN mantém states (pelos índices de from_run/to_run) no laço externo, em
+# vez de percorrer todas as empresas da pasta.
+_CHANGES = """
+WITH touched AS (
+    SELECT s.company_id, s.field FROM states s CROSS JOIN companies c ON c.id = s.company_id
+    WHERE s.from_run > :since AND s.from_run <= :run AND c.scope_id = :scope
+    UNION
+    SELECT s.company_id, s.field FROM states s CROSS JOIN companies c ON c.id = s.company_id
+    WHERE s.to_run > :since AND s.to_run <= :run AND c.scope_id = :scope
+), diff AS MATERIALIZED (
+    SELECT t.company_id, t.field,
+        (SELECT value FROM states s
+         WHERE s.company_id = t.company_id AND s.field = t.field AND s.from_run <= :since
+           AND (s.to_run IS NULL OR s.to_run > :since)
+         ORDER BY s.from_run DESC LIMIT 1) AS before,
+        (SELECT value FROM states s
+         WHERE s.company_id = t.company_id AND s.field = t.field AND s.from_run <= :run
+           AND (s.to_run IS NULL OR s.to_run > :run)
+         ORDER BY s.from_run DESC LIMIT 1) AS after
+    FROM touched t
+)
+SELECT c.name, d.field, d.before, d.after
+FROM diff d JOIN companies c ON c.id = d.company_id
+WHERE d.before IS NOT d.after {where}
+ORDER BY c.name, d.field
+LIMIT :limit
+"""
+
+
+def _timestamp(moment):
+    """Data/hora (datetime ou time.time()) no formato gravado em runs.started"""
+    if not isinstance(moment, datetime):
+        moment = datetime.fromtimestamp(moment)
+    return moment.isoformat(sep=" ", timespec="seconds")
+
+
+class ScanHistory:
+    """Histórico em SQLite, seguro para várias threads (um lock na conexão)"""
+
+    def __init__(self, db_path=HISTORY_FILE):
+        self.lock = threading.Lock()
+        self.conn = None
+        try:
+            self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+            for statement in _SCHEMA:
+                self.conn.execute(statement)
+            self.conn.commit()
+        except Exception as e:
+            logging.error(f"Erro ao abrir histórico '{db_path}': {e}")
+            self.conn = None
+
+    def _scope(self, main_folder, mode, create=False):
+        row = self.conn.execute("SELECT id FROM scopes WHERE main_folder = ? AND mode = ?",
+                                (main_folder, mode)).fetchone()
+        if row is not None:
+            return row[0]
+        if not create:
+            return None
+        return self.conn.execute("INSERT INTO scopes (main_folder, mode) VALUES (?, ?)",
+                                 (main_folder, mode)).lastrowid
+
+    def record_run(self, main_folder, mode, started, results, elapsed=None):
+        """Grava um processamento completo (results: os resultados de todas as
+        empresas). Devolve o id do processamento, ou None se não foi gravado."""
+        with self.lock:
+            if self.conn is None:
+                return None
+            begun = time.perf_counter()
+            try:
+                scope_id = self._scope(main_folder, mode, create=True)
+                run_id = self.conn.execute(
+                    "INSERT INTO runs (scope_id, started, elapsed, companies, changes)"
+                    " VALUES (?, ?, ?, ?, 0)",
+                    (scope_id, _timestamp(started), elapsed, len(results))
+                ).lastrowid
+                # nome -> (id, valores atuais); state None: empresa fora da pasta
+                companies = {name: (company_id, state) for name, company_id, state in
+                             self.conn.execute("SELECT name, id, state FROM companies"
+                                               " WHERE scope_id = ?", (scope_id,))}
+                absent = [None] * len(HISTORY_FIELDS)
+                opened, closed, states = [], [], []
+                combinations = Counter()
+                flag_sets = Counter()
+                for result in results:
+                    values = [result.get(field) or None for field in HISTORY_FIELDS]
+                    state = STATE_SEPARATOR.join(value or "" for value in values)
+                    combinations[state] += 1
+                    flag_sets[result_flags(result)] += 1
+                    name = result.get("empresa")
+                    company_id, old_state = companies.pop(name, (None, None))
+                    if company_id is None:
+                        company_id = self.conn.execute(
+                            "INSERT INTO companies (scope_id, name, state) VALUES (?, ?, ?)",
+                            (scope_id, name, state)).lastrowid
+                    elif old_state == state:
+                        continue
+                    else:
+                        states.append((state, company_id))
+                    old_values = (absent if old_state is None else
+                                  [value or None for value in old_state.split(STATE_SEPARATOR)])
+                    for code, (old, value) in enumerate(zip(old_values, values)):
+                        if old != value:
+                            if old is not None:
+                                closed.append((run_id, company_id, code))
+                            if value is not None:
+                                opened.append((company_id, code, value, run_id))
+                # Empresas que sumiram da pasta
+                for company_id, old_state in companies.values():
+                    if old_state is not None:
+                        states.append((None, company_id))
+                        closed.extend((run_id, company_id, code) for code, value in
+                                      enumerate(old_state.split(STATE_SEPARATOR)) if value)
+
+                # Contagens por valor e por marcação, a partir das combinações distintas
+                counts = Counter()
+                for state, total in combinations.items():
+                    for field, value in zip(HISTORY_FIELDS, state.split(STATE_SEPARATOR)):
+                        if value:
+                            counts[field, value] += total
+                for flags, total in flag_sets.items():
+                    for flag in flags:
+                        counts[FLAG_FIELD, flag] += total
+
+                self.conn.executemany("UPDATE companies SET state = ? WHERE id = ?", states)
+                self.conn.executemany(
+                    "UPDATE states SET to_run = ?"
+                    " WHERE company_id = ? AND field = ? AND to_run IS NULL", closed)
+                self.conn.executemany(
+                    "INSERT INTO states (company_id, field, value, from_run) VALUES (?, ?, ?, ?)",
+                    opened)
+                self.conn.executemany(
+                    "INSERT INTO run_counts (run_id, field, value, total) VALUES (?, ?, ?, ?)",
+                    ((run_id, field, value, total) for (field, value), total in counts.items()))
+                changes = len({key[1:] for key in closed} | {key[:2] for key in opened})
+                self.conn.execute("UPDATE runs SET changes = ? WHERE id = ?", (changes, run_id))
+                self.conn.commit()
+            except Exception as e:
+                self.conn.rollback()
+                logging.error(f"Erro ao gravar histórico: {e}", exc_info=True)
+                return None
+        logging.info(f"Histórico: processamento {run_id} gravado ({changes} mudanças) "
+                     f"em {time.perf_counter() - begun:.2f}s")
+        return run_id
+
+    def runs(self, main_folder, mode, limit=50):
+        """Processamentos gravados da pasta e modo, do mais recente ao mais antigo"""
+        with self.lock:
+            if self.conn is None:
+                return []
+            scope_id = self._scope(main_folder, mode)
+            rows = self.conn.execute(
+                "SELECT id, started, elapsed, companies, changes FROM runs"
+                " WHERE scope_id = ? ORDER BY started DESC, id DESC LIMIT ?",
+                (scope_id, limit)).fetchall()
+        return [{"id": run_id, "inicio": started, "duracao": elapsed, "empresas": companies,
+                 "mudancas": changes} for run_id, started, elapsed, companies, changes in rows]
+
+    def _previous(self, run_id, scope_id):
+        row = self.conn.execute(
+            "SELECT max(id) FROM runs WHERE scope_id = ? AND id < ?", (scope_id, run_id)).fetchone()
+        return row[0] or 0
+
+    def changes(self, run_id, since_run=None, value=None, field=None, limit=1000):
+        """Empresas/campos com valor diferente entre since_run (padrão: o
+        processamento anterior da mesma pasta e modo) e run_id, em ordem de
+        empresa: [{"empresa", "campo", "antes", "depois"}]. antes None é
+        empresa nova; depois None, empresa que saiu da pasta. value e field
+        filtram pelo valor novo e pelo campo."""
+        with self.lock:
+            if self.conn is None:
+                return []
+            row = self.conn.execute("SELECT scope_id FROM runs WHERE id = ?", (run_id,)).fetchone()
+            if row is None:
+                return []
+            scope_id = row[0]
+            if since_run is None:
+                since_run = self._previous(run_id, scope_id)
+            return self._changes(scope_id, since_run, run_id, value, field, limit)
+
+    def _changes(self, scope_id, since_run, run_id, value, field, limit):
+        where = ""
+        params = {"scope": scope_id, "since": since_run, "run": run_id,
+                  "limit": -1 if limit is None else limit}
+        if value is not None:
+            where += " AND d.after = :value"
+            params["value"] = value
+        if field is not None:
+            where += " AND d.field = :field"
+            params["field"] = FIELD_CODES[field]
+        rows = self.conn.execute(_CHANGES.format(where=where), params).fetchall()
+        return [{"empresa": name, "campo": HISTORY_FIELDS[code], "antes": before, "depois": after}
+                for name, code, before, after in rows]
+
+    def changes_since(self, main_folder, mode, since, value=None, field=None, limit=1000):
+        """Mudanças desde since (datetime): a diferença entre o último
+        processamento antes de since e o mais recente, no formato de
+        changes. Com value, só o que passou a ter esse valor. Ex.: CNDs que
+        venceram na semana: changes_since(pasta, MODE_VENCIMENTO, há_7_dias, "VENCIDA")."""
+        with self.lock:
+            if self.conn is None:
+                return []
+            scope_id = self._scope(main_folder, mode)
+            if scope_id is None:
+                return []
+            latest = self.conn.execute(
+                "SELECT id FROM runs WHERE scope_id = ? ORDER BY started DESC, id DESC LIMIT 1",
+                (scope_id,)).fetchone()
+            if latest is None:
+                return []
+            before = self.conn.execute(
+                "SELECT id FROM runs WHERE scope_id = ? AND started < ?"
+                " ORDER BY started DESC, id DESC LIMIT 1",
+                (scope_id, _timestamp(since))).fetchone()
+            return self._changes(scope_id, before[0] if before else 0, latest[0],
+                                 value, field, limit)
+
+    def trend(self, main_folder, mode, field, value, limit=30):
+        """Quantidade de empresas com field == value em cada um dos últimos
+        limit processamentos, do mais antigo ao mais recente:
+        [(inicio, quantidade)]. Para marcações, field=FLAG_FIELD e value uma
+        das cnd_results.FLAGS (ex.: "vencida": alguma CND vencida)."""
+        if field == FLAG_FIELD and value not in FLAGS:
+            raise ValueError(f"Marcação desconhecida: {value}")
+        with self.lock:
+            if self.conn is None:
+                return []
+            scope_id = self._scope(main_folder, mode)
+            rows = self.conn.execute(
+                "SELECT r.started, coalesce(c.total, 0) FROM"
+                " (SELECT id, started FROM runs WHERE scope_id = ?"
+                "  ORDER BY started DESC, id DESC LIMIT ?) r"
+                " LEFT JOIN run_counts c ON c.run_id = r.id AND c.field = ? AND c.value = ?"
+                " ORDER BY r.started, r.id",
+                (scope_id, limit, field, value)).fetchall()
+        return rows
+
+    def company_history(self, main_folder, mode, empresa):
+        """Linha do tempo de uma empresa: [{"campo", "valor", "desde", "ate"}]
+        por campo e data; ate None é o valor atual"""
+        with self.lock:
+            if self.conn is None:
+                return []
+            rows = self.conn.execute(
+                "SELECT s.field, s.value, r1.started, r2.started FROM scopes sc"
+                " JOIN companies c ON c.scope_id = sc.id"
+                " JOIN states s ON s.company_id = c.id"
+                " JOIN runs r1 ON r1.id = s.from_run"
+                " LEFT JOIN runs r2 ON r2.id = s.to_run"
+                " WHERE sc.main_folder = ? AND sc.mode = ? AND c.name = ?"
+                " ORDER BY s.field, s.from_run",
+                (main_folder, mode, empresa)).fetchall()
+        return [{"campo": HISTORY_FIELDS[code], "valor": value, "desde": started, "ate": ended}
+                for code, value, started, ended in rows]
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
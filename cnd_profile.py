@@ -0,0 +1,183 @@
+"""Tempos por etapa de um processamento (sem interface gráfica).
+
+O ScanProfile acumula, para cada etapa (listagem das pastas, pré-filtro,
+abertura do PDF, extração de texto, data de vencimento, inserção na
+interface...), a contagem, o tempo total, o maior tempo e um histograma em
+faixas logarítmicas, além dos arquivos e empresas mais lentos. É preenchido
+pelas threads do processamento e gravado como JSON ao lado do log
+(cnd_scan_report.json).
+"""
+import heapq
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+REPORT_FILE = "cnd_scan_report.json"
+
+# Etapas medidas
+STAGE_LISTING = "listagem"            # os.scandir da pasta principal e de cada empresa
+STAGE_PREFILTER = "prefiltro"         # might_be_positive
+STAGE_PDF_OPEN = "abrir_pdf"          # construção do PdfReader
+STAGE_EXTRACT = "extrair_texto"       # page.extract_text, somado por arquivo
+STAGE_DUE_DATE = "vencimento"         # classificação do nome + data de vencimento
+STAGE_COMPANY = "empresa"             # processamento da empresa: listagem e leitura dos PDFs dela
+STAGE_WAIT = "espera"                 # empresa esperando vaga de listagem e na fila de PDFs
+STAGE_UI = "interface"                # lotes inseridos na tabela pela thread da interface
+STAGES = (STAGE_LISTING, STAGE_PREFILTER, STAGE_PDF_OPEN, STAGE_EXTRACT,
+          STAGE_DUE_DATE, STAGE_COMPANY, STAGE_WAIT, STAGE_UI)
+
+# Limites superiores (ms) das faixas do histograma; a última é aberta
+HISTOGRAM_EDGES_MS = (0.1, 0.3, 1, 3, 10, 30, 100, 300, 1000, 3000)
+
+
+class StageStats:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_EDGES_MS) + 1)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        ms = seconds * 1000
+        for i, edge in enumerate(HISTOGRAM_EDGES_MS):
+            if ms <= edge:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def as_dict(self):
+        histogram = [{"ate_ms": edge, "qtd": n}
+                     for edge, n in zip(HISTOGRAM_EDGES_MS, self.buckets) if n]
+        if self.buckets[-1]:
+            histogram.append({"ate_ms": None, "qtd": self.buckets[-1]})
+        return {
+            "qtd": self.count,
+            "total_s": round(self.total, 4),
+            "media_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "histograma": histogram,
+        }
+
+
+class ScanProfile:
+    """Acumulador de tempos por etapa, seguro para várias threads"""
+
+    def __init__(self, slowest=10):
+        self.slowest = slowest
+        self.lock = threading.Lock()
+        self.stages = {stage: StageStats() for stage in STAGES}
+        self.slow_files = []        # heap de (segundos, arquivo, {etapa: segundos})
+        self.slow_companies = []    # heap de (segundos, empresa)
+        self.started = time.time()
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.stages[stage].add(seconds)
+
+    @contextmanager
+    def measure(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def add_file(self, file_path, timings):
+        """Registra os tempos de um PDF ({etapa: segundos}, devolvidos por
+        read_positive_cert) e o mantém entre os mais lentos"""
+        total = sum(timings.values())
+        with self.lock:
+            for stage, seconds in timings.items():
+                self.stages[stage].add(seconds)
+            self._keep_slowest(self.slow_files, (total, file_path, timings))
+
+    def add_company(self, empresa, seconds, waited=None):
+        """Tempo de processamento da empresa (entra entre as mais lentas) e,
+        à parte, o tempo que ela esperou por vaga ou na fila"""
+        with self.lock:
+            self.stages[STAGE_COMPANY].add(seconds)
+            if waited is not None:
+                self.stages[STAGE_WAIT].add(waited)
+            self._keep_slowest(self.slow_companies, (seconds, empresa))
+
+    def _keep_slowest(self, heap, item):
+        if len(heap) < self.slowest:
+            heapq.heappush(heap, item)
+        elif item[0] > heap[0][0]:
+            heapq.heapreplace(heap, item)
+
+    def report(self, summary=None):
+        """Relatório em dicionário (serializável em JSON)"""
+        with self.lock:
+            report = {
+                "inicio": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                "etapas": {stage: stats.as_dict() for stage, stats in self.stages.items()
+                           if stats.count},
+                "pdfs_mais_lentos": [
+                    {"arquivo": path, "total_ms": round(total * 1000, 3),
+                     "etapas_ms": {stage: round(s * 1000, 3) for stage, s in timings.items()}}
+                    for total, path, timings in sorted(self.slow_files, reverse=True)],
+                "empresas_mais_lentas": [
+                    {"empresa": empresa, "total_ms": round(seconds * 1000, 3)}
+                    for seconds, empresa in sorted(self.slow_companies, reverse=True)],
+            }
+        if summary is not None:
+            report["resumo"] = {key: summary[key] for key in
+                                ("total_folders", "elapsed", "workers", "processes",
+                                 "pdfs", "pages", "cancelled", "concurrency") if key in summary}
+            report["resumo"]["modo"] = summary.get("mode")
+        return report
+
+    def write(self, path=REPORT_FILE, summary=None):
+        """Grava o relatório em JSON e o devolve"""
+        report = self.report(summary)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return report
+
+
+def format_report(report):
+    """Texto do relatório para o painel de diagnóstico"""
+    lines = []
+    resumo = report.get("resumo")
+    if resumo:
+        lines.append(f"{resumo.get('modo') or ''}: {resumo.get('total_folders', 0)} empresas, "
+                     f"{resumo.get('pdfs', 0)} PDFs, {resumo.get('pages', 0)} páginas "
+                     f"em {resumo.get('elapsed', 0):.2f}s")
+        if resumo.get("concurrency"):
+            lines.append("Concorrência: " + ", ".join(
+                f"{stage} {sizes['inicial']} -> {sizes['final']} (máx. {sizes['maximo']})"
+                for stage, sizes in resumo["concurrency"].items()))
+        lines.append("")
+    lines.append(f"{'Etapa':<15}{'Qtd':>8}{'Total (s)':>11}{'Média (ms)':>12}{'Máx (ms)':>11}")
+    for stage, stats in report["etapas"].items():
+        lines.append(f"{stage:<15}{stats['qtd']:>8}{stats['total_s']:>11.3f}"
+                     f"{stats['media_ms']:>12.3f}{stats['max_ms']:>11.1f}")
+    for stage, stats in report["etapas"].items():
+        lines.append("")
+        lines.append(f"Histograma - {stage}")
+        peak = max(bucket["qtd"] for bucket in stats["histograma"])
+        for bucket in stats["histograma"]:
+            label = f"<= {bucket['ate_ms']:g} ms" if bucket["ate_ms"] is not None else \
+                f" > {HISTOGRAM_EDGES_MS[-1]:g} ms"
+            bar = "█" * max(1, round(30 * bucket["qtd"] / peak))
+            lines.append(f"  {label:>12} {bucket['qtd']:>7} {bar}")
+    if report["pdfs_mais_lentos"]:
+        lines.append("")
+        lines.append("PDFs mais lentos")
+        for item in report["pdfs_mais_lentos"]:
+            lines.append(f"  {item['total_ms']:>9.1f} ms  {item['arquivo']}")
+    if report["empresas_mais_lentas"]:
+        lines.append("")
+        lines.append("Empresas mais lentas")
+        for item in report["empresas_mais_lentas"]:
+            lines.append(f"  {item['total_ms']:>9.1f} ms  {item['empresa']}")
+    return "\n".join(lines)
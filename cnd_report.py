@@ -0,0 +1,224 @@
+"""Relatórios dos resultados de um processamento (sem interface gráfica).
+
+Excel formatado (.xlsx) para leitura e formatos para outras ferramentas:
+CSV e um formato colunar (Parquet, se o pyarrow estiver instalado, ou JSON
+Lines). export_results escolhe o formato pela extensão do arquivo.
+"""
+import csv
+import importlib.util
+import json
+import os
+from datetime import datetime
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.cell_range import CellRange
+from openpyxl.worksheet.datavalidation import DataValidation
+from openpyxl.formatting.rule import FormulaRule
+
+from cnd_engine import MODE_POSITIVA
+
+# A cada quantas linhas on_progress é chamado
+PROGRESS_EVERY = 500
+
+# Linhas por row group no Parquet (limita a memória usada na escrita)
+PARQUET_ROW_GROUP = 10000
+
+# Campos com lista de valores (vírgula no .xlsx, "; " no CSV, lista no colunar)
+LIST_FIELDS = ("outras_cnds", "missing_files")
+
+
+def _report_styles():
+    """Estilos nomeados do relatório: registrados uma vez no workbook e
+    compartilhados por todas as células"""
+    center_alignment = Alignment(horizontal="center", vertical="center")
+    border = Border(left=Side(style="thin"), right=Side(style="thin"),
+                    top=Side(style="thin"), bottom=Side(style="thin"))
+    return [
+        NamedStyle(name="cnd_titulo", font=Font(size=14, bold=True),
+                   alignment=center_alignment),
+        NamedStyle(name="cnd_cabecalho", font=Font(bold=True, color="FFFFFF"),
+                   fill=PatternFill(start_color="366092", end_color="366092", fill_type="solid"),
+                   alignment=center_alignment, border=border),
+        NamedStyle(name="cnd_celula", alignment=center_alignment, border=border),
+    ]
+
+
+def _row_values(result, mode):
+    outras = ", ".join(result.get("outras_cnds", [])) if result.get("outras_cnds") else "NENHUMA"
+    faltantes = ", ".join(result["missing_files"]) if result.get("missing_files") else "NENHUM"
+    if mode == MODE_POSITIVA:
+        return [result["empresa"], result.get("municipal"), result.get("rfb"), result.get("fgts"),
+                result.get("proc"), result.get("estadual"), result.get("positiva", "NENHUMA"),
+                outras, faltantes, result["status"]]
+    return [result["empresa"], result.get("municipal"), result.get("rfb"), result.get("fgts"),
+            result.get("proc"), result.get("estadual"), outras, faltantes, result["status"]]
+
+
+def create_excel_report(data, filename, mode, on_progress=None):
+    """Gera o relatório .xlsx formatado para os resultados de um processamento.
+
+    Usa um workbook write-only: as linhas vão direto para o arquivo
+    temporário da planilha em vez de ficarem todas em memória como objetos
+    Cell. Validação de dados e formatação condicional cobrem exatamente as
+    linhas exportadas. on_progress(linhas_escritas, total) é chamado a cada
+    PROGRESS_EVERY linhas e ao final."""
+    total = len(data)
+    wb = Workbook(write_only=True)
+    for style in _report_styles():
+        wb.add_named_style(style)
+    ws = wb.create_sheet("Relatório CND")
+
+    if mode == MODE_POSITIVA:
+        headers = ["Empresa", "CND MUNICIPAL", "CND RFB", "CND FGTS", "CND PROC",
+                   "CND ESTADUAL", "Certidão Positiva", "Outras CNDs", "Arquivos Faltantes", "Status"]
+        colunas_status = [2, 3, 4, 5, 6, 10]
+    else:
+        headers = ["Empresa", "CND MUNICIPAL", "CND RFB", "CND FGTS", "CND PROC",
+                   "CND ESTADUAL", "Outras CNDs", "Arquivos Faltantes", "Status"]
+        colunas_status = [2, 3, 4, 5, 6, 9]
+
+    # Formatação condicional e validação são gravadas no fechamento da planilha,
+    # mas no modo write-only precisam ser definidas antes das linhas
+    first_row, last_row = 3, max(3, total + 2)
+    opcoes = ["VENCIDA", "VÁLIDA", "IMPEDIDA", "TAREFA", "NÃO"]
+    cores = {
+        "VENCIDA": "FF0000", "VÁLIDA": "00FF00", "IMPEDIDA": "FFA500",
+        "TAREFA": "0000FF", "NÃO": "808080", "COMPLETO": "00FF00",
+        "INCOMPLETO": "FF0000"
+    }
+    for col in colunas_status:
+        col_letter = get_column_letter(col)
+        cell_range = f"{col_letter}{first_row}:{col_letter}{last_row}"
+        dv = DataValidation(type="list", formula1=f'"{",".join(opcoes)}"', allow_blank=True)
+        dv.add(cell_range)
+        ws.data_validations.append(dv)
+
+        for status, cor in cores.items():
+            formula = f'EXACT("{status}",${col_letter}{first_row})'
+            rule = FormulaRule(formula=[formula],
+                               fill=PatternFill(start_color=cor, end_color=cor, fill_type="solid"))
+            ws.conditional_formatting.add(cell_range, rule)
+
+    # Título
+    ws.merged_cells.add(CellRange(min_row=1, min_col=1, max_row=1, max_col=len(headers)))
+    title_cell = WriteOnlyCell(
+        ws, value=f"RELATÓRIO DE CND ({mode}) - {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+    title_cell.style = "cnd_titulo"
+    ws.append([title_cell])
+
+    # Cabeçalhos
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.style = "cnd_cabecalho"
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    # Dados
+    for written, result in enumerate(data, 1):
+        row = []
+        for value in _row_values(result, mode):
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = "cnd_celula"
+            row.append(cell)
+        ws.append(row)
+        if on_progress and written % PROGRESS_EVERY == 0:
+            on_progress(written, total)
+
+    wb.save(filename)
+    if on_progress:
+        on_progress(total, total)
+
+
+def data_columns(mode):
+    """Colunas dos formatos para ferramentas (nomes das chaves do resultado)"""
+    columns = ["empresa", "municipal", "rfb", "fgts", "proc", "estadual"]
+    if mode == MODE_POSITIVA:
+        columns.append("positiva")
+    return columns + ["outras_cnds", "missing_files", "status"]
+
+
+def _record(result, columns):
+    record = {column: result.get(column) for column in columns}
+    for field in LIST_FIELDS:
+        record[field] = list(record[field] or [])
+    return record
+
+
+def create_csv_report(data, filename, mode, on_progress=None):
+    """CSV UTF-8 com cabeçalho; listas separadas por ponto e vírgula"""
+    total = len(data)
+    columns = data_columns(mode)
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for written, result in enumerate(data, 1):
+            record = _record(result, columns)
+            for field in LIST_FIELDS:
+                record[field] = "; ".join(record[field])
+            writer.writerow(record[column] for column in columns)
+            if on_progress and written % PROGRESS_EVERY == 0:
+                on_progress(written, total)
+    if on_progress:
+        on_progress(total, total)
+
+
+def create_jsonl_report(data, filename, mode, on_progress=None):
+    """JSON Lines compacto: um objeto por empresa, listas como arrays"""
+    total = len(data)
+    columns = data_columns(mode)
+    with open(filename, "w", encoding="utf-8") as f:
+        for written, result in enumerate(data, 1):
+            f.write(json.dumps(_record(result, columns), ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+            if on_progress and written % PROGRESS_EVERY == 0:
+                on_progress(written, total)
+    if on_progress:
+        on_progress(total, total)
+
+
+def create_parquet_report(data, filename, mode, on_progress=None):
+    """Parquet (pyarrow), gravado em row groups de PARQUET_ROW_GROUP linhas"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Exportar em Parquet requer o pacote pyarrow "
+                           "(pip install pyarrow); use .jsonl como alternativa")
+
+    total = len(data)
+    columns = data_columns(mode)
+    schema = pa.schema([(column, pa.list_(pa.string()) if column in LIST_FIELDS else pa.string())
+                        for column in columns])
+    with pq.ParquetWriter(filename, schema) as writer:
+        for start in range(0, total, PARQUET_ROW_GROUP):
+            chunk = [_record(result, columns) for result in data[start:start + PARQUET_ROW_GROUP]]
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+            if on_progress:
+                on_progress(start + len(chunk), total)
+    if on_progress:
+        on_progress(total, total)
+
+
+def columnar_extension():
+    """Extensão do formato colunar disponível: .parquet com pyarrow, senão .jsonl"""
+    return ".parquet" if importlib.util.find_spec("pyarrow") else ".jsonl"
+
+
+EXPORTERS = {
+    ".xlsx": create_excel_report,
+    ".csv": create_csv_report,
+    ".jsonl": create_jsonl_report,
+    ".parquet": create_parquet_report,
+}
+
+
+def export_results(data, filename, mode, on_progress=None):
+    """Gera o relatório no formato indicado pela extensão de filename"""
+    extension = os.path.splitext(filename)[1].lower()
+    exporter = EXPORTERS.get(extension)
+    if exporter is None:
+        raise ValueError(f"Formato de relatório não suportado: {extension or filename}")
+    exporter(data, filename, mode, on_progress=on_progress)
@@ -0,0 +1,476 @@
+"""Resultados de um processamento em memória, indexados (sem interface gráfica).
+
+O ResultStore guarda as linhas na ordem de chegada, um índice nome da
+empresa -> linha e, para cada linha, as marcações calculadas uma única vez
+na inserção (positiva, vencida, faltando, erro, ...). Para cada marcação
+mantém o conjunto das linhas que a têm, de modo que os cards de estatística
+e os filtros não precisam percorrer os cinco campos de CND de cada empresa.
+
+A busca por nome usa um NameIndex: os nomes normalizados (minúsculas, sem
+acentos) e, para cada trigrama, as linhas que o contêm. Uma busca só
+confere as linhas do trigrama mais raro da consulta; se a consulta contém a
+anterior (o usuário continuou digitando), só as linhas já encontradas.
+
+A ordenação por coluna também é guardada: para cada coluna já ordenada, a
+chave de cada linha e a permutação das linhas em ordem crescente. Linhas
+novas entram na posição certa por bisseção; a ordem decrescente é a mesma
+permutação lida ao contrário.
+
+Cada empresa é um CompanyResult (com __slots__) em vez de um dict: o status
+e os cinco campos de CND viram códigos pequenos, guardados juntos em um
+bytes compartilhado pelas linhas com a mesma combinação, e as listas viram
+tuplas de textos internados (as combinações de arquivos faltantes e de
+certidões positivas também são compartilhadas). O CompanyResult responde a
+get/[] com as mesmas chaves do dict, então a tabela, os cards e os
+relatórios não mudam.
+"""
+import bisect
+import sys
+import unicodedata
+from array import array
+from operator import attrgetter
+
+CND_FIELDS = ("municipal", "rfb", "fgts", "proc", "estadual")
+
+# Códigos dos valores: o índice em cada lista. Valores que não estão aqui
+# ganham o próximo código na primeira vez que aparecem.
+CND_VALUES = [None, "SIM", "NÃO", "VÁLIDA", "VENCIDA", "DATA NÃO ENCONTRADA", "ERRO DATA"]
+STATUS_VALUES = [None, "COMPLETO", "INCOMPLETO", "ERRO"]
+
+# Marcações de cada linha
+FLAG_COMPLETO = "completo"
+FLAG_INCOMPLETO = "incompleto"
+FLAG_ERRO = "erro"
+FLAG_POSITIVA = "positiva"      # alguma certidão positiva (CPD ou falência)
+FLAG_VENCIDA = "vencida"        # alguma CND vencida
+FLAG_FALTANDO = "faltando"      # alguma CND não encontrada ("NÃO")
+FLAG_VALIDA = "valida"          # todas as CNDs encontradas estão válidas
+FLAGS = (FLAG_COMPLETO, FLAG_INCOMPLETO, FLAG_ERRO, FLAG_POSITIVA,
+         FLAG_VENCIDA, FLAG_FALTANDO, FLAG_VALIDA)
+
+# Tag de cor da tabela, em ordem de prioridade
+TAG_PRIORITY = (FLAG_POSITIVA, FLAG_VENCIDA, FLAG_FALTANDO, FLAG_ERRO,
+                FLAG_INCOMPLETO, FLAG_COMPLETO)
+
+
+# Tamanho dos n-gramas do índice de nomes; consultas menores percorrem os nomes
+NGRAM = 3
+
+
+def _strip_accents(text):
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+# Letras latinas acentuadas -> sem acento, numa única passada de str.translate
+_ACCENTS = str.maketrans({code: _strip_accents(chr(code)) for code in range(0xC0, 0x250)
+                          if _strip_accents(chr(code)) != chr(code)})
+
+
+def normalize_name(text):
+    """Forma usada na busca: minúsculas e sem acentos ("São João" -> "sao joao")"""
+    text = text.casefold().translate(_ACCENTS)
+    return text if text.isascii() else _strip_accents(text)
+
+
+class NameIndex:
+    """Índice de trigramas dos nomes normalizados, na ordem das linhas"""
+
+    def __init__(self):
+        self.names = []
+        self.grams = {}     # trigrama -> array com os índices das linhas, em ordem
+
+    def add(self, name):
+        index = len(self.names)
+        normalized = normalize_name(name)
+        self.names.append(normalized)
+        for gram in {normalized[i:i + NGRAM] for i in range(len(normalized) - NGRAM + 1)}:
+            postings = self.grams.get(gram)
+            if postings is None:
+                postings = self.grams[gram] = array("I")
+            postings.append(index)
+
+    def rebuild(self, names):
+        self.names = []
+        self.grams = {}
+        for name in names:
+            self.add(name)
+
+    def search(self, query, candidates=None):
+        """Índices das linhas cujo nome contém query (já normalizada), em
+        ordem. candidates restringe a busca a essas linhas."""
+        names = self.names
+        if candidates is None:
+            if len(query) >= NGRAM:
+                candidates = min((self.grams.get(query[i:i + NGRAM], ())
+                                  for i in range(len(query) - NGRAM + 1)), key=len)
+            else:
+                candidates = range(len(names))
+        return [i for i in candidates if query in names[i]]
+
+
+_CND_CODES = {value: code for code, value in enumerate(CND_VALUES)}
+_STATUS_CODES = {value: code for code, value in enumerate(STATUS_VALUES)}
+_SHARED = {}        # bytes de códigos e tuplas repetidas entre empresas -> instância única
+_POSITIVA_TEXT = {}     # positive_details -> texto da coluna "Certidão Positiva"
+
+
+def _code(codes, values, value):
+    code = codes.get(value)
+    if code is None:
+        if len(values) > 255:
+            raise ValueError(f"Valores demais para codificar: {value!r}")
+        code = codes[value] = len(values)
+        values.append(sys.intern(value) if isinstance(value, str) else value)
+    return code
+
+
+def _shared(value):
+    """A mesma instância para valores iguais (poucas combinações diferentes)"""
+    return _SHARED.setdefault(value, value)
+
+
+def _texts(values):
+    return tuple(sys.intern(str(value)) for value in values) if values else ()
+
+
+class CompanyResult:
+    """Resultado de uma empresa em formato compacto, lido como o dict do
+    CNDScanner: result.get("rfb"), result["status"], "positiva" in result.
+
+    codes: bytes com o código do status e dos campos de CND (0 = ausente,
+    como nas linhas de erro). positive_details é None fora do modo positiva
+    (e nas linhas de erro), quando as chaves "positiva" e "positive_details"
+    não existem."""
+    __slots__ = ("empresa", "codes", "positive_details", "outras_cnds", "missing_files")
+
+    def __init__(self, empresa, status, cnds=(), positive_details=None, outras_cnds=(),
+                 missing_files=()):
+        self.empresa = empresa
+        cnds = tuple(cnds) or (None,) * len(CND_FIELDS)
+        self.codes = _shared(bytes([_code(_STATUS_CODES, STATUS_VALUES, status)]
+                                   + [_code(_CND_CODES, CND_VALUES, value) for value in cnds]))
+        self.positive_details = None if positive_details is None else _shared(
+            tuple((sys.intern(cnd), sys.intern(tipo)) for cnd, tipo in positive_details))
+        self.outras_cnds = _texts(outras_cnds)
+        self.missing_files = _shared(_texts(missing_files))
+
+    @classmethod
+    def from_dict(cls, result):
+        """Converte o dict de resultado (snapshots, versões anteriores)"""
+        details = result.get("positive_details")
+        if details is None and "positiva" in result:
+            details = ()
+        return cls(result.get("empresa", ""), result.get("status"),
+                   [result.get(field) for field in CND_FIELDS], details,
+                   result.get("outras_cnds") or (), result.get("missing_files") or ())
+
+    @property
+    def status(self):
+        return STATUS_VALUES[self.codes[0]]
+
+    @property
+    def positiva(self):
+        details = self.positive_details
+        if details is None:
+            return None
+        text = _POSITIVA_TEXT.get(details)
+        if text is None:
+            text = _POSITIVA_TEXT[details] = sys.intern(
+                "; ".join(f"{cnd} ({tipo})" for cnd, tipo in details) or "NENHUMA")
+        return text
+
+    def get(self, key, default=None):
+        getter = _GETTERS.get(key)
+        if getter is None:
+            return default
+        value = getter(self)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def keys(self):
+        return [key for key in _GETTERS if key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def as_dict(self):
+        """O dict equivalente (listas em vez de tuplas), para JSON"""
+        result = {}
+        for key, value in self.items():
+            result[key] = list(value) if isinstance(value, tuple) else value
+        return result
+
+    def __repr__(self):
+        return f"CompanyResult({self.as_dict()!r})"
+
+
+def _code_getter(values, position):
+    return lambda result: values[result.codes[position]]
+
+
+# Chaves do dict de resultado, na ordem em que o CNDScanner as monta
+_GETTERS = {"empresa": attrgetter("empresa")}
+_GETTERS.update((field, _code_getter(CND_VALUES, position))
+                for position, field in enumerate(CND_FIELDS, 1))
+_GETTERS.update({
+    "positiva": attrgetter("positiva"),
+    "positive_details": attrgetter("positive_details"),
+    "outras_cnds": attrgetter("outras_cnds"),
+    "status": _code_getter(STATUS_VALUES, 0),
+    "missing_files": attrgetter("missing_files"),
+})
+
+
+def sort_key(result, field):
+    """Chave de ordenação de uma coluna: quantidade de itens nas listas
+    (outras CNDs), senão o texto sem diferenciar maiúsculas e acentos"""
+    value = result.get(field)
+    if isinstance(value, (list, tuple)):
+        return len(value)
+    return normalize_name(str(value if value is not None else ""))
+
+
+class SortOrder:
+    """Chaves de uma coluna e a permutação das linhas em ordem crescente.
+    Empates ficam na ordem de chegada, como no sort estável."""
+
+    def __init__(self, field, rows, keys=None):
+        self.field = field
+        if keys is None:
+            # Colunas de CND e status têm poucos valores: cada texto é normalizado uma vez
+            memo = {}
+            keys = []
+            for row in rows:
+                value = row.get(field)
+                key = memo.get(value) if isinstance(value, str) else None
+                if key is None:
+                    key = sort_key(row, field)
+                    if isinstance(value, str):
+                        memo[value] = key
+                keys.append(key)
+        self.keys = keys
+        # sorted é estável: empates ficam na ordem dos índices, a mesma de self.key
+        self.order = sorted(range(len(rows)), key=keys.__getitem__)
+
+    def key(self, index):
+        return self.keys[index], index
+
+    def insert(self, index, row):
+        """Linha nova (index é sempre o último)"""
+        self.keys.append(sort_key(row, self.field))
+        bisect.insort(self.order, index, key=self.key)
+
+    def update(self, index, row):
+        """Linha trocada: sai da posição antiga e entra na nova"""
+        new = sort_key(row, self.field)
+        if new == self.keys[index]:
+            return
+        del self.order[bisect.bisect_left(self.order, self.key(index), key=self.key)]
+        self.keys[index] = new
+        bisect.insort(self.order, index, key=self.key)
+
+
+_FLAG_SETS = {}     # marcações já calculadas -> frozenset compartilhado
+_FLAGS_BY_CODES = {}    # (codes, positiva) de um CompanyResult -> marcações
+
+
+def result_flags(result):
+    """Marcações de uma linha de resultado. Linhas com as mesmas marcações
+    compartilham o frozenset; para um CompanyResult as marcações só
+    dependem dos códigos, então cada combinação é calculada uma vez."""
+    if isinstance(result, CompanyResult):
+        key = (result.codes, bool(result.positive_details))
+        flags = _FLAGS_BY_CODES.get(key)
+        if flags is None:
+            flags = _FLAGS_BY_CODES[key] = _compute_flags(result)
+        return flags
+    return _compute_flags(result)
+
+
+def _compute_flags(result):
+    flags = set()
+    status = result.get("status", "").upper()
+    if status == "COMPLETO":
+        flags.add(FLAG_COMPLETO)
+    elif status == "INCOMPLETO":
+        flags.add(FLAG_INCOMPLETO)
+    elif status == "ERRO":
+        flags.add(FLAG_ERRO)
+
+    if result.get("positive_details"):
+        flags.add(FLAG_POSITIVA)
+
+    campos = [result.get(field) for field in CND_FIELDS]
+    if any(c == "NÃO" for c in campos):
+        flags.add(FLAG_FALTANDO)
+    if any(c == "VENCIDA" for c in campos):
+        flags.add(FLAG_VENCIDA)
+    elif all(c == "VÁLIDA" for c in campos if c and c != "NÃO"):
+        flags.add(FLAG_VALIDA)
+    flags = frozenset(flags)
+    return _FLAG_SETS.setdefault(flags, flags)
+
+
+def row_tag(flags):
+    """Tag de cor pela prioridade: positiva > vencida > faltando > erro > incompleto > completo"""
+    for flag in TAG_PRIORITY:
+        if flag in flags:
+            return flag
+    return ""
+
+
+class ResultStore:
+    """Linhas de resultado com índice por empresa e conjuntos por marcação"""
+
+    def __init__(self):
+        self.rows = []
+        self.flags = []
+        self.by_name = {}
+        self.members = {flag: set() for flag in FLAGS}
+        self.names = NameIndex()
+        self.generation = 0     # muda quando índices de linhas deixam de valer
+        self.last_search = None     # (consulta, linhas encontradas, linhas existentes, generation)
+        self.sort_orders = {}       # campo -> SortOrder, criado na primeira ordenação
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+    def add(self, result):
+        """Acrescenta uma linha e devolve seu índice (estável até clear)"""
+        index = len(self.rows)
+        flags = result_flags(result)
+        self.rows.append(result)
+        self.flags.append(flags)
+        self.by_name[result.get("empresa")] = index
+        for flag in flags:
+            self.members[flag].add(index)
+        self.names.add(result.get("empresa", ""))
+        for order in self.sort_orders.values():
+            order.insert(index, result)
+        return index
+
+    def extend(self, results):
+        for result in results:
+            self.add(result)
+
+    def replace(self, result):
+        """Troca a linha da mesma empresa por result (mesmo índice) ou a
+        acrescenta. Devolve a linha antiga, ou None se a empresa é nova."""
+        index = self.by_name.get(result.get("empresa"))
+        if index is None:
+            self.add(result)
+            return None
+        old = self.rows[index]
+        for flag in self.flags[index]:
+            self.members[flag].discard(index)
+        flags = result_flags(result)
+        self.rows[index] = result
+        self.flags[index] = flags
+        for flag in flags:
+            self.members[flag].add(index)
+        for order in self.sort_orders.values():
+            order.update(index, result)
+        return old
+
+    def remove(self, empresa):
+        """Retira a linha da empresa e devolve a linha removida (ou None).
+        Os índices das linhas seguintes mudam; os índices são refeitos."""
+        index = self.by_name.get(empresa)
+        if index is None:
+            return None
+        old = self.rows.pop(index)
+        self.flags.pop(index)
+        self.by_name = {row.get("empresa"): i for i, row in enumerate(self.rows)}
+        self.members = {flag: set() for flag in FLAGS}
+        for i, flags in enumerate(self.flags):
+            for flag in flags:
+                self.members[flag].add(i)
+        self.names.rebuild(row.get("empresa", "") for row in self.rows)
+        self.generation += 1
+        self.last_search = None
+        self.sort_orders = {}
+        return old
+
+    def clear(self):
+        self.rows = []
+        self.flags = []
+        self.by_name = {}
+        self.members = {flag: set() for flag in FLAGS}
+        self.names = NameIndex()
+        self.generation += 1
+        self.last_search = None
+        self.sort_orders = {}
+
+    def get(self, empresa):
+        index = self.by_name.get(empresa)
+        return None if index is None else self.rows[index]
+
+    def index_of(self, empresa):
+        return self.by_name.get(empresa)
+
+    def flags_of(self, index):
+        return self.flags[index]
+
+    def count(self, flag):
+        return len(self.members[flag])
+
+    def with_flag(self, flag):
+        """Linhas com a marcação, na ordem de chegada"""
+        return [self.rows[i] for i in sorted(self.members[flag])]
+
+    def search(self, text):
+        """Linhas cujo nome contém text, sem diferenciar maiúsculas e acentos,
+        na ordem de chegada. Se text contém a consulta anterior, só as linhas
+        encontradas antes (e as chegadas depois dela) são conferidas."""
+        query = normalize_name(text.strip())
+        if not query:
+            return list(self.rows)
+        candidates = None
+        last = self.last_search
+        if last is not None and last[0] in query and last[3] == self.generation:
+            candidates = last[1]
+            if last[2] < len(self.rows):
+                candidates = candidates + list(range(last[2], len(self.rows)))
+        indexes = self.names.search(query, candidates)
+        self.last_search = (query, indexes, len(self.rows), self.generation)
+        return [self.rows[i] for i in indexes]
+
+    def sort_order(self, field):
+        """SortOrder da coluna, montado na primeira vez e depois mantido"""
+        order = self.sort_orders.get(field)
+        if order is None:
+            # O nome da empresa já está normalizado no índice da busca
+            keys = list(self.names.names) if field == "empresa" else None
+            order = self.sort_orders[field] = SortOrder(field, self.rows, keys)
+        return order
+
+    def row_sort_key(self, field, row):
+        """Chave completa (chave, índice) de uma linha já inserida, para
+        inserir na posição certa uma lista ordenada por sorted_rows"""
+        return self.sort_order(field).key(self.by_name[row.get("empresa")])
+
+    def sorted_rows(self, field, reverse=False, rows=None):
+        """Linhas ordenadas pela coluna field; com rows, só essas linhas
+        (um filtro ou busca), na mesma ordem"""
+        order = self.sort_order(field).order
+        if rows is not None:
+            wanted = {self.by_name.get(row.get("empresa")) for row in rows}
+            order = [index for index in order if index in wanted]
+        if reverse:
+            order = reversed(order)
+        return [self.rows[index] for index in order]
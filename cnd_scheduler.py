@@ -0,0 +1,273 @@
+"""Concorrência adaptativa do processamento (sem interface gráfica).
+
+O processamento tem duas etapas com perfis diferentes: a listagem das pastas
+das empresas, que é I/O (no compartilhamento de rede cada listagem espera a
+latência do servidor, e mais listagens simultâneas escondem essa espera), e a
+leitura dos PDFs, que é CPU. Cada etapa passa por um AdaptiveLimiter, um
+semáforo cujo limite começa no tamanho adequado ao tipo de carga e é
+reavaliado a cada ADAPT_INTERVAL segundos pelo AdaptiveScheduler:
+
+- se as tarefas esperam vaga (espera média na fila acima de QUEUE_WAIT), o
+  limite sobe;
+- se a vazão não melhorou depois de uma subida, a subida é desfeita e novas
+  tentativas esperam algumas janelas (cada vez mais);
+- se a etapa não chegou a usar todas as vagas, o limite desce.
+
+Cada mudança de limite é registrada no log. As vagas são pedidas pelas tasks
+asyncio do processamento (async with limiter.slot()).
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+ADAPT_INTERVAL = 1.0      # segundos entre reavaliações
+QUEUE_WAIT = 0.005        # espera média (s) na fila que indica falta de vagas
+MIN_GAIN = 0.05           # ganho mínimo de vazão para manter uma subida
+HOLD_WINDOWS = 2          # janelas sem subir depois de desfazer uma subida (dobra a cada vez)
+MAX_HOLD_WINDOWS = 16
+
+# Tamanho inicial da listagem quando não configurado
+LISTING_WORKERS_LOCAL = 8
+LISTING_WORKERS_NETWORK = 16
+LISTING_WORKERS_MIN = 2
+
+NETWORK_FILESYSTEMS = {"cifs", "smb3", "smbfs", "nfs", "nfs4", "fuse.sshfs", "9p"}
+
+
+def is_network_path(path):
+    """Indica se path está em um compartilhamento de rede (caminho UNC,
+    unidade mapeada ou montagem CIFS/NFS)"""
+    path = os.path.abspath(path)
+    if sys.platform == "win32":
+        if path.startswith(("\\\\", "//")):
+            return True
+        try:
+            import ctypes
+            DRIVE_REMOTE = 4
+            root = os.path.splitdrive(path)[0] + "\\"
+            return ctypes.windll.kernel32.GetDriveTypeW(root) == DRIVE_REMOTE
+        except (AttributeError, OSError):
+            return False
+
+    # Linux: o ponto de montagem mais longo que contém o caminho
+    try:
+        with open("/proc/mounts", encoding="utf-8") as f:
+            mounts = [line.split()[1:3] for line in f if line.strip()]
+    except OSError:
+        return False
+    best, fs_type = "", ""
+    for mount_point, fs in mounts:
+        mount_point = mount_point.replace("\\040", " ")
+        inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+        if inside and len(mount_point) > len(best):
+            best, fs_type = mount_point, fs
+    return fs_type in NETWORK_FILESYSTEMS
+
+
+class _Ticket:
+    """Lugar na fila de um AdaptiveLimiter (comparado por identidade): future
+    é resolvido no loop da task quando a vaga sai."""
+    __slots__ = ("granted", "future")
+
+    def __init__(self, future):
+        self.granted = False
+        self.future = future
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _schedule_wake(future):
+    """Resolve o future no loop dele. Da própria thread do loop (uma task que
+    liberou a vaga) basta call_soon; de outra thread é preciso acordar o loop."""
+    loop = future.get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        loop.call_soon(_wake, future)
+    else:
+        loop.call_soon_threadsafe(_wake, future)
+
+
+class AdaptiveLimiter:
+    """Semáforo com limite ajustável que mede vazão e espera na fila.
+
+    As vagas são entregues em ordem de chegada: quem libera uma vaga a passa
+    para o primeiro da fila, em vez de deixá-la para quem pedir primeiro.
+    Sem isso a mesma task pega a vaga de novo e a espera média fica perto
+    de zero mesmo com a fila cheia."""
+
+    def __init__(self, name, initial, minimum, maximum, adaptive=True):
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = self.initial = min(max(initial, self.minimum), self.maximum)
+        self.adaptive = adaptive and self.minimum < self.maximum
+        self.lock = threading.Lock()
+        self.active = 0
+        self.waiters = deque()      # _Ticket de cada task esperando
+        self.highest = self.limit
+        self.changes = 0
+        # Janela de medição atual
+        self.window_started = time.perf_counter()
+        self.window_done = 0
+        self.window_wait = 0.0
+        self.window_peak = 0
+        # Subida de encosta
+        self.last_step = 0
+        self.last_throughput = 0.0
+        self.hold = 0
+        self.hold_windows = HOLD_WINDOWS
+
+    async def acquire_async(self):
+        """Espera uma vaga sem bloquear o loop. Se a task for cancelada na
+        espera, desiste do lugar na fila."""
+        started = time.perf_counter()
+        with self.lock:
+            if self.active < self.limit and not self.waiters:
+                self.active += 1
+                self._acquired(started)
+                return
+            ticket = _Ticket(asyncio.get_running_loop().create_future())
+            self.waiters.append(ticket)
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            with self.lock:
+                if ticket.granted:
+                    # A vaga chegou junto com o cancelamento: devolve
+                    self.active -= 1
+                    self._grant()
+                else:
+                    self.waiters.remove(ticket)
+            raise
+        with self.lock:
+            self._acquired(started)
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire_async()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _acquired(self, started):
+        """Registra a espera na fila de quem acabou de ocupar uma vaga (com o lock)"""
+        self.window_wait += time.perf_counter() - started
+        if self.active > self.window_peak:
+            self.window_peak = self.active
+
+    def release(self):
+        with self.lock:
+            self.active -= 1
+            self.window_done += 1
+            self._grant()
+
+    def _grant(self):
+        """Passa as vagas livres para os primeiros da fila (com o lock)"""
+        while self.waiters and self.active < self.limit:
+            ticket = self.waiters.popleft()
+            ticket.granted = True
+            self.active += 1
+            _schedule_wake(ticket.future)
+
+    def adjust(self):
+        """Reavalia o limite com a janela que termina. Devolve (antigo, novo,
+        vazão/s, espera média em s) quando o limite muda, senão None."""
+        with self.lock:
+            done = self.window_done
+            # Poucas conclusões não permitem comparar vazões: a janela continua
+            if not self.adaptive or done < max(4, self.limit):
+                return None
+            now = time.perf_counter()
+            throughput = done / (now - self.window_started)
+            mean_wait = self.window_wait / done
+            old = self.limit
+            step = max(1, old // 4)
+
+            if self.last_step > 0 and throughput < self.last_throughput * (1 + MIN_GAIN):
+                # A subida anterior não trouxe vazão: desfaz e espera para tentar de novo
+                new = max(self.minimum, old - self.last_step)
+                self.hold = self.hold_windows
+                self.hold_windows = min(self.hold_windows * 2, MAX_HOLD_WINDOWS)
+            elif self.hold:
+                self.hold -= 1
+                new = old
+            elif mean_wait >= QUEUE_WAIT and old < self.maximum:
+                new = min(self.maximum, old + step)
+                if self.last_step > 0:
+                    self.hold_windows = HOLD_WINDOWS
+            elif mean_wait < QUEUE_WAIT and self.window_peak < old:
+                new = max(self.minimum, self.window_peak, old - step)
+            else:
+                new = old
+
+            self.last_step = new - old
+            self.last_throughput = throughput
+            self.window_started = now
+            self.window_done = 0
+            self.window_wait = 0.0
+            self.window_peak = self.active
+            if new == old:
+                return None
+            self.limit = new
+            self.highest = max(self.highest, new)
+            self.changes += 1
+            self._grant()
+        return old, new, throughput, mean_wait
+
+    def sizes(self):
+        return {"inicial": self.initial, "final": self.limit, "maximo": self.highest,
+                "limites": [self.minimum, self.maximum], "ajustes": self.changes}
+
+
+class AdaptiveScheduler:
+    """Limites por etapa e a thread que os reavalia durante o processamento"""
+
+    def __init__(self, limiters, interval=ADAPT_INTERVAL):
+        self.limiters = {limiter.name: limiter for limiter in limiters}
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def __getitem__(self, name):
+        return self.limiters[name]
+
+    def start(self):
+        if any(limiter.adaptive for limiter in self.limiters.values()):
+            self.thread = threading.Thread(target=self.run, name="cnd-scheduler", daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            for limiter in self.limiters.values():
+                change = limiter.adjust()
+                if change:
+                    old, new, throughput, mean_wait = change
+                    logging.info(f"Concorrência de {limiter.name}: {old} -> {new} "
+                                 f"({throughput:.1f}/s, espera média na fila "
+                                 f"{mean_wait * 1000:.1f} ms)")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def sizes(self):
+        """{etapa: {"inicial", "final", "maximo", "limites", "ajustes"}}"""
+        return {name: limiter.sizes() for name, limiter in self.limiters.items()}
+
+    def describe(self):
+        return ", ".join(f"{name} {s['inicial']}->{s['final']} (máx. {s['maximo']}, "
+                         f"{s['ajustes']} ajustes)" for name, s in self.sizes().items())
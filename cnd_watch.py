@@ -0,0 +1,306 @@
+"""Acompanhamento da pasta principal (sem interface gráfica).
+
+Depois de um processamento, o FolderWatcher observa a pasta principal e
+avisa quais empresas mudaram (CND adicionada, removida, renomeada ou
+regravada; pasta de empresa criada ou apagada), para que só elas sejam
+processadas de novo. Há duas formas de observar:
+
+- inotify (Linux, disco local): o kernel avisa cada alteração; usado por
+  ctypes, sem dependências;
+- verificação periódica (compartilhamento de rede, Windows, ou se o inotify
+  falhar): a cada POLL_INTERVAL segundos, compara o mtime de cada pasta de
+  empresa. O mtime da pasta muda quando um arquivo é criado, apagado ou
+  renomeado, mas não quando um PDF é regravado com o mesmo nome.
+
+Rajadas de eventos (uma cópia de várias CNDs, um programa que grava o PDF
+em partes) são agrupadas: as empresas só são entregues depois de
+DEBOUNCE_SECONDS sem novos eventos, ou de MAX_DELAY_SECONDS de eventos
+contínuos.
+"""
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from cnd_engine import iter_company_folders
+from cnd_scheduler import is_network_path
+
+DEBOUNCE_SECONDS = 2.0      # silêncio depois do último evento antes de entregar
+MAX_DELAY_SECONDS = 10.0    # com eventos contínuos, entrega mesmo assim
+POLL_INTERVAL = 10.0        # segundos entre verificações (sem inotify)
+
+# inotify(7)
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+# Pasta principal: empresas criadas, apagadas ou renomeadas
+MAIN_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR
+# Pasta de empresa: arquivos novos, apagados, renomeados ou regravados
+COMPANY_MASK = (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_CLOSE_WRITE
+                | IN_ATTRIB | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+_EVENT = struct.Struct("iIII")      # wd, mask, cookie, len (seguido do nome)
+
+
+def _load_libc():
+    """libc com as funções do inotify, ou None fora do Linux"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class InotifyWatch:
+    """Observação pelo inotify: uma watch na pasta principal e uma em cada
+    pasta de empresa. changes() devolve as empresas com eventos."""
+
+    name = "inotify"
+
+    def __init__(self, main_folder, ignored_folders, libc):
+        self.main_folder = main_folder
+        self.ignored = set(ignored_folders)
+        self.libc = libc
+        self.companies = {}     # wd -> nome da empresa
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            self._raise("inotify_init1")
+        try:
+            self.main_wd = self._add_watch(main_folder, MAIN_MASK)
+            for entry in iter_company_folders(main_folder, self.ignored):
+                self._watch_company(entry.name)
+        except OSError:
+            self.close()
+            raise
+
+    def _raise(self, function, path=None):
+        code = ctypes.get_errno()
+        raise OSError(code, f"{function}: {os.strerror(code)}", path)
+
+    def _add_watch(self, path, mask):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            self._raise("inotify_add_watch", path)
+        return wd
+
+    def _watch_company(self, name):
+        try:
+            wd = self._add_watch(os.path.join(self.main_folder, name), COMPANY_MASK)
+        except OSError as e:
+            # ENOSPC: limite de watches do usuário (fs.inotify.max_user_watches)
+            if e.errno == errno.ENOSPC:
+                raise
+            return      # pasta apagada antes da watch: o evento da pasta principal já a cobre
+        self.companies[wd] = name
+
+    def _unwatch_company(self, name):
+        """Pasta renomeada ou retirada da pasta principal: a watch seguiria a
+        pasta com o nome antigo. Se a pasta foi apagada, o kernel já removeu
+        a watch e o erro de inotify_rm_watch é ignorado."""
+        for wd, company in list(self.companies.items()):
+            if company == name:
+                del self.companies[wd]
+                self.libc.inotify_rm_watch(self.fd, wd)
+
+    def changes(self, timeout, stop_event):
+        """Espera até timeout segundos por eventos e devolve as empresas afetadas"""
+        if stop_event.is_set():
+            return set()
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Eventos perdidos: todas as empresas conhecidas são verificadas
+                logging.warning("Acompanhamento: fila do inotify cheia, verificando todas as empresas")
+                changed.update(self.companies.values())
+            elif wd == self.main_wd:
+                if not (mask & IN_ISDIR) or name in self.ignored:
+                    continue
+                changed.add(name)
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch_company(name)
+                else:
+                    self._unwatch_company(name)
+            elif wd in self.companies:
+                company = self.companies[wd]
+                if mask & IN_IGNORED:
+                    # Pasta apagada ou movida: o kernel já removeu a watch
+                    del self.companies[wd]
+                elif mask & (IN_DELETE_SELF | IN_MOVE_SELF) or name.lower().endswith(".pdf"):
+                    changed.add(company)
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatch:
+    """Observação por verificação periódica do mtime das pastas de empresa:
+    uma listagem da pasta principal por verificação (no Windows o mtime vem
+    junto com a listagem; no Linux é um stat por pasta)."""
+
+    name = "verificação periódica"
+
+    def __init__(self, main_folder, ignored_folders, interval=POLL_INTERVAL):
+        self.main_folder = main_folder
+        self.ignored = set(ignored_folders)
+        self.interval = interval
+        self.snapshot = self._snapshot()
+        self.next_poll = time.monotonic() + interval
+        self.failing = False
+
+    def _snapshot(self):
+        snapshot = {}
+        for entry in iter_company_folders(self.main_folder, self.ignored):
+            try:
+                snapshot[entry.name] = entry.stat().st_mtime_ns
+            except OSError:
+                continue
+        return snapshot
+
+    def changes(self, timeout, stop_event):
+        """Espera até timeout segundos (ou até a próxima verificação) e
+        devolve as empresas cujo mtime mudou, que surgiram ou sumiram"""
+        wait = min(timeout, max(0.0, self.next_poll - time.monotonic()))
+        if stop_event.wait(wait) or time.monotonic() < self.next_poll:
+            return set()
+        self.next_poll = time.monotonic() + self.interval
+        try:
+            current = self._snapshot()
+        except OSError as e:
+            # Compartilhamento fora do ar: mantém a última foto e tenta de novo
+            if not self.failing:
+                logging.warning(f"Acompanhamento: erro ao listar '{self.main_folder}': {e}")
+                self.failing = True
+            return set()
+        self.failing = False
+        previous, self.snapshot = self.snapshot, current
+        return {name for name in previous.keys() | current.keys()
+                if previous.get(name) != current.get(name)}
+
+    def close(self):
+        pass
+
+
+class FolderWatcher:
+    """Observa main_folder em uma thread e chama on_change(empresas) (lista
+    ordenada de nomes) na mesma thread, depois de agrupar as rajadas de
+    eventos. method: "auto" (inotify em disco local no Linux, senão
+    verificação periódica), "inotify" ou "polling"."""
+
+    def __init__(self, main_folder, on_change, ignored_folders=(), method="auto",
+                 debounce=DEBOUNCE_SECONDS, max_delay=MAX_DELAY_SECONDS,
+                 poll_interval=POLL_INTERVAL):
+        self.main_folder = main_folder
+        self.on_change = on_change
+        self.ignored_folders = list(ignored_folders)
+        self.method = method
+        self.debounce = debounce
+        self.max_delay = max(debounce, max_delay)
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.watch = None
+
+    def _open_watch(self):
+        """Cria a forma de observação; o inotify cai para a verificação
+        periódica se não estiver disponível ou se faltarem watches"""
+        use_inotify = self.method == "inotify" or (
+            self.method == "auto" and not is_network_path(self.main_folder))
+        libc = _load_libc() if use_inotify else None
+        if libc is not None:
+            try:
+                return InotifyWatch(self.main_folder, self.ignored_folders, libc)
+            except OSError as e:
+                logging.warning(f"Acompanhamento: inotify indisponível ({e}); "
+                                f"usando verificação periódica")
+        return PollingWatch(self.main_folder, self.ignored_folders, self.poll_interval)
+
+    def start(self):
+        """Começa a observar; a foto inicial das pastas é tirada aqui, então
+        alterações feitas depois de start() são percebidas"""
+        self.watch = self._open_watch()
+        logging.info(f"Acompanhamento iniciado: {self.main_folder} ({self.watch.name})")
+        self.thread = threading.Thread(target=self.run, name="cnd-watch", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        pending = set()
+        first_event = last_event = 0.0
+        while not self.stop_event.is_set():
+            now = time.monotonic()
+            if pending:
+                timeout = max(0.0, min(last_event + self.debounce,
+                                       first_event + self.max_delay) - now)
+            else:
+                timeout = 1.0
+            try:
+                changed = self.watch.changes(timeout, self.stop_event)
+            except Exception as e:
+                logging.error(f"Acompanhamento: erro ao observar '{self.main_folder}': {e}",
+                              exc_info=True)
+                self.stop_event.wait(self.poll_interval)
+                continue
+
+            now = time.monotonic()
+            if changed:
+                if not pending:
+                    first_event = now
+                last_event = now
+                pending |= changed
+            if pending and (now - last_event >= self.debounce
+                            or now - first_event >= self.max_delay):
+                companies, pending = sorted(pending), set()
+                if self.stop_event.is_set():
+                    break
+                try:
+                    self.on_change(companies)
+                except Exception as e:
+                    logging.error(f"Acompanhamento: erro ao atualizar {companies}: {e}",
+                                  exc_info=True)
+        self.watch.close()
+
+    def stop(self):
+        """Para de observar e espera a atualização em andamento terminar"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+            logging.info(f"Acompanhamento encerrado: {self.main_folder}")
@@ -0,0 +1,165 @@
+"""Sentry - verificação de CNDs pela linha de comando (sem interface gráfica).
+
+Permite rodar o mesmo processamento do dashboard a partir do Agendador de
+Tarefas ou de um servidor:
+
+    python sentry_cli.py --pasta "Z:/000 - CONTROLE DE CND" --modo vencimento --saida relatorio.xlsx
+    python sentry_cli.py --modo positiva --saida relatorio.xlsx --saida dados.csv --saida dados.jsonl
+
+Sem --pasta/--modo, usa a última pasta e o modo salvos em cnd_config.json.
+Não importa customtkinter nem matplotlib.
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+
+from cnd_engine import (CNDScanner, CONFIG_FILE, MODE_POSITIVA, MODE_VENCIMENTO,
+                        default_config, load_config)
+from cnd_profile import REPORT_FILE, format_report
+from cnd_history import FIELD_LABELS
+from cnd_results import (ResultStore, FLAG_COMPLETO, FLAG_INCOMPLETO, FLAG_ERRO,
+                         FLAG_POSITIVA, FLAG_VENCIDA)
+
+MODE_ALIASES = {"positiva": MODE_POSITIVA, "vencimento": MODE_VENCIMENTO}
+HISTORY_LINES = 20      # mudanças listadas no resumo (as demais só contadas)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Verificação de CNDs sem interface gráfica")
+    parser.add_argument("--pasta", help="Pasta principal com as subpastas das empresas")
+    parser.add_argument("--modo", choices=sorted(MODE_ALIASES),
+                        help="Tipo de verificação (padrão: modo salvo em cnd_config.json)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Número fixo de pastas listadas em paralelo (padrão: ajustado "
+                             "durante o processamento)")
+    parser.add_argument("--saida", action="append", default=[],
+                        help="Relatório a gerar; o formato vem da extensão (.xlsx, .csv, "
+                             ".parquet, .jsonl). Pode ser repetido")
+    parser.add_argument("--config", default=CONFIG_FILE, help="Arquivo de configuração")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reprocessa apenas as pastas alteradas desde a última execução")
+    parser.add_argument("--silencioso", action="store_true",
+                        help="Não mostra o andamento empresa a empresa")
+    parser.add_argument("--perfil", action="store_true",
+                        help=f"Mostra os tempos por etapa (sempre gravados em {REPORT_FILE})")
+    return parser
+
+
+def print_summary(summary, mode):
+    elapsed = summary["elapsed"] or 1e-9
+    results = ResultStore()
+    results.extend(summary["results"])
+    print(f"{len(results)} empresas em {summary['elapsed']:.2f}s "
+          f"({summary['workers']} threads, {summary['processes']} processos)")
+    print(f"  Vazão: {len(results) / elapsed:.1f} empresas/s, "
+          f"{summary['pdfs'] / elapsed:.1f} PDFs/s, {summary['pages'] / elapsed:.1f} páginas/s "
+          f"({summary['pdfs']} PDFs, {summary['pages']} páginas lidas)")
+    if summary.get("concurrency"):
+        print("  Concorrência: " + ", ".join(
+            f"{stage} {sizes['inicial']} -> {sizes['final']} (máx. {sizes['maximo']})"
+            for stage, sizes in summary["concurrency"].items()))
+    print(f"  Completas: {results.count(FLAG_COMPLETO)} | "
+          f"Incompletas: {results.count(FLAG_INCOMPLETO)} | Erros: {results.count(FLAG_ERRO)}")
+    if mode == MODE_POSITIVA:
+        print(f"  Positivas: {results.count(FLAG_POSITIVA)}")
+    else:
+        print(f"  Vencidas: {results.count(FLAG_VENCIDA)}")
+
+
+def print_history(scanner, summary, folder, mode):
+    """Mudanças em relação ao processamento anterior gravado no histórico"""
+    run_id = summary.get("history_run")
+    if not run_id:
+        return
+    if len(scanner.history.runs(folder, mode, limit=2)) < 2:
+        print("  Histórico: primeiro processamento gravado desta pasta")
+        return
+    changes = scanner.history.changes(run_id, limit=None)
+    print(f"  Histórico: {len(changes)} mudanças desde o processamento anterior")
+    # No modo vencimento, as CNDs que venceram; no positiva, as certidões que ficaram positivas
+    if mode == MODE_POSITIVA:
+        worse = [c for c in changes if c["campo"] == "positiva" and c["depois"] not in (None, "NENHUMA")]
+    else:
+        worse = [c for c in changes if c["depois"] == "VENCIDA"]
+    for change in worse[:HISTORY_LINES]:
+        print(f"    {change['empresa']}: {FIELD_LABELS[change['campo']]} "
+              f"{change['antes'] or '(nova)'} -> {change['depois']}")
+    if len(worse) > HISTORY_LINES:
+        print(f"    ... e mais {len(worse) - HISTORY_LINES}")
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        filename='cnd_dashboard.log',
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        encoding='utf-8'
+    )
+
+    config = load_config(default_config(), args.config)
+    if args.modo:
+        config["mode"] = MODE_ALIASES[args.modo]
+    if args.incremental:
+        config["incremental"] = True
+    mode = config["mode"]
+    folder = args.pasta or config.get("last_folder")
+    if not folder or not os.path.isdir(folder):
+        print(f"Pasta inválida: {folder!r}", file=sys.stderr)
+        return 2
+
+    async def run_scan():
+        run = scanner.scan_async(folder, mode=mode, workers=args.workers)
+        completed = 0
+        async for result in run:
+            completed += 1
+            if not args.silencioso:
+                print(f"[{completed}/{run.summary['total_folders']}] {result['empresa']}: "
+                      f"{result.get('status', '')}")
+        return run.summary
+
+    logging.info(f"Execução pela linha de comando: {folder} ({mode})")
+    scanner = CNDScanner(config)
+    try:
+        # Ctrl+C cancela a task principal, o que interrompe o processamento
+        summary = asyncio.run(run_scan())
+        if summary["total_folders"] == 0:
+            print("Nenhuma subpasta encontrada", file=sys.stderr)
+            return 1
+        print_summary(summary, mode)
+        print_history(scanner, summary, folder, mode)
+    except KeyboardInterrupt:
+        print("Processamento cancelado", file=sys.stderr)
+        return 130
+    finally:
+        scanner.close()
+
+    try:
+        report = summary["profile"].write(REPORT_FILE, summary)
+        logging.info(f"Relatório de tempos gravado em {REPORT_FILE}")
+    except OSError as e:
+        report = summary["profile"].report(summary)
+        logging.warning(f"Erro ao gravar {REPORT_FILE}: {e}")
+    if args.perfil:
+        print()
+        print(format_report(report))
+
+    if args.saida:
+        from cnd_report import export_results
+        for filename in args.saida:
+            try:
+                export_results(summary["results"], filename, mode)
+            except Exception as e:
+                logging.error(f"Erro ao exportar relatório {filename}: {e}", exc_info=True)
+                print(f"Erro ao exportar {filename}: {e}", file=sys.stderr)
+                return 1
+            print(f"Relatório exportado: {filename}")
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Necessário para o pool de processos no .exe
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""Processamento completo (CNDScanner) sobre corpus gerados por corpusgen.py"""
+import asyncio
+import sqlite3
+
+import pytest
+
+from cnd_engine import CNDScanner, MODE_POSITIVA, MODE_VENCIMENTO, PDFVerdictCache, default_config
+from corpusgen import build_corpus
+
+SCAN_TIMEOUT = 60
+
+
+@pytest.fixture
+def make_scanner(tmp_path):
+    scanners = []
+
+    def make(**options):
+        config = default_config()
+        config.update(pdf_engine="thread", history=False, **options)
+        scanner = CNDScanner(config, cache_path=str(tmp_path / "cache.db"),
+                             history_path=str(tmp_path / "history.db"))
+        scanners.append(scanner)
+        return scanner
+
+    yield make
+    for scanner in scanners:
+        scanner.close()
+
+
+def scan(scanner, folder, mode=MODE_POSITIVA):
+    """scan_async até o fim; devolve (resultados, resumo)"""
+    return consume(scanner.scan_async(folder, mode))
+
+
+def consume(run):
+    """async for sobre o run; falha (em vez de travar) se algum resultado não chegar"""
+    async def collect():
+        results = []
+        try:
+            async for result in run:
+                results.append(result)
+        except asyncio.CancelledError:
+            pass
+        return results, run.summary
+
+    return asyncio.run(asyncio.wait_for(collect(), SCAN_TIMEOUT))
+
+
+def test_custom_expected_files_with_warm_cache(tmp_path, make_scanner):
+    # Sem "CND PROC" em expected_files a coluna fica vazia e as demais têm
+    # SIM/NÃO; com o cache quente o resultado é montado antes da fila de PDFs
+    expected_files = ["CND MUNICIPAL", "CND RFB", "CND FGTS", "CND ESTADUAL"]
+    folder = str(tmp_path / "cnd")
+    build_corpus(folder, 12, expected_files=expected_files, missing=0.2)
+
+    scanner = make_scanner(expected_files=expected_files)
+    first, summary = scan(scanner, folder)
+    assert summary["total_folders"] == 12 and not summary["cancelled"]
+    assert scanner.verdict_cache.misses > 0
+    for result in first:
+        values = [result.get(field) for field in ("municipal", "rfb", "fgts", "estadual")]
+        assert set(values) <= {"SIM", "NÃO"} and result.get("proc") is None
+        assert result["status"] == ("INCOMPLETO" if "NÃO" in values else "COMPLETO")
+        assert len(result.get("missing_files", [])) == values.count("NÃO")
+    assert {"COMPLETO", "INCOMPLETO"} == {result["status"] for result in first}
+
+    second, summary = scan(scanner, folder)
+    assert not summary["cancelled"]
+    assert scanner.verdict_cache.misses == 0
+    by_name = {result["empresa"]: result.as_dict() for result in first}
+    assert {result["empresa"]: result.as_dict() for result in second} == by_name
+
+
+def test_custom_expected_files_due_dates(tmp_path, make_scanner):
+    expected_files = ["CND MUNICIPAL", "CND RFB", "CND FGTS", "CND ESTADUAL"]
+    folder = str(tmp_path / "cnd")
+    build_corpus(folder, 12, expected_files=expected_files, missing=0.2)
+
+    results, _ = scan(make_scanner(expected_files=expected_files), folder, MODE_VENCIMENTO)
+    assert len(results) == 12
+    for result in results:
+        values = [result.get(field) for field in ("municipal", "rfb", "fgts", "estadual")]
+        assert set(values) <= {"VÁLIDA", "VENCIDA", "NÃO"} and result.get("proc") is None
+        assert result["status"] == ("INCOMPLETO" if "NÃO" in values else "COMPLETO")
+
+
+def test_locked_cache_keeps_verdicts(tmp_path, make_scanner, monkeypatch):
+    # Outro processo (um segundo dashboard, a linha de comando agendada)
+    # segurando o cnd_cache.db: o cache falha, mas os vereditos não mudam
+    folder = str(tmp_path / "cnd")
+    build_corpus(folder, 8, missing=0, positive=0.3)
+    expected, _ = scan(make_scanner(), folder)
+    (tmp_path / "cache.db").unlink()
+
+    monkeypatch.setattr(PDFVerdictCache, "BUSY_TIMEOUT", 0.05)
+    scanner = make_scanner()
+    other = sqlite3.connect(str(tmp_path / "cache.db"))
+    try:
+        other.execute("BEGIN EXCLUSIVE")
+        results, summary = scan(scanner, folder)
+    finally:
+        other.rollback()
+        other.close()
+    assert not summary["cancelled"]
+    assert "ERRO" not in {result["status"] for result in results}
+    assert any(result.positiva != "NENHUMA" for result in results)
+    assert ({result["empresa"]: result.as_dict() for result in results}
+            == {result["empresa"]: result.as_dict() for result in expected})
+
+
+def test_unreadable_pdf(tmp_path, make_scanner):
+    # PDF corrompido: a CND conta como encontrada e negativa, o veredito não
+    # vai para o cache (é lido de novo no próximo processamento) e as
+    # demais empresas não são afetadas
+    folder = tmp_path / "cnd"
+    build_corpus(str(folder), 4, missing=0)
+    company = sorted(path for path in folder.iterdir() if path.name[0].isdigit())[0]
+    broken = next(company.glob("CND RFB *.pdf"))
+    broken.write_bytes(b"%PDF-1.4\n" + b"CERTIDAO POSITIVA \x00\xff" * 64)
+
+    scanner = make_scanner(prefilter=False)
+    results, summary = scan(scanner, str(folder))
+    assert len(results) == 4 and not summary["cancelled"]
+    assert "ERRO" not in {result["status"] for result in results}
+    row = next(result for result in results if result["empresa"] == company.name)
+    assert row["rfb"] == "SIM" and "CND RFB" not in row.positiva
+
+    scan(scanner, str(folder))
+    assert scanner.verdict_cache.misses == 1
+
+
+def test_verdict_cache_keyed_by_page_budget(tmp_path, make_scanner):
+    folder = str(tmp_path / "cnd")
+    build_corpus(folder, 6, missing=0)
+    scanner = make_scanner()
+    scan(scanner, folder)
+    scan(scanner, folder)
+    assert scanner.verdict_cache.misses == 0
+
+    # Vereditos gravados com a parada antecipada não valem para a leitura completa
+    scanner.config["page_budget"] = 0
+    scan(scanner, folder)
+    assert scanner.verdict_cache.hits == 0 and scanner.verdict_cache.misses > 0
+    scan(scanner, folder)
+    assert scanner.verdict_cache.misses == 0
+
+
+def test_cancel_before_scan_starts(tmp_path, make_scanner):
+    folder = str(tmp_path / "cnd")
+    build_corpus(folder, 4)
+    scanner = make_scanner()
+
+    # O dashboard cria o run na thread da interface e o cancela por ele, o
+    # que pode acontecer antes de a thread do processamento iterar
+    run = scanner.scan_async(folder)
+    run.cancel()
+    results, summary = consume(run)
+    assert summary["cancelled"] and results == []
+
+    results, summary = scan(scanner, folder)
+    assert not summary["cancelled"] and len(results) == 4
+
+
+def test_cancel_after_completion_does_not_affect_next_scan(tmp_path, make_scanner):
+    folder = str(tmp_path / "cnd")
+    build_corpus(folder, 4)
+    scanner = make_scanner()
+
+    # Parar clicado no fim (o botão fica ativo até o resumo chegar à
+    # interface) ou sem nenhum processamento em andamento
+    run = scanner.scan_async(folder)
+    results, summary = consume(run)
+    assert not summary["cancelled"] and len(results) == 4
+    run.cancel()
+    scanner.cancel()
+
+    results, summary = scan(scanner, folder)
+    assert not summary["cancelled"] and len(results) == 4
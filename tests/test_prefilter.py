@@ -0,0 +1,18 @@
+"""O pré-filtro de bytes nunca muda o veredito de read_positive_cert"""
+import pytest
+
+from compare_prefilter import build_corpus, verdict
+
+
+@pytest.fixture(scope="module")
+def sample_pdfs(tmp_path_factory):
+    return build_corpus(str(tmp_path_factory.mktemp("prefilter")))
+
+
+@pytest.mark.parametrize("page_budget", [0, 1])
+def test_prefilter_matches_full_parse(sample_pdfs, page_budget):
+    assert sample_pdfs
+    for path in sample_pdfs:
+        full, _ = verdict(path, page_budget, prefilter=False)
+        filtered, _ = verdict(path, page_budget, prefilter=True)
+        assert filtered == full, path